@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Body, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.session import get_db 
-from app.models.agente_models import AtribuicaoPaciente 
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
+from app.crud import crud_agente_async
 from datetime import datetime
 import logging
 
@@ -11,7 +11,7 @@ router = APIRouter()
 @router.post("/summarized")
 async def receive_audio_summary(
     data: dict = Body(...), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Endpoint chamado pelo microsserviço após o processamento da IA.
@@ -23,9 +23,7 @@ async def receive_audio_summary(
     atribuicao_id = payload.get("patient_id")
     
     # Busca direta pela chave primária da Atribuição
-    atribuicao = db.query(AtribuicaoPaciente).filter(
-        AtribuicaoPaciente.id == atribuicao_id
-    ).first()
+    atribuicao = await crud_agente_async.get_atribuicao_by_id(db, atribuicao_id) if atribuicao_id else None
 
     if not atribuicao:
         logger.error(f"❌ Atribuição ID {atribuicao_id} não encontrada no banco.")
@@ -42,7 +40,7 @@ async def receive_audio_summary(
         "processado_em": payload.get("processed_at") or datetime.now().isoformat()
     }
 
-    db.commit()
+    await db.commit()
     logger.info(f"✅ Dados da IA salvos com sucesso na atribuição {atribuicao.id}")
     
     return {"status": "success", "message": "Relatório clínico atualizado"}
\ No newline at end of file
@@ -59,7 +59,8 @@ def login_for_access_token(
     
     # 3. Cria o token JWT
     access_token = security.create_access_token(
-        data={"sub": user.email} # "sub" (subject) é o email do usuário
+        # "sub" (subject) é o email do usuário; "role" indica a tabela
+        data={"sub": user.email, "role": security.ROLE_GESTOR}
     )
     
     return {
@@ -92,7 +93,7 @@ def login_for_access_token(
     
     # Cria o token JWT
     access_token = security.create_access_token(
-        data={"sub": user.email}
+        data={"sub": user.email, "role": security.ROLE_AGENTE}
     )
     
     return {
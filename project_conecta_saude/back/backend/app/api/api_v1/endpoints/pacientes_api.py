@@ -1,36 +1,120 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List, Dict, Any
 
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db
 from app.api.deps import get_current_user
 from app.models.user_models import User # Necessário para a dependência
-from app.schemas import paciente_schema
-from app.services import paciente_service
+from app.schemas import paciente_schema, orquestracao_schema
+from app.services import (
+    paciente_service, importacao_service, clustering_service, reclassificacao_service
+)
 from app.services.geocoding_service import GeocodingService
 from app.crud import crud_paciente as crud
+from app.crud import crud_orquestracao
 
 router = APIRouter()
 
+def _aceito(db_paciente, db_job) -> paciente_schema.PacienteAceito:
+    """Monta a resposta 202 com o paciente salvo e o job enfileirado (se houver)."""
+    return paciente_schema.PacienteAceito(
+        **paciente_schema.Paciente.model_validate(db_paciente).model_dump(
+            exclude={"risco_diabetes", "risco_hipertensao", "recomendacao_geral"}
+        ),
+        job_id=db_job.id if db_job else None,
+        job_status=db_job.status if db_job else None,
+    )
+
+
+def _resposta_atualizacao(result, response: Response) -> paciente_schema.PacienteAceito:
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Paciente não encontrado",
+        )
+    db_paciente, db_job = result
+    if db_job is None:
+        # Nada para reprocessar: a atualização já está completa
+        response.status_code = status.HTTP_200_OK
+    return _aceito(db_paciente, db_job)
+
+
 @router.post(
     "/", 
-    response_model=paciente_schema.Paciente,
-    status_code=status.HTTP_201_CREATED
+    response_model=paciente_schema.PacienteAceito,
+    status_code=status.HTTP_202_ACCEPTED
 )
 async def create_paciente_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     paciente_in: paciente_schema.PacienteCreate, # O JSON do frontend
     current_user: User = Depends(get_current_user) # Rota protegida
 ):
     """
-    Cria um novo paciente e dispara o fluxo de orquestração (ML/LLM).
+    Cria um novo paciente e enfileira o fluxo de orquestração (ML/LLM).
+    Responde 202 imediatamente com o 'job_id'; acompanhe o progresso em
+    GET /pacientes/jobs/{job_id}.
     Corresponde ao 'createPaciente' do api.ts.
     """
-    db_paciente = await paciente_service.create_paciente_with_orchestration(
+    db_paciente, db_job = await paciente_service.create_paciente_with_orchestration(
         db, paciente_in=paciente_in
     )
-    return db_paciente
+    return _aceito(db_paciente, db_job)
+
+
+@router.post("/importar", response_model=paciente_schema.ImportacaoResponse)
+async def importar_pacientes_endpoint(
+    *,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    formato: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    enriquecer: bool = Query(True),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Importação em massa de pacientes (CSV com cabeçalho ou NDJSON).
+    O arquivo é enviado como corpo da requisição e lido em streaming.
+    O formato vem de 'formato' ou do Content-Type (text/csv, application/x-ndjson).
+    Com 'enriquecer=true', geocodificação e ML rodam em paralelo durante a
+    importação; outliers e falhas seguem para a fila de orquestração.
+    """
+    if formato is None:
+        content_type = request.headers.get("content-type", "")
+        if "csv" in content_type:
+            formato = "csv"
+        elif "ndjson" in content_type or "jsonl" in content_type:
+            formato = "ndjson"
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Informe o formato (csv ou ndjson) via Content-Type ou parâmetro 'formato'",
+            )
+
+    return await importacao_service.importar_pacientes(
+        db, chunks=request.stream(), formato=formato, enriquecer=enriquecer
+    )
+
+
+@router.post(
+    "/reclassificar",
+    response_model=orquestracao_schema.OrquestracaoJob,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def reclassificar_pacientes_endpoint(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Enfileira a reclassificação de todos os pacientes com o modelo de ML
+    atual (ex: após um retreinamento), em lotes pelo /classify/batch do
+    serviço de ML. Responde 202 com o job; acompanhe o progresso e o resumo
+    ('resultado') em GET /pacientes/jobs/{job_id}. Se já houver uma
+    reclassificação na fila, devolve o mesmo job.
+    Novos outliers seguem para a fila de orquestração (LLM).
+    """
+    return await reclassificacao_service.enfileirar_reclassificacao(db)
 
 
 @router.get(
@@ -43,15 +127,29 @@ def list_pacientes_endpoint(
     page: int = Query(1, ge=1), 
     page_size: int = Query(10, ge=1, le=100),
     search: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    paginacao: str = Query("offset", pattern="^(offset|cursor)$"),
+    total_modo: str = Query("exato", pattern="^(exato|estimado|nenhum)$"),
     current_user: User = Depends(get_current_user) # Rota protegida
 ):
     """
     Lista pacientes com paginação e busca.
     Corresponde ao 'fetchPacientes' do api.ts.
+
+    Para listas grandes use 'paginacao=cursor' (ou envie 'cursor'): a próxima
+    página vem em meta.next_cursor, sem OFFSET. 'total_modo' controla o
+    custo do total: exato (COUNT), estimado (planner) ou nenhum.
     """
-    return paciente_service.get_pacientes_paginados(
-        db, page=page, page_size=page_size, search=search
-    )
+    try:
+        return paciente_service.get_pacientes_paginados(
+            db, page=page, page_size=page_size, search=search,
+            cursor=cursor, paginacao=paginacao, total_modo=total_modo
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 
 @router.get("/{id}", response_model=paciente_schema.Paciente)
@@ -74,27 +172,84 @@ def get_paciente_by_id_endpoint(
     return paciente
 
 
-@router.put("/{id}", response_model=paciente_schema.Paciente)
+@router.put(
+    "/{id}",
+    response_model=paciente_schema.PacienteAceito,
+    status_code=status.HTTP_202_ACCEPTED
+)
 async def update_paciente_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     id: int,
     paciente_in: paciente_schema.PacienteCreate,
+    response: Response,
     current_user: User = Depends(get_current_user)
 ):
     """
-    Atualiza um paciente e re-executa o fluxo de orquestração (ML/LLM).
+    Atualiza um paciente e enfileira a re-execução da orquestração (ML/LLM).
+    Se CEP e features do modelo não mudaram, nada é enfileirado e a
+    resposta é 200 com 'job_id' nulo.
     Corresponde ao 'updatePaciente' do api.ts.
     """
-    paciente = await paciente_service.update_paciente_with_orchestration(
+    result = await paciente_service.update_paciente_with_orchestration(
         db, id=id, paciente_in=paciente_in
     )
-    if not paciente:
+    return _resposta_atualizacao(result, response)
+
+
+@router.patch(
+    "/{id}",
+    response_model=paciente_schema.PacienteAceito,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def patch_paciente_endpoint(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    id: int,
+    paciente_in: paciente_schema.PacienteUpdate,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Atualização parcial: altera apenas os campos enviados. Mesma regra do
+    PUT para a re-execução da orquestração.
+    """
+    result = await paciente_service.patch_paciente_with_orchestration(
+        db, id=id, paciente_in=paciente_in
+    )
+    return _resposta_atualizacao(result, response)
+
+
+@router.get("/jobs/{job_id}", response_model=orquestracao_schema.OrquestracaoJob)
+def get_orquestracao_job_endpoint(
+    *,
+    db: Session = Depends(get_db),
+    job_id: int,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Retorna o status de um job de orquestração (etapa atual, tentativas, erro).
+    """
+    db_job = crud_orquestracao.get_job(db, id=job_id)
+    if not db_job:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Paciente não encontrado",
+            detail="Job não encontrado",
         )
-    return paciente
+    return db_job
+
+
+@router.get("/{id}/jobs", response_model=List[orquestracao_schema.OrquestracaoJob])
+def list_orquestracao_jobs_paciente_endpoint(
+    *,
+    db: Session = Depends(get_db),
+    id: int,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lista o histórico de jobs de orquestração de um paciente.
+    """
+    return crud_orquestracao.get_jobs_por_paciente(db, paciente_id=id)
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -115,6 +270,7 @@ def delete_paciente_endpoint(
             detail="Paciente não encontrado",
         )
     crud.remove(db, id=id)
+    clustering_service.clustering_cache.notify_removed(id)
 
 
 @router.post("/{id}/confirm", response_model=paciente_schema.Paciente)
@@ -195,6 +351,7 @@ def get_pacientes_mapa(
 ):
     """
     Retorna lista de pacientes com coordenadas para visualização no mapa.
+    Para populações grandes prefira GET /pacientes/mapa/agregado.
     """
     pacientes = crud.get_all_with_coordinates(db)
     
@@ -209,4 +366,67 @@ def get_pacientes_mapa(
         }
         for p in pacientes
         if p.latitude is not None and p.longitude is not None
-    ]
\ No newline at end of file
+    ]
+
+
+@router.get("/mapa/agregado", response_model=paciente_schema.MapaResponse)
+def get_pacientes_mapa_agregado(
+    *,
+    db: Session = Depends(get_db),
+    zoom: int = Query(..., ge=0, le=22),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Mapa de pacientes para a área visível (bounding box) e nível de zoom.
+    Zoom baixo: clusters agregados (total/outliers/estáveis por célula).
+    Zoom alto: pontos individuais dentro do bounding box.
+    """
+    bbox_params = (min_lat, min_lon, max_lat, max_lon)
+    if any(p is None for p in bbox_params):
+        if any(p is not None for p in bbox_params):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Informe min_lat, min_lon, max_lat e max_lon juntos",
+            )
+        bbox = None
+    else:
+        bbox = bbox_params
+
+    return paciente_service.get_mapa_agregado(db, zoom=zoom, bbox=bbox)
+
+
+
+@router.get("/mapa/microrregioes", response_model=paciente_schema.MicrorregioesResponse)
+def get_microrregioes(
+    *,
+    db: Session = Depends(get_db),
+    k: Optional[int] = Query(None, ge=1, le=50),
+    filtro: str = Query("todos", pattern="^(todos|outliers|estaveis)$"),
+    incluir_pacientes: bool = Query(False),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Microrregiões de pacientes calculadas por K-means no backend.
+    Sem 'k', usa o k sugerido pela silhueta. O resultado fica em cache
+    por (k, filtro) e é atualizado conforme pacientes são criados/movidos.
+    """
+    return clustering_service.get_microrregioes(
+        db, k=k, filtro=filtro, incluir_pacientes=incluir_pacientes
+    )
+
+
+@router.get("/mapa/microrregioes/sugestao-k", response_model=paciente_schema.SugestaoKResponse)
+def get_microrregioes_sugestao_k(
+    *,
+    db: Session = Depends(get_db),
+    filtro: str = Query("todos", pattern="^(todos|outliers|estaveis)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Sugere o número de microrregiões (k) por cotovelo e silhueta numa amostra.
+    """
+    return clustering_service.get_suggested_k(db, filtro=filtro)
@@ -1,18 +1,20 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
 from app.core import security
-from app.db.session import get_db
-from app import crud
+from app.core.cache import MISS
+from app.db.session import get_async_db
+from app.services.principal_cache import principal_cache
 from app.models.user_models import User
 from app.models.agente_models import AgenteHealthcare # Importe o modelo de Agentes
 
 # Altere o tokenUrl para o caminho base da sua API se necessário
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
 ):
     """
     Dependência para obter o usuário logado (Gestor ou Agente) a partir do token JWT.
@@ -32,14 +34,31 @@ def get_current_user(
     if email is None:
         raise credentials_exception
     
-    # 2. Busca o usuário no banco (Tenta primeiro nos Gestores)
-    user = crud.get_by_email(db, email=email)
-    
-    # 3. SE não achar na tabela de Gestores, busca na tabela de Agentes
-    if user is None:
-        user = db.query(AgenteHealthcare).filter(AgenteHealthcare.email == email).first()
+    role = payload.get("role")
+
+    # 2. Usuário recente já validado por este processo
+    user = principal_cache.get(role, email)
+    if user is not MISS:
+        return user
+
+    # 3. Busca direto na tabela indicada pelo papel do token. Tokens antigos
+    #    (sem 'role') tentam primeiro nos Gestores e depois nos Agentes.
+    user = None
+    if role in (security.ROLE_GESTOR, None):
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
+    if user is None and role in (security.ROLE_AGENTE, None):
+        result = await db.execute(select(AgenteHealthcare).where(AgenteHealthcare.email == email))
+        user = result.scalars().first()
         
     if user is None:
         raise credentials_exception
-        
-    return user
\ No newline at end of file
+
+    # Gestor inativo ou agente desativado não acessa mais a API
+    if getattr(user, "is_active", True) is False or getattr(user, "ativo", True) is False:
+        raise credentials_exception
+
+    # O objeto fica desanexado da sessão ao fim da requisição; as colunas já
+    # carregadas continuam acessíveis para as próximas requisições
+    principal_cache.set(role, email, user)
+    return user
@@ -0,0 +1,41 @@
+"""
+Cache LRU em memória com expiração por item, compartilhado pelos caches do
+backend (CEPs, usuários autenticados).
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+# Sentinela para diferenciar "não está no cache" de um valor cacheado None
+MISS = object()
+
+
+class LRUTTLCache:
+    """Cache LRU em memória com expiração por item (não é thread-safe; uso no event loop)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return MISS
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return MISS
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
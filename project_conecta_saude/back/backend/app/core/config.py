@@ -8,15 +8,91 @@ class Settings(BaseSettings):
     DB_PORT: int
     DB_NAME: str
 
+    # Pool de conexões (valores pensados para o pooler do Supabase)
+    DB_POOL_SIZE: int = 5  # conexões mantidas abertas por engine
+    DB_MAX_OVERFLOW: int = 5  # conexões extras em picos
+    DB_POOL_TIMEOUT: float = 30.0  # segundos esperando uma conexão livre
+    DB_POOL_RECYCLE: int = 300  # segundos; o pooler encerra conexões ociosas
+    DB_POOL_PRE_PING: bool = True  # testa a conexão antes de usar (evita conexões mortas)
+    # Pooler em modo transação (porta 6543 do Supabase) não suporta prepared
+    # statements nomeados do asyncpg. None = detecta pela porta.
+    DB_POOLER_TRANSACTION_MODE: bool | None = None
+
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # Cache de usuários autenticados (get_current_user)
+    AUTH_PRINCIPAL_CACHE_TTL: float = 60.0  # segundos; 0 desativa
+    AUTH_PRINCIPAL_CACHE_MAX_ENTRIES: int = 5000
+
     ML_SERVICE_URL: str
+    ML_SERVICE_BATCH_URL: str | None = None  # None = ML_SERVICE_URL + "/batch"
+    ML_BATCH_SIZE: int = 1000  # pacientes por chamada ao /classify/batch
     LLM_SERVICE_URL: str
     whatsapp_agent_url: str | None = None
     audio_summarization_agent_url: str
 
+    # Clientes HTTP de saída (pool por serviço, ver services/upstreams.py)
+    HTTP_ML_TIMEOUT: float = 10.0  # segundos
+    HTTP_LLM_TIMEOUT: float = 60.0  # segundos (geração de texto é lenta)
+    HTTP_GEOCODING_TIMEOUT: float = 10.0  # segundos (BrasilAPI/Nominatim)
+    HTTP_CONNECT_TIMEOUT: float = 3.0  # segundos para abrir a conexão
+    HTTP_MAX_CONNECTIONS: int = 20  # conexões simultâneas por serviço
+    HTTP_MAX_KEEPALIVE: int = 10  # conexões ociosas mantidas abertas por serviço
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # segundos até fechar uma conexão ociosa
+    HTTP_RETRIES: int = 2  # retries extras em chamadas idempotentes
+    HTTP_RETRY_BACKOFF: float = 0.2  # segundos (dobra a cada tentativa, com jitter)
+    HTTP_CIRCUIT_FAILURE_THRESHOLD: int = 5  # falhas seguidas até abrir o circuito; 0 desativa
+    HTTP_CIRCUIT_RESET_TIMEOUT: float = 30.0  # segundos com o circuito aberto antes de testar
+    NOMINATIM_MIN_INTERVAL: float = 1.0  # segundos entre requisições ao Nominatim (política de uso)
+
+    # Fila de orquestração ML/LLM (workers em background)
+    ORCHESTRATION_WORKERS: int = 2
+    ORCHESTRATION_MAX_RETRIES: int = 3
+    ORCHESTRATION_RETRY_BACKOFF: float = 5.0  # segundos (dobra a cada tentativa)
+    ORCHESTRATION_POLL_INTERVAL: float = 2.0  # segundos
+    ORCHESTRATION_STALE_AFTER: float = 600.0  # segundos em 'processando' até reenfileirar
+    ORCHESTRATION_REQUEUE_INTERVAL: float = 60.0  # segundos entre as buscas por jobs presos
+
+    # Memoização dos resultados de ML/LLM (memória + Redis, se configurado)
+    ML_MODEL_VERSION: str = "v1"  # prefixo das chaves até o serviço de ML informar a versão ativa
+    ML_SERVICE_INFO_URL: str | None = None  # GET com a versão ativa; None = raiz do ML_SERVICE_URL
+    ML_MODEL_VERSION_REFRESH_INTERVAL: float = 60.0  # segundos entre consultas da versão; 0 desativa
+    LLM_PROTOCOL_INDEX_VERSION: str = "v1"  # versão do índice de protocolos (RAG)
+    ML_RESULT_CACHE_TTL: int = 7 * 24 * 3600  # segundos; 0 desativa
+    ML_RESULT_CACHE_MAX_ENTRIES: int = 20000
+    LLM_RESULT_CACHE_TTL: int = 7 * 24 * 3600  # segundos; 0 desativa
+    LLM_RESULT_CACHE_MAX_ENTRIES: int = 5000
+    LLM_CACHE_QUANTIZE: bool = False  # agrupa medições clínicas próximas na chave do LLM
+
+    # Cache de geocodificação de CEPs
+    REDIS_URL: str | None = None  # ex: redis://redis:6379/0 (opcional)
+    CEP_CACHE_TTL: int = 30 * 24 * 3600  # segundos para CEPs encontrados
+    CEP_CACHE_NEGATIVE_TTL: int = 6 * 3600  # segundos para CEPs não encontrados
+    CEP_CACHE_MAX_ENTRIES: int = 20000  # itens no LRU em memória
+
+    # Índice offline de CEPs (CSV/CSV.gz: cep,latitude,longitude[,endereco][,cidade][,uf])
+    CEP_DATASET_PATH: str | None = None
+    CEP_OFFLINE_SECTOR_FALLBACK: bool = True  # usa o centróide do setor (5 dígitos)
+
+    # Mapa de pacientes
+    MAP_CLUSTER_MAX_ZOOM: int = 13  # até este zoom o mapa recebe clusters agregados
+    MAP_GRID_CELLS_PER_TILE: int = 8  # células da grade por tile do mapa
+    MAP_MAX_POINTS: int = 5000  # máximo de pontos individuais por requisição
+
+    # Microrregiões (K-means no backend)
+    CLUSTERING_MINIBATCH_THRESHOLD: int = 50000  # acima disso usa mini-batch K-means
+    CLUSTERING_MAX_K: int = 10  # maior k avaliado na sugestão automática
+    CLUSTERING_MAX_INCREMENTAL_FRACTION: float = 0.1  # mudanças até recalcular do zero
+
+    # Busca de pacientes/agentes (trigramas; equivale ao word_similarity_threshold do pg_trgm)
+    SEARCH_SIMILARITY_THRESHOLD: float = 0.6
+
+    # Importação em massa de pacientes
+    BULK_IMPORT_BATCH_SIZE: int = 500  # linhas por INSERT multi-linha
+    BULK_IMPORT_CONCURRENCY: int = 10  # chamadas simultâneas de geocodificação
+
     @property
     def DATABASE_URL(self) -> str:
         password = quote_plus(self.DB_PASSWORD)
@@ -25,6 +101,21 @@ class Settings(BaseSettings):
             f"@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}?sslmode=require"
         )
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        # O asyncpg não aceita 'sslmode' na URL; o SSL é passado em connect_args
+        password = quote_plus(self.DB_PASSWORD)
+        return (
+            f"postgresql+asyncpg://{self.DB_USER}:{password}"
+            f"@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        )
+
+    @property
+    def pooler_transaction_mode(self) -> bool:
+        if self.DB_POOLER_TRANSACTION_MODE is not None:
+            return self.DB_POOLER_TRANSACTION_MODE
+        return self.DB_PORT == 6543
+
     class Config:
         env_file = ".env"
         case_sensitive = False
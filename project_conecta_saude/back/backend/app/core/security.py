@@ -20,6 +20,10 @@ def get_password_hash(password: str) -> str:
 
 # --- Configuração de Token JWT ---
 
+# Papéis gravados no claim 'role' do token (indica a tabela do usuário)
+ROLE_GESTOR = "gestor"   # tabela users
+ROLE_AGENTE = "agente"   # tabela agentes
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Cria um novo token de acesso JWT.
@@ -0,0 +1,59 @@
+"""
+Normalização de texto usada pela busca (nomes com acento, CPF formatado).
+"""
+import re
+import unicodedata
+from typing import Optional, Set
+
+_ESPACOS = re.compile(r"\s+")
+_NAO_DIGITOS = re.compile(r"\D")
+
+
+def normalizar_texto(texto: Optional[str]) -> str:
+    """Remove acentos, converte para minúsculas e colapsa espaços ('José  Conceição' -> 'jose conceicao')."""
+    if not texto:
+        return ""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acento = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return _ESPACOS.sub(" ", sem_acento).strip().lower()
+
+
+def somente_digitos(texto: Optional[str]) -> str:
+    """Mantém apenas os dígitos ('123.456.789-09' -> '12345678909')."""
+    return _NAO_DIGITOS.sub("", texto or "")
+
+
+def formatar_cpf(digitos: str) -> str:
+    """Formata 11 dígitos como CPF ('12345678909' -> '123.456.789-09')."""
+    return f"{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}"
+
+
+def _trigramas(texto: str) -> Set[str]:
+    """Trigramas no mesmo formato do pg_trgm (cada palavra com 2 espaços antes e 1 depois)."""
+    trigramas = set()
+    for palavra in re.findall(r"\w+", texto):
+        padded = f"  {palavra} "
+        trigramas.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigramas
+
+
+def similaridade_palavra(termo: str, texto: str) -> float:
+    """
+    Aproximação do word_similarity() do pg_trgm: fração dos trigramas do termo
+    presentes no melhor trecho de palavras consecutivas do texto (com o mesmo
+    número de palavras do termo). Substring exata vale 1.0.
+    """
+    if not termo or not texto:
+        return 0.0
+    if termo in texto:
+        return 1.0
+    trigramas_termo = _trigramas(termo)
+    if not trigramas_termo:
+        return 0.0
+    palavras = texto.split()
+    tamanho = len(termo.split())
+    melhor = 0.0
+    for inicio in range(max(1, len(palavras) - tamanho + 1)):
+        trecho = _trigramas(" ".join(palavras[inicio:inicio + tamanho]))
+        melhor = max(melhor, len(trigramas_termo & trecho) / len(trigramas_termo))
+    return melhor
@@ -2,5 +2,8 @@ from .crud_user import get_by_email, create_user
 
 # --- ADICIONE ESTAS LINHAS ---
 # Elas expõem as funções do crud_paciente para o resto do app
-from .crud_paciente import create_paciente, get_by_id, get_multi, get_all_with_coordinates
+from .crud_paciente import (
+    create_paciente, get_by_id, get_multi, get_all_with_coordinates, get_map_clusters,
+    get_multi_keyset, count_pacientes, count_estimate
+)
 # -----------------------------
\ No newline at end of file
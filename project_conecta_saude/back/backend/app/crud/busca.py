@@ -0,0 +1,94 @@
+"""
+Busca textual compartilhada por pacientes e agentes.
+
+- Email completo: igualdade em lower(email) (índice B-tree).
+- CPF (apenas dígitos ou formatado): igualdade na coluna cpf (índice único).
+- Demais termos: nome normalizado (sem acento, minúsculo) por trigramas.
+  No PostgreSQL usa os índices GIN do pg_trgm (operador '<%' e LIKE) e ordena
+  por word_similarity(); em outros bancos (SQLite dos testes) a similaridade
+  é calculada em Python sobre os candidatos.
+"""
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, false, func, literal, or_, text
+from sqlalchemy.orm import Query, Session
+
+from app.core.config import settings
+from app.core.texto import (
+    normalizar_texto, somente_digitos, formatar_cpf, similaridade_palavra
+)
+
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_CPF = re.compile(r"^[\d.\-\s]+$")
+
+
+def aplicar_busca(
+    db: Session, query: Query, model, termo: Optional[str], *, cpf_column=None
+) -> Tuple[Query, Optional[List]]:
+    """
+    Filtra 'query' pelo termo de busca.
+    Retorna (query_filtrada, ordenação por relevância ou None quando a busca
+    é por igualdade). Quem chama decide se usa a ordenação (a listagem por
+    cursor, por exemplo, mantém a ordem de created_at).
+    """
+    termo = (termo or "").strip()
+    if not termo:
+        return query, None
+
+    if _EMAIL.match(termo):
+        return query.filter(func.lower(model.email) == termo.lower()), None
+
+    digitos = somente_digitos(termo)
+    if cpf_column is not None and len(digitos) == 11 and _CPF.match(termo):
+        return query.filter(cpf_column.in_([digitos, formatar_cpf(digitos)])), None
+
+    normalizado = normalizar_texto(termo)
+    if db.bind.dialect.name == "postgresql":
+        return _busca_trigram(db, query, model, termo, normalizado)
+    return _busca_python(query, model, termo, normalizado)
+
+
+def _busca_trigram(db: Session, query: Query, model, termo: str, normalizado: str):
+    # O operador '<%' usa o limiar da sessão; SET LOCAL vale só nesta transação
+    db.execute(
+        text("SELECT set_config('pg_trgm.word_similarity_threshold', :limiar, true)"),
+        {"limiar": str(settings.SEARCH_SIMILARITY_THRESHOLD)},
+    )
+    query = query.filter(or_(
+        model.nome_normalizado.contains(normalizado, autoescape=True),
+        literal(normalizado).op("<%")(model.nome_normalizado),
+        func.lower(model.email).contains(termo.lower(), autoescape=True),
+    ))
+    ordem = [
+        case((model.nome_normalizado.startswith(normalizado, autoescape=True), 0), else_=1),
+        func.word_similarity(normalizado, model.nome_normalizado).desc(),
+        func.similarity(normalizado, model.nome_normalizado).desc(),
+        model.id.desc(),
+    ]
+    return query, ordem
+
+
+def _busca_python(query: Query, model, termo: str, normalizado: str):
+    termo_email = termo.lower()
+    pontuados = []
+    for id_, nome_normalizado, email in query.with_entities(
+        model.id, model.nome_normalizado, model.email
+    ).all():
+        nome_normalizado = nome_normalizado or ""
+        score = similaridade_palavra(normalizado, nome_normalizado)
+        if nome_normalizado.startswith(normalizado):
+            score += 1.0
+        if f" {normalizado} " in f" {nome_normalizado} ":
+            score += 0.5  # palavra inteira vale mais que prefixo ('maria' x 'mariana')
+        if email and termo_email in email.lower():
+            score = max(score, 1.0)
+        if score >= settings.SEARCH_SIMILARITY_THRESHOLD:
+            pontuados.append((score, id_))
+
+    if not pontuados:
+        return query.filter(false()), None
+    pontuados.sort(key=lambda item: (-item[0], -item[1]))
+    ids = [id_ for _, id_ in pontuados]
+    posicoes = {id_: posicao for posicao, id_ in enumerate(ids)}
+    return query.filter(model.id.in_(ids)), [case(posicoes, value=model.id)]
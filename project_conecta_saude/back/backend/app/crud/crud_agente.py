@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func
 from typing import Optional, List
+from app.crud.busca import aplicar_busca
 from app.models.agente_models import AgenteHealthcare, AtribuicaoPaciente
 from app.schemas import agente_schema
 
@@ -58,7 +59,7 @@ def get_agentes(
         db: Sessão do banco
         skip: Número de registros a pular
         limit: Limite de registros a retornar
-        search: Termo de busca (nome, email, cpf)
+        search: Termo de busca (nome sem acento/aproximado, email ou CPF exato)
         ativo_apenas: Se deve retornar apenas agentes ativos
     
     Returns:
@@ -69,16 +70,15 @@ def get_agentes(
     if ativo_apenas:
         query = query.filter(AgenteHealthcare.ativo == True)
     
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (AgenteHealthcare.nome.ilike(search_term)) |
-            (AgenteHealthcare.email.ilike(search_term)) |
-            (AgenteHealthcare.cpf.ilike(search_term))
-        )
+    query, relevancia = aplicar_busca(
+        db, query, AgenteHealthcare, search, cpf_column=AgenteHealthcare.cpf
+    )
     
     total = query.count()
-    agentes = query.offset(skip).limit(limit).all()
+    agentes = (
+        query.order_by(*(relevancia or []), AgenteHealthcare.id)
+        .offset(skip).limit(limit).all()
+    )
     
     return agentes, total
 
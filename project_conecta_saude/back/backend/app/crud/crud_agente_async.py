@@ -0,0 +1,197 @@
+"""
+Variantes assíncronas (AsyncSession/asyncpg) do crud_agente, usadas pelas
+rotas 'async def' de agentes e atribuições.
+"""
+from typing import List, Optional
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import crud_agente
+from app.models.agente_models import AgenteHealthcare, AtribuicaoPaciente
+from app.schemas import agente_schema
+
+
+# ============================================
+# CRUD - AGENTE HEALTHCARE
+# ============================================
+
+async def create_agente(
+    db: AsyncSession, agente_in: agente_schema.AgenteCreate, hashed_password: str
+) -> AgenteHealthcare:
+    """Cria um novo agente de saúde"""
+    db_agente = AgenteHealthcare(
+        nome=agente_in.nome,
+        email=agente_in.email,
+        telefone=agente_in.telefone,
+        cpf=agente_in.cpf,
+        tipo_profissional=agente_in.tipo_profissional,
+        numero_registro=agente_in.numero_registro,
+        ubs_nome=agente_in.ubs_nome,
+        endereco=agente_in.endereco,
+        ativo=agente_in.ativo,
+        hashed_password=hashed_password
+    )
+    db.add(db_agente)
+    await db.commit()
+    await db.refresh(db_agente)
+    return db_agente
+
+
+async def get_agente_by_id(db: AsyncSession, agente_id: int) -> Optional[AgenteHealthcare]:
+    """Busca agente por ID"""
+    return await db.get(AgenteHealthcare, agente_id)
+
+
+async def get_agente_by_email(db: AsyncSession, email: str) -> Optional[AgenteHealthcare]:
+    """Busca agente por email"""
+    result = await db.execute(select(AgenteHealthcare).where(AgenteHealthcare.email == email))
+    return result.scalars().first()
+
+
+async def get_agente_by_cpf(db: AsyncSession, cpf: str) -> Optional[AgenteHealthcare]:
+    """Busca agente por CPF"""
+    result = await db.execute(select(AgenteHealthcare).where(AgenteHealthcare.cpf == cpf))
+    return result.scalars().first()
+
+
+async def get_agentes(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    ativo_apenas: bool = True
+) -> tuple[List[AgenteHealthcare], int]:
+    """Lista agentes com paginação e busca (ver crud_agente.get_agentes)."""
+    return await db.run_sync(
+        lambda session: crud_agente.get_agentes(
+            session, skip=skip, limit=limit, search=search, ativo_apenas=ativo_apenas
+        )
+    )
+
+
+async def update_agente(
+    db: AsyncSession,
+    agente_id: int,
+    agente_in: agente_schema.AgenteUpdate
+) -> Optional[AgenteHealthcare]:
+    """Atualiza um agente de saúde"""
+    db_agente = await get_agente_by_id(db, agente_id)
+    if not db_agente:
+        return None
+
+    for field, value in agente_in.dict(exclude_unset=True).items():
+        setattr(db_agente, field, value)
+
+    await db.commit()
+    await db.refresh(db_agente)
+    return db_agente
+
+
+async def delete_agente(db: AsyncSession, agente_id: int) -> bool:
+    """Deleta um agente de saúde"""
+    db_agente = await get_agente_by_id(db, agente_id)
+    if not db_agente:
+        return False
+
+    await db.delete(db_agente)
+    await db.commit()
+    return True
+
+
+async def desativar_agente(db: AsyncSession, agente_id: int) -> Optional[AgenteHealthcare]:
+    """Desativa um agente sem deletar (soft delete)"""
+    db_agente = await get_agente_by_id(db, agente_id)
+    if not db_agente:
+        return None
+
+    db_agente.ativo = False
+    await db.commit()
+    await db.refresh(db_agente)
+    return db_agente
+
+
+# ============================================
+# CRUD - ATRIBUIÇÃO PACIENTE
+# ============================================
+
+async def create_atribuicao_paciente(
+    db: AsyncSession,
+    atribuicao_in: agente_schema.AtribuicaoPacienteCreate
+) -> AtribuicaoPaciente:
+    """Cria uma nova atribuição de paciente a um agente"""
+    db_atribuicao = AtribuicaoPaciente(
+        agente_id=atribuicao_in.agente_id,
+        paciente_id=atribuicao_in.paciente_id,
+        nome_paciente=atribuicao_in.nome_paciente or "",
+        localizacao=atribuicao_in.localizacao,
+        informacoes_clinicas=atribuicao_in.informacoes_clinicas,
+        notas_gestor=atribuicao_in.notas_gestor,
+    )
+    db.add(db_atribuicao)
+    await db.commit()
+    await db.refresh(db_atribuicao)
+    return db_atribuicao
+
+
+async def get_atribuicao_by_id(db: AsyncSession, atribuicao_id: int) -> Optional[AtribuicaoPaciente]:
+    """Busca atribuição por ID"""
+    return await db.get(AtribuicaoPaciente, atribuicao_id)
+
+
+async def get_atribuicoes_por_agente(
+    db: AsyncSession,
+    agente_id: int,
+    ativo_apenas: bool = True
+) -> List[AtribuicaoPaciente]:
+    """Busca todas as atribuições de um agente"""
+    query = select(AtribuicaoPaciente).where(AtribuicaoPaciente.agente_id == agente_id)
+
+    if ativo_apenas:
+        query = query.where(AtribuicaoPaciente.ativo == True)
+
+    result = await db.execute(query.order_by(desc(AtribuicaoPaciente.data_atribuicao)))
+    return list(result.scalars().all())
+
+
+async def update_atribuicao_paciente(
+    db: AsyncSession,
+    atribuicao_id: int,
+    atribuicao_in: agente_schema.AtribuicaoPacienteUpdate
+) -> Optional[AtribuicaoPaciente]:
+    """Atualiza uma atribuição de paciente"""
+    db_atribuicao = await get_atribuicao_by_id(db, atribuicao_id)
+    if not db_atribuicao:
+        return None
+
+    for field, value in atribuicao_in.dict(exclude_unset=True).items():
+        setattr(db_atribuicao, field, value)
+
+    await db.commit()
+    await db.refresh(db_atribuicao)
+    return db_atribuicao
+
+
+async def delete_atribuicao_paciente(db: AsyncSession, atribuicao_id: int) -> bool:
+    """Deleta uma atribuição de paciente"""
+    db_atribuicao = await get_atribuicao_by_id(db, atribuicao_id)
+    if not db_atribuicao:
+        return False
+
+    await db.delete(db_atribuicao)
+    await db.commit()
+    return True
+
+
+async def desativar_atribuicao_paciente(
+    db: AsyncSession, atribuicao_id: int
+) -> Optional[AtribuicaoPaciente]:
+    """Desativa uma atribuição (marca como concluída)"""
+    db_atribuicao = await get_atribuicao_by_id(db, atribuicao_id)
+    if not db_atribuicao:
+        return None
+
+    db_atribuicao.ativo = False
+    db_atribuicao.data_conclusao = func.now()
+
+    await db.commit()
+    await db.refresh(db_atribuicao)
+    return db_atribuicao
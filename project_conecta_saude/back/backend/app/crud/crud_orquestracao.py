@@ -0,0 +1,177 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert
+from typing import Any, Dict, Optional, List
+from datetime import datetime, timedelta, timezone
+from app.models.orquestracao_models import (
+    OrquestracaoJob, JOB_PENDENTE, JOB_PROCESSANDO, JOB_CONCLUIDO, JOB_FALHOU
+)
+
+
+def create_job(
+    db: Session, *, paciente_id: Optional[int], tipo: str, max_tentativas: int = 3
+) -> OrquestracaoJob:
+    """Enfileira um novo job de orquestração para o paciente (None: job sem paciente)."""
+    db_job = OrquestracaoJob(
+        paciente_id=paciente_id,
+        tipo=tipo,
+        status=JOB_PENDENTE,
+        max_tentativas=max_tentativas,
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def create_jobs_bulk(
+    db: Session, *, paciente_ids: List[int], tipo: str, max_tentativas: int = 3
+) -> int:
+    """Enfileira jobs para vários pacientes em um único INSERT. Retorna a quantidade."""
+    if not paciente_ids:
+        return 0
+    db.execute(
+        insert(OrquestracaoJob),
+        [
+            {"paciente_id": paciente_id, "tipo": tipo, "status": JOB_PENDENTE,
+             "tentativas": 0, "max_tentativas": max_tentativas}
+            for paciente_id in paciente_ids
+        ],
+    )
+    db.commit()
+    return len(paciente_ids)
+
+
+def get_job(db: Session, *, id: int) -> Optional[OrquestracaoJob]:
+    """Busca um job pelo ID."""
+    return db.query(OrquestracaoJob).filter(OrquestracaoJob.id == id).first()
+
+
+def get_job_ativo(db: Session, *, tipo: str) -> Optional[OrquestracaoJob]:
+    """Job do tipo ainda pendente ou em processamento (o mais antigo), se houver."""
+    return (
+        db.query(OrquestracaoJob)
+        .filter(OrquestracaoJob.tipo == tipo)
+        .filter(OrquestracaoJob.status.in_([JOB_PENDENTE, JOB_PROCESSANDO]))
+        .order_by(OrquestracaoJob.id)
+        .first()
+    )
+
+
+def get_jobs_por_paciente(db: Session, *, paciente_id: int) -> List[OrquestracaoJob]:
+    """Lista os jobs de um paciente, do mais recente para o mais antigo."""
+    return (
+        db.query(OrquestracaoJob)
+        .filter(OrquestracaoJob.paciente_id == paciente_id)
+        .order_by(OrquestracaoJob.id.desc())
+        .all()
+    )
+
+
+def claim_next_job(db: Session) -> Optional[OrquestracaoJob]:
+    """
+    Reserva o próximo job pendente cuja tentativa já está liberada.
+    No PostgreSQL usa FOR UPDATE SKIP LOCKED, permitindo vários workers
+    (e várias réplicas do backend) consumindo a mesma fila sem conflito.
+    """
+    query = (
+        db.query(OrquestracaoJob)
+        .filter(OrquestracaoJob.status == JOB_PENDENTE)
+        .filter(OrquestracaoJob.proxima_tentativa_em <= func.now())
+        .order_by(OrquestracaoJob.id)
+    )
+    if db.bind.dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+
+    db_job = query.first()
+    if not db_job:
+        db.rollback()
+        return None
+
+    db_job.status = JOB_PROCESSANDO
+    db_job.tentativas += 1
+    db_job.started_at = datetime.now(timezone.utc)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def set_etapa(db: Session, db_job: OrquestracaoJob, etapa: str) -> None:
+    """Registra a etapa em execução (progresso visível no endpoint de status)."""
+    db_job.etapa_atual = etapa
+    db.commit()
+
+
+def set_resultado(db: Session, db_job: OrquestracaoJob, resultado: Dict[str, Any]) -> None:
+    """
+    Grava o resumo parcial de um job longo. O commit também atualiza
+    'updated_at', que mostra que o job segue vivo (ver requeue_stale_jobs).
+    """
+    db_job.resultado = resultado
+    db.commit()
+
+
+def mark_concluido(
+    db: Session, db_job: OrquestracaoJob, *, tempos_etapas: Optional[Dict[str, float]] = None,
+    resultado: Optional[Dict[str, Any]] = None
+) -> None:
+    """Marca o job como concluído (com os tempos de cada etapa, em ms, e o resumo)."""
+    db_job.status = JOB_CONCLUIDO
+    db_job.tempos_etapas = tempos_etapas
+    if resultado is not None:
+        db_job.resultado = resultado
+    db_job.erro = None
+    db_job.finished_at = datetime.now(timezone.utc)
+    db.commit()
+
+
+def mark_falha(
+    db: Session, db_job: OrquestracaoJob, *, erro: str, backoff_seconds: float,
+    tempos_etapas: Optional[Dict[str, float]] = None
+) -> None:
+    """
+    Registra uma falha. Se ainda houver tentativas, devolve o job para a fila
+    com backoff exponencial; caso contrário, marca como falho definitivamente.
+    """
+    db_job.erro = erro
+    db_job.tempos_etapas = tempos_etapas
+    if db_job.tentativas < db_job.max_tentativas:
+        delay = backoff_seconds * (2 ** (db_job.tentativas - 1))
+        db_job.status = JOB_PENDENTE
+        db_job.proxima_tentativa_em = datetime.now(timezone.utc) + timedelta(seconds=delay)
+    else:
+        db_job.status = JOB_FALHOU
+        db_job.finished_at = datetime.now(timezone.utc)
+    db.commit()
+
+
+def requeue_stale_jobs(db: Session, *, older_than_seconds: float) -> int:
+    """
+    Devolve para a fila jobs presos em 'processando' (ex: o processo
+    caiu no meio da execução): sem nenhuma atualização (etapa, progresso)
+    há mais de 'older_than_seconds'. Jobs que já usaram todas as tentativas
+    são marcados como falhos, como em mark_falha (um job que derruba o
+    processo não volta para a fila para sempre).
+    Retorna a quantidade de jobs reenfileirados.
+    """
+    agora = datetime.now(timezone.utc)
+    limite = agora - timedelta(seconds=older_than_seconds)
+    presos = (
+        db.query(OrquestracaoJob)
+        .filter(OrquestracaoJob.status == JOB_PROCESSANDO)
+        .filter(func.coalesce(OrquestracaoJob.updated_at, OrquestracaoJob.started_at) < limite)
+    )
+    presos.filter(OrquestracaoJob.tentativas >= OrquestracaoJob.max_tentativas).update(
+        {
+            OrquestracaoJob.status: JOB_FALHOU,
+            OrquestracaoJob.erro: "Job abandonado em processamento (sem atualização) "
+                                  "e sem tentativas restantes",
+            OrquestracaoJob.finished_at: agora,
+        },
+        synchronize_session=False,
+    )
+    count = (
+        presos.filter(OrquestracaoJob.tentativas < OrquestracaoJob.max_tentativas)
+        .update({OrquestracaoJob.status: JOB_PENDENTE}, synchronize_session=False)
+    )
+    db.commit()
+    return count
@@ -1,7 +1,22 @@
+import base64
+import binascii
+import json
+from datetime import datetime
 from sqlalchemy.orm import Session
+from sqlalchemy import insert, func, case, text, tuple_
+from app.core.texto import normalizar_texto
+from app.crud.busca import aplicar_busca
 from app.models.paciente_models import Paciente
 from app.schemas.paciente_schema import PacienteCreate
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Colunas de resultado preenchidas (ou não) pelo enriquecimento da importação.
+# Todas as linhas de um lote recebem o mesmo conjunto de chaves para que o
+# INSERT seja emitido como um único statement multi-linha.
+_BULK_RESULT_COLUMNS = (
+    "latitude", "longitude", "is_outlier", "confidence",
+    "needs_confirmation", "acoes_geradas_llm", "features_hash",
+)
 
 def get_by_id(db: Session, *, id: int) -> Optional[Paciente]:
     """Busca um paciente pelo ID."""
@@ -21,26 +36,57 @@ def create_paciente(db: Session, *, paciente_in: PacienteCreate) -> Paciente:
     db.refresh(db_paciente)
     return db_paciente
 
+def create_pacientes_bulk(db: Session, *, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    Insere vários pacientes com um INSERT multi-linha, sem commit
+    (a transação é controlada por quem chama). Retorna os IDs na mesma
+    ordem das linhas recebidas.
+    """
+    if not rows:
+        return []
+    for row in rows:
+        for column in _BULK_RESULT_COLUMNS:
+            row.setdefault(column, None)
+        # O INSERT em massa não passa pelo @validates do modelo
+        row["nome_normalizado"] = normalizar_texto(row.get("nome"))
+    result = db.execute(
+        insert(Paciente).returning(Paciente.id, sort_by_parameter_order=True),
+        rows,
+    )
+    return list(result.scalars().all())
+
+
+def get_existing_emails(db: Session, *, emails: List[str]) -> Set[str]:
+    """Retorna quais dos emails informados já estão cadastrados."""
+    if not emails:
+        return set()
+    return {
+        email for (email,) in
+        db.query(Paciente.email).filter(Paciente.email.in_(emails)).all()
+    }
+
+
+def _search_query(db: Session, search: Optional[str]):
+    """Query base da listagem. Retorna (query, ordenação por relevância ou None)."""
+    return aplicar_busca(db, db.query(Paciente), Paciente, search)
+
+
 def get_multi(
-    db: Session, *, page: int = 1, page_size: int = 10, search: str = ""
-    ) -> (List[Paciente], int):
+    db: Session, *, page: int = 1, page_size: int = 10, search: str = "",
+    with_total: bool = True
+    ) -> (List[Paciente], Optional[int]):
     """
     Busca pacientes com paginação e busca.
     Retorna uma tupla (lista_de_pacientes, total_de_pacientes).
+    Com 'with_total=False' o COUNT não é executado (total = None).
     """
-    query = db.query(Paciente)
-
-    if search:
-        # Busca por nome ou email (exemplo)
-        query = query.filter(
-            (Paciente.nome.ilike(f"%{search}%")) |
-            (Paciente.email.ilike(f"%{search}%"))
-        )
+    query, relevancia = _search_query(db, search)
 
-    total = query.count()
+    total = query.count() if with_total else None
     
+    # Com busca, os mais relevantes primeiro; empates pelos mais recentes
     pacientes = (
-        query.order_by(Paciente.created_at.desc())
+        query.order_by(*(relevancia or []), Paciente.created_at.desc(), Paciente.id.desc())
         .offset((page - 1) * page_size)
         .limit(page_size)
         .all()
@@ -49,6 +95,80 @@ def get_multi(
     return pacientes, total
 
 
+def encode_cursor(paciente: Paciente) -> str:
+    """Gera o cursor opaco (created_at, id) do último item de uma página."""
+    raw = json.dumps({"c": paciente.created_at.isoformat(), "i": paciente.id})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decodifica o cursor. Lança ValueError se for inválido."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["c"]), int(data["i"])
+    except (KeyError, TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def get_multi_keyset(
+    db: Session, *, limit: int = 10, cursor: Optional[str] = None, search: str = ""
+) -> Tuple[List[Paciente], Optional[str]]:
+    """
+    Paginação por cursor (keyset em created_at, id), sem OFFSET: o custo de
+    cada página é constante, independentemente da profundidade.
+    Retorna (lista_de_pacientes, próximo_cursor ou None se acabou).
+    """
+    # O cursor depende da ordem (created_at, id), então a relevância é ignorada aqui
+    query, _ = _search_query(db, search)
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Paciente.created_at, Paciente.id) < (created_at, last_id))
+
+    pacientes = (
+        query.order_by(Paciente.created_at.desc(), Paciente.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = encode_cursor(pacientes[limit - 1]) if len(pacientes) > limit else None
+    return pacientes[:limit], next_cursor
+
+
+def count_pacientes(db: Session, *, search: str = "") -> int:
+    """Total exato de pacientes (COUNT)."""
+    query, _ = _search_query(db, search)
+    return query.count()
+
+
+def count_estimate(db: Session, *, search: str = "") -> int:
+    """
+    Total aproximado de pacientes, sem varrer a tabela.
+    No PostgreSQL usa a estimativa do planner (pg_class.reltuples sem busca;
+    EXPLAIN da query com busca). Em outros bancos faz o COUNT exato.
+    """
+    query, _ = _search_query(db, search)
+    if db.bind.dialect.name != "postgresql":
+        return query.count()
+
+    if not search:
+        estimate = db.execute(text(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = 'pacientes'::regclass"
+        )).scalar()
+        # reltuples = -1 enquanto a tabela nunca foi analisada
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+        return query.count()
+
+    # Parâmetros vinculados pelo driver: a busca do usuário não entra no SQL
+    compiled = query.statement.compile(dialect=db.bind.dialect)
+    plan = db.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 def remove(db: Session, *, id: int) -> None:
     """Remove um paciente do banco pelo ID."""
     obj = db.query(Paciente).get(id)
@@ -56,14 +176,59 @@ def remove(db: Session, *, id: int) -> None:
     db.commit()
 
 
-def get_all_with_coordinates(db: Session) -> List[Paciente]:
+def _map_query(db: Session, *columns, bbox: Optional[Tuple[float, float, float, float]] = None):
+    """Query base do mapa: apenas pacientes com coordenadas, opcionalmente dentro do bbox."""
+    query = (
+        db.query(*columns)
+        .filter(Paciente.latitude.isnot(None))
+        .filter(Paciente.longitude.isnot(None))
+    )
+    if bbox:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        query = query.filter(
+            Paciente.latitude.between(min_lat, max_lat),
+            Paciente.longitude.between(min_lon, max_lon),
+        )
+    return query
+
+
+def get_all_with_coordinates(
+    db: Session, *, bbox: Optional[Tuple[float, float, float, float]] = None,
+    limit: Optional[int] = None
+) -> List[Any]:
+    """
+    Busca os pacientes que possuem coordenadas (latitude e longitude).
+    Usado para visualização no mapa: seleciona apenas as colunas necessárias
+    (id, nome, latitude, longitude, is_outlier) em vez do registro completo.
+    """
+    query = _map_query(
+        db, Paciente.id, Paciente.nome, Paciente.latitude, Paciente.longitude,
+        Paciente.is_outlier, bbox=bbox,
+    )
+    if limit:
+        query = query.order_by(Paciente.id).limit(limit)
+    return query.all()
+
+
+def get_map_clusters(
+    db: Session, *, cell_size: float,
+    bbox: Optional[Tuple[float, float, float, float]] = None
+) -> List[Any]:
     """
-    Busca todos os pacientes que possuem coordenadas (latitude e longitude).
-    Usado para visualização no mapa.
+    Agrega os pacientes numa grade regular de 'cell_size' graus, direto no banco.
+    Cada linha traz o centróide da célula e as contagens total/outliers.
     """
+    cell_lat = func.floor(Paciente.latitude / cell_size)
+    cell_lon = func.floor(Paciente.longitude / cell_size)
     return (
-        db.query(Paciente)
-        .filter(Paciente.latitude.isnot(None))
-        .filter(Paciente.longitude.isnot(None))
+        _map_query(
+            db,
+            func.avg(Paciente.latitude).label("latitude"),
+            func.avg(Paciente.longitude).label("longitude"),
+            func.count(Paciente.id).label("total"),
+            func.sum(case((Paciente.is_outlier.is_(True), 1), else_=0)).label("outliers"),
+            bbox=bbox,
+        )
+        .group_by(cell_lat, cell_lon)
         .all()
     )
\ No newline at end of file
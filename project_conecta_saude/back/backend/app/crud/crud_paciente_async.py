@@ -0,0 +1,98 @@
+"""
+Variantes assíncronas (AsyncSession/asyncpg) do crud_paciente, usadas pelas
+rotas 'async def'. Consultas simples são escritas com select(); as que
+reaproveitam a lógica do módulo síncrono (busca, paginação, INSERT em massa)
+rodam via AsyncSession.run_sync, que executa o código síncrono sobre a
+conexão assíncrona sem bloquear o event loop.
+"""
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import crud_paciente
+from app.models.paciente_models import Paciente
+from app.schemas.paciente_schema import PacienteCreate
+
+
+async def get_by_id(db: AsyncSession, *, id: int) -> Optional[Paciente]:
+    """Busca um paciente pelo ID."""
+    return await db.get(Paciente, id)
+
+
+async def get_by_email(db: AsyncSession, *, email: str) -> Optional[Paciente]:
+    """Busca um paciente pelo email."""
+    result = await db.execute(select(Paciente).where(Paciente.email == email))
+    return result.scalars().first()
+
+
+async def create_paciente(db: AsyncSession, *, paciente_in: PacienteCreate) -> Paciente:
+    """Cria um novo paciente e salva no banco."""
+    db_paciente = Paciente(**paciente_in.model_dump())
+    db.add(db_paciente)
+    await db.commit()
+    await db.refresh(db_paciente)
+    return db_paciente
+
+
+async def update_paciente(
+    db: AsyncSession, *, db_paciente: Paciente, data: Dict[str, Any]
+) -> Paciente:
+    """Atualiza os campos informados do paciente."""
+    for field, value in data.items():
+        setattr(db_paciente, field, value)
+    await db.commit()
+    await db.refresh(db_paciente)
+    return db_paciente
+
+
+async def remove(db: AsyncSession, *, id: int) -> None:
+    """Remove um paciente do banco pelo ID."""
+    obj = await db.get(Paciente, id)
+    if obj is not None:
+        await db.delete(obj)
+        await db.commit()
+
+
+async def get_multi(
+    db: AsyncSession, *, page: int = 1, page_size: int = 10, search: str = "",
+    with_total: bool = True
+) -> Tuple[List[Paciente], Optional[int]]:
+    """Listagem paginada por OFFSET (ver crud_paciente.get_multi)."""
+    return await db.run_sync(
+        lambda session: crud_paciente.get_multi(
+            session, page=page, page_size=page_size, search=search, with_total=with_total
+        )
+    )
+
+
+async def get_multi_keyset(
+    db: AsyncSession, *, limit: int = 10, cursor: Optional[str] = None, search: str = ""
+) -> Tuple[List[Paciente], Optional[str]]:
+    """Listagem paginada por cursor (ver crud_paciente.get_multi_keyset)."""
+    return await db.run_sync(
+        lambda session: crud_paciente.get_multi_keyset(
+            session, limit=limit, cursor=cursor, search=search
+        )
+    )
+
+
+async def count_pacientes(db: AsyncSession, *, search: str = "") -> int:
+    """Total exato de pacientes (COUNT)."""
+    return await db.run_sync(lambda session: crud_paciente.count_pacientes(session, search=search))
+
+
+async def count_estimate(db: AsyncSession, *, search: str = "") -> int:
+    """Total aproximado de pacientes (ver crud_paciente.count_estimate)."""
+    return await db.run_sync(lambda session: crud_paciente.count_estimate(session, search=search))
+
+
+async def get_existing_emails(db: AsyncSession, *, emails: List[str]) -> Set[str]:
+    """Retorna quais dos emails informados já estão cadastrados."""
+    if not emails:
+        return set()
+    result = await db.execute(select(Paciente.email).where(Paciente.email.in_(emails)))
+    return set(result.scalars().all())
+
+
+async def create_pacientes_bulk(db: AsyncSession, *, rows: List[Dict[str, Any]]) -> List[int]:
+    """INSERT multi-linha sem commit (ver crud_paciente.create_pacientes_bulk)."""
+    return await db.run_sync(lambda session: crud_paciente.create_pacientes_bulk(session, rows=rows))
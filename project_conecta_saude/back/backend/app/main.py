@@ -1,11 +1,41 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.api_v1.api import api_router
+from app.core.config import settings
+from app.services.orquestracao_worker import worker_pool
+from app.services.cep_index import load_cep_index
+from app.services.resultado_cache import ml_result_cache, llm_result_cache
+from app.services.upstreams import upstreams
+from app.services.http_client import refresh_ml_model_version, watch_ml_model_version
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Índice offline de CEPs (carregado fora do event loop)
+    await asyncio.to_thread(load_cep_index, settings.CEP_DATASET_PATH)
+    # Versão ativa do modelo de ML nas chaves do cache de classificações
+    # (uma tentativa só: com o serviço fora do ar, o laço tenta de novo)
+    await refresh_ml_model_version(retry=False)
+    version_task = None
+    if settings.ML_MODEL_VERSION_REFRESH_INTERVAL > 0:
+        version_task = asyncio.create_task(watch_ml_model_version())
+    # Workers da fila de orquestração ML/LLM
+    await worker_pool.start()
+    yield
+    await worker_pool.stop()
+    if version_task is not None:
+        version_task.cancel()
+    # Fecha os pools de conexões HTTP de saída
+    await upstreams.aclose()
+
 
 app = FastAPI(
     title="Conecta+Saúde - Backend Principal",
     description="API para gerenciamento de pacientes e orquestração de serviços de ML/LLM.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -25,3 +55,13 @@ def health_check():
 def health_check():
     """Rota específica para o Healthcheck do Docker."""
     return {"status": "healthy"}
+
+@app.get("/metrics/cache", tags=["Health Check"])
+def cache_metrics():
+    """Taxa de acerto da memoização de resultados do ML e do LLM (desde o startup)."""
+    return {"ml": ml_result_cache.stats(), "llm": llm_result_cache.stats()}
+
+@app.get("/metrics/upstreams", tags=["Health Check"])
+def upstream_metrics():
+    """Estado do circuit breaker de cada serviço externo (ML, LLM, geocodificação)."""
+    return upstreams.stats()
@@ -1,9 +1,10 @@
 from sqlalchemy import (
     Column, Integer, String, Boolean, DateTime, ForeignKey, 
-    Table, Text, JSON
+    Table, Text, JSON, Index
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
+from app.core.texto import normalizar_texto
 from app.db.base import Base
 
 # --- PROTEÇÃO ÚNICA CONTRA REDEFINIÇÃO ---
@@ -25,6 +26,8 @@ class AgenteHealthcare(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String, nullable=False, index=True)
+    # Nome sem acentos e em minúsculas, usado pela busca (índice de trigramas)
+    nome_normalizado = Column(String, nullable=True)
     email = Column(String, unique=True, index=True, nullable=False)
     telefone = Column(String, nullable=True)
     cpf = Column(String, unique=True, nullable=False, index=True)
@@ -43,6 +46,16 @@ class AgenteHealthcare(Base):
 
     atribuicoes = relationship("AtribuicaoPaciente", back_populates="agente", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Atalho de busca por email exato (sem diferenciar maiúsculas)
+        Index("ix_agentes_email_lower", func.lower(email)),
+    )
+
+    @validates("nome")
+    def _sync_nome_normalizado(self, key, nome):
+        self.nome_normalizado = normalizar_texto(nome)
+        return nome
+
 
 class AtribuicaoPaciente(Base):
     __tablename__ = "atribuicoes_pacientes"
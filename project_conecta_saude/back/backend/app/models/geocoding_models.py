@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, Boolean, DateTime, Float
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class CepGeocodificado(Base):
+    """
+    Cache persistente de CEPs já resolvidos (camada mais lenta do cache
+    de geocodificação). CEPs inválidos/inexistentes também são guardados
+    (encontrado = False) para não consultar as APIs externas de novo.
+    """
+    __tablename__ = "ceps_geocodificados"
+
+    cep = Column(String(8), primary_key=True)  # Apenas dígitos
+    encontrado = Column(Boolean, nullable=False, default=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    endereco = Column(String, nullable=True)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True
+    )
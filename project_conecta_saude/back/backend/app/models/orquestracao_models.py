@@ -0,0 +1,53 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+# --- Status possíveis de um job de orquestração ---
+JOB_PENDENTE = "pendente"
+JOB_PROCESSANDO = "processando"
+JOB_CONCLUIDO = "concluido"
+JOB_FALHOU = "falhou"
+
+# --- Etapas executadas pelo worker ---
+ETAPA_GEOCODIFICACAO = "geocodificacao"
+ETAPA_CLASSIFICACAO_ML = "classificacao_ml"
+ETAPA_GERACAO_LLM = "geracao_llm"
+
+# --- Jobs que não pertencem a um paciente ---
+TIPO_RECLASSIFICACAO_EM_MASSA = "reclassificacao_em_massa"
+
+
+class OrquestracaoJob(Base):
+    """
+    Job persistente de orquestração ((Geocodificação || ML) -> LLM) de um paciente.
+    O endpoint salva o paciente, cria o job e responde 202; os workers
+    do backend consomem a fila e atualizam o status/etapa de cada job.
+    A reclassificação em massa usa a mesma fila, sem paciente.
+    """
+    __tablename__ = "orquestracao_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    paciente_id = Column(
+        Integer, ForeignKey("pacientes.id", ondelete="CASCADE"), nullable=True, index=True
+    )  # None na reclassificação em massa
+
+    # "criacao", "atualizacao", "reclassificacao" ou "reclassificacao_em_massa"
+    tipo = Column(String, nullable=False)
+
+    # Controle da fila
+    status = Column(String, nullable=False, default=JOB_PENDENTE, index=True)
+    etapa_atual = Column(String, nullable=True)
+    tentativas = Column(Integer, nullable=False, default=0)
+    max_tentativas = Column(Integer, nullable=False, default=3)
+    erro = Column(Text, nullable=True)  # Última mensagem de erro
+    proxima_tentativa_em = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Duração (ms) de cada etapa na última tentativa + "total"
+    # Geocodificação e ML rodam em paralelo: o total é menor que a soma
+    tempos_etapas = Column(JSON, nullable=True)
+    # Resumo do job (reclassificação em massa: totais, atualizados a cada lote)
+    resultado = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
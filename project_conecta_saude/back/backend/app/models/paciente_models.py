@@ -1,8 +1,10 @@
 from sqlalchemy import (
     Column, Integer, String, Boolean, Date, Float, 
-    ForeignKey, DateTime, Text
+    ForeignKey, DateTime, Text, Index
 )
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
+from app.core.texto import normalizar_texto
 from app.db.base import Base
 
 class Paciente(Base):
@@ -13,6 +15,8 @@ class Paciente(Base):
     # Identificação
     email = Column(String, index=True, unique=True, nullable=False)
     nome = Column(String, nullable=False)
+    # Nome sem acentos e em minúsculas, usado pela busca (índice de trigramas)
+    nome_normalizado = Column(String, nullable=True)
     data_nascimento = Column(Date, nullable=False)
     endereco = Column(String, nullable=True)
     cep = Column(String, nullable=True)
@@ -75,6 +79,25 @@ class Paciente(Base):
     # Resultados do LLM
     acoes_geradas_llm = Column(Text, nullable=True)
 
+    # Hash (SHA-256) das features do modelo usadas na última classificação
+    # concluída. Se não mudar, uma atualização não re-executa ML/LLM.
+    features_hash = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        # Consultas do mapa filtram por bounding box (latitude/longitude)
+        Index("ix_pacientes_lat_lon", "latitude", "longitude"),
+        # Listagem ordenada por created_at com paginação por cursor (keyset)
+        Index("ix_pacientes_created_at_id", "created_at", "id"),
+        # Atalho de busca por email exato (sem diferenciar maiúsculas)
+        Index("ix_pacientes_email_lower", func.lower(email)),
+        # Os índices GIN de trigramas (pg_trgm) ficam em migrations/add_busca_trigram.py
+    )
+
+    @validates("nome")
+    def _sync_nome_normalizado(self, key, nome):
+        self.nome_normalizado = normalizar_texto(nome)
+        return nome
+
 
 class RetrainingData(Base):
     """
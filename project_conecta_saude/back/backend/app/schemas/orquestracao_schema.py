@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+
+# =================================================================
+# Schema de SAÍDA do job de orquestração (endpoint de status)
+# =================================================================
+class OrquestracaoJob(BaseModel):
+    id: int
+    paciente_id: Optional[int] = None  # None na reclassificação em massa
+    tipo: str
+    status: str  # pendente | processando | concluido | falhou
+    etapa_atual: Optional[str] = None  # etapas em paralelo vêm unidas por '+'
+    tentativas: int
+    max_tentativas: int
+    erro: Optional[str] = None
+    proxima_tentativa_em: Optional[datetime] = None
+    tempos_etapas: Optional[Dict[str, float]] = None  # ms por etapa + "total"
+    resultado: Optional[Dict[str, Any]] = None  # resumo (ver ReclassificacaoResponse)
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, computed_field
+from pydantic import BaseModel, computed_field, model_validator
 from typing import Optional, List
 from datetime import date, datetime
 
@@ -58,6 +58,62 @@ class PacienteCreate(PacienteBase):
     pass
 
 
+class PacienteUpdate(BaseModel):
+    """
+    Schema do PATCH: apenas os campos enviados são alterados.
+    """
+    email: Optional[str] = None
+    nome: Optional[str] = None
+    endereco: Optional[str] = None
+    cep: Optional[str] = None
+    data_nascimento: Optional[date] = None
+
+    sexo: Optional[str] = None
+    raca_cor: Optional[str] = None
+    situacao_conjugal: Optional[str] = None
+    situacao_ocupacional: Optional[str] = None
+    zona_moradia: Optional[str] = None
+
+    seguranca_alimentar: Optional[str] = None
+    escolaridade: Optional[str] = None
+    renda_familiar_sm: Optional[str] = None
+    plano_saude: Optional[str] = None
+    arranjo_domiciliar: Optional[str] = None
+
+    atividade_fisica: Optional[str] = None
+    consumo_alcool: Optional[str] = None
+    tabagismo_atual: Optional[bool] = None
+    qualidade_dieta: Optional[str] = None
+    qualidade_sono: Optional[str] = None
+
+    nivel_estresse: Optional[str] = None
+    suporte_social: Optional[str] = None
+
+    historico_familiar_dc: Optional[bool] = None
+    acesso_servico_saude: Optional[str] = None
+    aderencia_medicamento: Optional[str] = None
+    consultas_ultimo_ano: Optional[int] = None
+
+    imc: Optional[float] = None
+    pressao_sistolica_mmHg: Optional[int] = None
+    pressao_diastolica_mmHg: Optional[int] = None
+    glicemia_jejum_mg_dl: Optional[int] = None
+    colesterol_total_mg_dl: Optional[int] = None
+    hdl_mg_dl: Optional[int] = None
+    triglicerides_mg_dl: Optional[int] = None
+
+    @model_validator(mode="after")
+    def _campos_obrigatorios_nao_nulos(self):
+        """Campos obrigatórios no cadastro podem ser omitidos, mas não enviados como null."""
+        nulos = [
+            field for field in self.model_fields_set
+            if getattr(self, field) is None and PacienteBase.model_fields[field].is_required()
+        ]
+        if nulos:
+            raise ValueError(f"Campos não podem ser nulos: {', '.join(sorted(nulos))}")
+        return self
+
+
 # =================================================================
 # Schema de SAÍDA (Baseado no PacienteOut do api.ts)
 # =================================================================
@@ -113,6 +169,16 @@ class Paciente(PacienteBase): # (Herda todos os campos)
         from_attributes = True
 
 
+class PacienteAceito(Paciente):
+    """
+    Resposta 202 de criação/atualização: o paciente já salvo e o job
+    de orquestração (ML/LLM) que vai enriquecê-lo em background.
+    Sem job (None) quando a atualização não altera CEP nem features do modelo.
+    """
+    job_id: Optional[int] = None
+    job_status: Optional[str] = None
+
+
 # =================================================================
 # Schema para Confirmação do Profissional
 # =================================================================
@@ -127,12 +193,100 @@ class ProfessionalConfirmation(BaseModel):
 # Schema de SAÍDA para LISTAGEM (Baseado no PacienteListResponse)
 # =================================================================
 class PacienteListMeta(BaseModel):
-    total: int
-    page: int
+    total: Optional[int] = None  # None quando total_modo = "nenhum"
+    page: Optional[int] = None  # None na paginação por cursor
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    total_estimado: bool = False  # True se o total veio da estimativa do planner
+    next_cursor: Optional[str] = None  # Próxima página (paginação por cursor)
 
 class PacienteListResponse(BaseModel):
     """ Schema para a resposta paginada de pacientes """
     items: List[Paciente]
-    meta: PacienteListMeta
\ No newline at end of file
+    meta: PacienteListMeta
+
+
+# =================================================================
+# Schemas de SAÍDA da importação em massa (CSV/NDJSON)
+# =================================================================
+class ImportacaoLinhaResultado(BaseModel):
+    linha: int  # Número do registro no arquivo (sem contar o cabeçalho)
+    status: str  # "importado" ou "erro"
+    email: Optional[str] = None
+    paciente_id: Optional[int] = None
+    is_outlier: Optional[bool] = None
+    erro: Optional[str] = None
+
+class ImportacaoResponse(BaseModel):
+    """ Resumo da importação com o resultado de cada linha """
+    total: int
+    importados: int
+    falhas: int
+    jobs_enfileirados: int
+    resultados: List[ImportacaoLinhaResultado]
+
+class ReclassificacaoResponse(BaseModel):
+    """ Resumo da reclassificação em massa (campo 'resultado' do job) """
+    total: int
+    alterados: int  # Pacientes cuja classificação (outlier ou não) mudou
+    novos_outliers: int
+    jobs_enfileirados: int  # Novos outliers aguardando as ações do LLM
+    tempo_segundos: float
+
+
+# =================================================================
+# Schemas de SAÍDA do mapa agregado
+# =================================================================
+class MapaPonto(BaseModel):
+    id: int
+    nome: str
+    latitude: float
+    longitude: float
+    status_saude: str
+    is_outlier: Optional[bool] = None
+
+class MapaCluster(BaseModel):
+    latitude: float  # Centróide dos pacientes da célula
+    longitude: float
+    total: int
+    outliers: int
+    estaveis: int
+
+class MapaResponse(BaseModel):
+    """ Resposta do mapa: clusters (zoom baixo) ou pontos (zoom alto) """
+    tipo: str  # "clusters" ou "pontos"
+    zoom: int
+    total: int
+    clusters: List[MapaCluster] = []
+    pontos: List[MapaPonto] = []
+    truncado: bool = False  # True se havia mais pontos que MAP_MAX_POINTS
+
+
+
+# =================================================================
+# Schemas de SAÍDA das microrregiões (K-means)
+# =================================================================
+class Microrregiao(BaseModel):
+    id: int
+    latitude: float  # Centróide
+    longitude: float
+    total: int
+    outliers: int
+    paciente_ids: Optional[List[int]] = None
+
+class MicrorregioesResponse(BaseModel):
+    k: int
+    filtro: str
+    total: int
+    cache: bool  # True se veio do cache (sem recalcular)
+    clusters: List[Microrregiao]
+
+class SugestaoKCandidato(BaseModel):
+    k: int
+    inercia: float
+    silhueta: float
+
+class SugestaoKResponse(BaseModel):
+    k_sugerido: int  # Melhor silhueta
+    k_cotovelo: Optional[int] = None  # Método do cotovelo
+    candidatos: List[SugestaoKCandidato]
@@ -1,9 +1,10 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List, Dict, Any
-from app.crud import crud_agente
+from app.crud import crud_agente_async as crud_agente
 from app.schemas import agente_schema
 from fastapi import HTTPException, status
 from app.core import security
+from app.services.principal_cache import principal_cache
 from app.db.session import SessionLocal
 from datetime import datetime
 
@@ -11,12 +12,12 @@ class AgenteService:
     """Serviço para operações relacionadas a agentes de saúde"""
     
     @staticmethod
-    def criar_agente(db: Session, agente_in: agente_schema.AgenteCreate) -> agente_schema.Agente:
+    async def criar_agente(db: AsyncSession, agente_in: agente_schema.AgenteCreate) -> agente_schema.Agente:
         # 1. Verificações de duplicidade
-        if crud_agente.get_agente_by_email(db, agente_in.email):
+        if await crud_agente.get_agente_by_email(db, agente_in.email):
             raise HTTPException(status_code=400, detail="Email já cadastrado")
         
-        if crud_agente.get_agente_by_cpf(db, agente_in.cpf):
+        if await crud_agente.get_agente_by_cpf(db, agente_in.cpf):
             raise HTTPException(status_code=400, detail="CPF já cadastrado")
         
         # 2. Criptografia da senha
@@ -24,14 +25,14 @@ class AgenteService:
         hashed_pw = security.get_password_hash(agente_in.senha)
         
         # 3. Chamada ao CRUD passando o hash
-        db_agente = crud_agente.create_agente(db, agente_in, hashed_password=hashed_pw)
+        db_agente = await crud_agente.create_agente(db, agente_in, hashed_password=hashed_pw)
         return agente_schema.Agente.from_orm(db_agente)
     
     
     @staticmethod
-    def buscar_agente(db: Session, agente_id: int) -> agente_schema.Agente:
+    async def buscar_agente(db: AsyncSession, agente_id: int) -> agente_schema.Agente:
         """Busca um agente pelo ID"""
-        db_agente = crud_agente.get_agente_by_id(db, agente_id)
+        db_agente = await crud_agente.get_agente_by_id(db, agente_id)
         if not db_agente:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -41,8 +42,8 @@ class AgenteService:
     
     
     @staticmethod
-    def listar_agentes(
-        db: Session,
+    async def listar_agentes(
+        db: AsyncSession,
         page: int = 1,
         page_size: int = 10,
         search: Optional[str] = None
@@ -57,7 +58,7 @@ class AgenteService:
             search: Termo de busca
         """
         skip = (page - 1) * page_size
-        agentes, total = crud_agente.get_agentes(db, skip=skip, limit=page_size, search=search)
+        agentes, total = await crud_agente.get_agentes(db, skip=skip, limit=page_size, search=search)
         
         total_pages = (total + page_size - 1) // page_size
         
@@ -71,13 +72,13 @@ class AgenteService:
     
     
     @staticmethod
-    def atualizar_agente(
-        db: Session,
+    async def atualizar_agente(
+        db: AsyncSession,
         agente_id: int,
         agente_in: agente_schema.AgenteUpdate
     ) -> agente_schema.Agente:
         """Atualiza um agente de saúde"""
-        db_agente = crud_agente.get_agente_by_id(db, agente_id)
+        db_agente = await crud_agente.get_agente_by_id(db, agente_id)
         if not db_agente:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -86,35 +87,43 @@ class AgenteService:
         
         # Verificar se novo email já existe (se foi alterado)
         if agente_in.email and agente_in.email != db_agente.email:
-            if crud_agente.get_agente_by_email(db, agente_in.email):
+            if await crud_agente.get_agente_by_email(db, agente_in.email):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Email já cadastrado"
                 )
         
-        db_agente = crud_agente.update_agente(db, agente_id, agente_in)
+        email_anterior = db_agente.email
+        db_agente = await crud_agente.update_agente(db, agente_id, agente_in)
+        # O usuário autenticado em cache tem os dados antigos
+        principal_cache.invalidate(email_anterior, db_agente.email)
         return agente_schema.Agente.from_orm(db_agente)
     
     
     @staticmethod
-    def deletar_agente(db: Session, agente_id: int) -> None:
+    async def deletar_agente(db: AsyncSession, agente_id: int) -> None:
         """Deleta um agente de saúde"""
-        if not crud_agente.delete_agente(db, agente_id):
+        db_agente = await crud_agente.get_agente_by_id(db, agente_id)
+        email = db_agente.email if db_agente else None
+        if not await crud_agente.delete_agente(db, agente_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Agente não encontrado"
             )
+        principal_cache.invalidate(email)
     
     
     @staticmethod
-    def desativar_agente(db: Session, agente_id: int) -> agente_schema.Agente:
+    async def desativar_agente(db: AsyncSession, agente_id: int) -> agente_schema.Agente:
         """Desativa um agente (soft delete)"""
-        db_agente = crud_agente.desativar_agente(db, agente_id)
+        db_agente = await crud_agente.desativar_agente(db, agente_id)
         if not db_agente:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Agente não encontrado"
             )
+        # Agente desativado perde o acesso imediatamente
+        principal_cache.invalidate(db_agente.email)
         return agente_schema.Agente.from_orm(db_agente)
 
 
@@ -122,10 +131,10 @@ class AtribuicaoPacienteService:
     """Serviço para operações de atribuição de pacientes a agentes"""
     
     @staticmethod
-    def atribuir_paciente(db: Session, atribuicao_in: agente_schema.AtribuicaoPacienteCreate) -> agente_schema.AtribuicaoPaciente:
+    async def atribuir_paciente(db: AsyncSession, atribuicao_in: agente_schema.AtribuicaoPacienteCreate) -> agente_schema.AtribuicaoPaciente:
         # 1. Buscar o paciente para extrair os dados reais
-        from app.crud import crud_paciente
-        paciente = crud_paciente.get_by_id(db, id=atribuicao_in.paciente_id)
+        from app.crud import crud_paciente_async as crud_paciente
+        paciente = await crud_paciente.get_by_id(db, id=atribuicao_in.paciente_id)
         
         if not paciente:
             raise HTTPException(status_code=404, detail="Paciente não encontrado")
@@ -141,30 +150,30 @@ class AtribuicaoPacienteService:
         if not atribuicao_in.data_visita_planejada:
             atribuicao_in.data_visita_planejada = datetime.now()
 
-        db_atribuicao = crud_agente.create_atribuicao_paciente(db, atribuicao_in)
+        db_atribuicao = await crud_agente.create_atribuicao_paciente(db, atribuicao_in)
         return agente_schema.AtribuicaoPaciente.from_orm(db_atribuicao)
         
     @staticmethod
-    def listar_atribuicoes_agente(
-        db: Session,
+    async def listar_atribuicoes_agente(
+        db: AsyncSession,
         agente_id: int
     ) -> List[agente_schema.AtribuicaoPaciente]:
         """Lista todas as atribuições ativas de um agente"""
         # Verificar se agente existe
-        if not crud_agente.get_agente_by_id(db, agente_id):
+        if not await crud_agente.get_agente_by_id(db, agente_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Agente não encontrado"
             )
         
-        atribuicoes = crud_agente.get_atribuicoes_por_agente(db, agente_id)
+        atribuicoes = await crud_agente.get_atribuicoes_por_agente(db, agente_id)
         return [agente_schema.AtribuicaoPaciente.from_orm(a) for a in atribuicoes]
     
     
     @staticmethod
-    def buscar_atribuicao(db: Session, atribuicao_id: int) -> agente_schema.AtribuicaoPaciente:
+    async def buscar_atribuicao(db: AsyncSession, atribuicao_id: int) -> agente_schema.AtribuicaoPaciente:
         """Busca uma atribuição pelo ID"""
-        db_atribuicao = crud_agente.get_atribuicao_by_id(db, atribuicao_id)
+        db_atribuicao = await crud_agente.get_atribuicao_by_id(db, atribuicao_id)
         if not db_atribuicao:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -174,13 +183,13 @@ class AtribuicaoPacienteService:
     
     
     @staticmethod
-    def atualizar_atribuicao(
-        db: Session,
+    async def atualizar_atribuicao(
+        db: AsyncSession,
         atribuicao_id: int,
         atribuicao_in: agente_schema.AtribuicaoPacienteUpdate
     ) -> agente_schema.AtribuicaoPaciente:
         """Atualiza uma atribuição de paciente"""
-        db_atribuicao = crud_agente.update_atribuicao_paciente(db, atribuicao_id, atribuicao_in)
+        db_atribuicao = await crud_agente.update_atribuicao_paciente(db, atribuicao_id, atribuicao_in)
         if not db_atribuicao:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -190,9 +199,9 @@ class AtribuicaoPacienteService:
     
     
     @staticmethod
-    def deletar_atribuicao(db: Session, atribuicao_id: int) -> None:
+    async def deletar_atribuicao(db: AsyncSession, atribuicao_id: int) -> None:
         """Deleta uma atribuição de paciente"""
-        if not crud_agente.delete_atribuicao_paciente(db, atribuicao_id):
+        if not await crud_agente.delete_atribuicao_paciente(db, atribuicao_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Atribuição não encontrada"
@@ -200,9 +209,9 @@ class AtribuicaoPacienteService:
     
     
     @staticmethod
-    def concluir_atribuicao(db: Session, atribuicao_id: int) -> agente_schema.AtribuicaoPaciente:
+    async def concluir_atribuicao(db: AsyncSession, atribuicao_id: int) -> agente_schema.AtribuicaoPaciente:
         """Marca uma atribuição como concluída"""
-        db_atribuicao = crud_agente.desativar_atribuicao_paciente(db, atribuicao_id)
+        db_atribuicao = await crud_agente.desativar_atribuicao_paciente(db, atribuicao_id)
         if not db_atribuicao:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -212,16 +221,16 @@ class AtribuicaoPacienteService:
     
     
     @staticmethod
-    def enviar_para_app(db: Session, agente_id: int, atribuicao_id: int) -> Dict[str, Any]:
+    async def enviar_para_app(db: AsyncSession, agente_id: int, atribuicao_id: int) -> Dict[str, Any]:
         """Prepara dados completos incluindo os novos campos da IA para o app."""
-        atribuicao = crud_agente.get_atribuicao_by_id(db, atribuicao_id)
+        atribuicao = await crud_agente.get_atribuicao_by_id(db, atribuicao_id)
         
         if not atribuicao or atribuicao.agente_id != agente_id:
             raise HTTPException(status_code=404, detail="Atribuição não encontrada")
         
-        agente = crud_agente.get_agente_by_id(db, agente_id)
-        from app.crud import crud_paciente
-        paciente = crud_paciente.get_by_id(db, id=atribuicao.paciente_id)
+        agente = await crud_agente.get_agente_by_id(db, agente_id)
+        from app.crud import crud_paciente_async as crud_paciente
+        paciente = await crud_paciente.get_by_id(db, id=atribuicao.paciente_id)
         
         return {
             "tipo": "atribuicao_paciente",
@@ -246,9 +255,9 @@ class AtribuicaoPacienteService:
         
         return payload
     @staticmethod
-    def obter_detalhes_visita_app(db: Session, atribuicao_id: int) -> Dict[str, Any]:
+    async def obter_detalhes_visita_app(db: AsyncSession, atribuicao_id: int) -> Dict[str, Any]:
         """Busca rápida para o polling de resultados da IA no App."""
-        atribuicao = crud_agente.get_atribuicao_by_id(db, atribuicao_id)
+        atribuicao = await crud_agente.get_atribuicao_by_id(db, atribuicao_id)
         
         if not atribuicao:
             raise HTTPException(status_code=404, detail="Visita não encontrada")
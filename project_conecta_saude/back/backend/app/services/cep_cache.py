@@ -0,0 +1,142 @@
+"""
+Cache de geocodificação de CEPs em três camadas:
+
+1. Memória do processo (LRU com TTL)        -> microssegundos
+2. Redis (compartilhado entre réplicas)     -> ~1 ms
+3. Tabela 'ceps_geocodificados' no Postgres -> persistente entre deploys
+
+Resultados negativos (CEP inválido ou inexistente) também são cacheados,
+com TTL menor, para que CEPs ruins não gerem novas chamadas HTTP.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple, Any
+
+from app.core.cache import LRUTTLCache, MISS
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.geocoding_models import CepGeocodificado
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis é opcional: sem o pacote, o cache usa só memória + Postgres
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# (latitude, longitude, endereco_completo) ou None para CEP não encontrado
+CepResult = Optional[Tuple[float, float, str]]
+
+_REDIS_PREFIX = "cep:"
+
+
+class CepCache:
+    """Fachada das três camadas de cache usada pelo GeocodingService."""
+
+    def __init__(self):
+        self.memory = LRUTTLCache(settings.CEP_CACHE_MAX_ENTRIES)
+        self._redis = None
+        if aioredis is not None and settings.REDIS_URL:
+            self._redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+
+    @staticmethod
+    def _ttl(result: CepResult) -> int:
+        return settings.CEP_CACHE_TTL if result else settings.CEP_CACHE_NEGATIVE_TTL
+
+    async def get(self, cep: str) -> Any:
+        """Retorna o resultado cacheado do CEP (pode ser None) ou MISS."""
+        value = self.memory.get(cep)
+        if value is not MISS:
+            return value
+
+        value = await self._get_redis(cep)
+        if value is MISS:
+            value = await asyncio.to_thread(self._get_db, cep)
+            if value is not MISS:
+                await self._set_redis(cep, value)
+
+        if value is not MISS:
+            self.memory.set(cep, value, self._ttl(value))
+        return value
+
+    async def set(self, cep: str, result: CepResult) -> None:
+        """Grava o resultado (positivo ou negativo) em todas as camadas."""
+        self.memory.set(cep, result, self._ttl(result))
+        await self._set_redis(cep, result)
+        await asyncio.to_thread(self._set_db, cep, result)
+
+    # --- Redis ---
+
+    async def _get_redis(self, cep: str) -> Any:
+        if self._redis is None:
+            return MISS
+        try:
+            raw = await self._redis.get(_REDIS_PREFIX + cep)
+        except Exception as e:
+            logger.warning(f"Redis indisponível para leitura do cache de CEP: {e}")
+            return MISS
+        if raw is None:
+            return MISS
+        data = json.loads(raw)
+        return tuple(data) if data else None
+
+    async def _set_redis(self, cep: str, result: CepResult) -> None:
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(
+                _REDIS_PREFIX + cep,
+                json.dumps(list(result) if result else None),
+                ex=self._ttl(result),
+            )
+        except Exception as e:
+            logger.warning(f"Redis indisponível para escrita do cache de CEP: {e}")
+
+    # --- Postgres ---
+
+    def _get_db(self, cep: str) -> Any:
+        db = SessionLocal()
+        try:
+            row = db.query(CepGeocodificado).filter(CepGeocodificado.cep == cep).first()
+            if row is None:
+                return MISS
+            ttl = settings.CEP_CACHE_TTL if row.encontrado else settings.CEP_CACHE_NEGATIVE_TTL
+            updated_at = row.updated_at
+            if updated_at is not None:
+                if updated_at.tzinfo is None:
+                    updated_at = updated_at.replace(tzinfo=timezone.utc)
+                if updated_at < datetime.now(timezone.utc) - timedelta(seconds=ttl):
+                    return MISS
+            if not row.encontrado:
+                return None
+            return (row.latitude, row.longitude, row.endereco)
+        except Exception as e:
+            logger.warning(f"Falha ao ler cache de CEP no banco: {e}")
+            return MISS
+        finally:
+            db.close()
+
+    def _set_db(self, cep: str, result: CepResult) -> None:
+        db = SessionLocal()
+        try:
+            latitude, longitude, endereco = result if result else (None, None, None)
+            db.merge(CepGeocodificado(
+                cep=cep,
+                encontrado=result is not None,
+                latitude=latitude,
+                longitude=longitude,
+                endereco=endereco,
+                updated_at=datetime.now(timezone.utc),
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Falha ao gravar cache de CEP no banco: {e}")
+        finally:
+            db.close()
+
+
+# Instância única usada pela aplicação
+cep_cache = CepCache()
@@ -0,0 +1,176 @@
+"""
+Índice offline de CEPs carregado de um arquivo local (CSV ou CSV.gz).
+
+Formato esperado (com cabeçalho):
+    cep,latitude,longitude[,endereco][,cidade][,uf]
+
+Os dados ficam em arrays compactos ordenados por CEP (busca binária) e os
+endereços num único blob UTF-8 com offsets, evitando milhões de objetos str.
+Para um CEP de 8 dígitos ausente no arquivo, o índice devolve o centróide do
+setor (5 primeiros dígitos), calculado na carga.
+"""
+import csv
+import gzip
+import logging
+import re
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CepResult = Tuple[float, float, str]
+
+# Tipos NumPy equivalentes aos typecodes de array usados no índice
+_DTYPES = {"I": np.uint32, "d": np.float64}
+
+
+def _to_array(typecode: str, values: np.ndarray) -> array:
+    result = array(typecode)
+    result.frombytes(values.astype(_DTYPES[typecode]).tobytes())
+    return result
+
+
+class CepIndex:
+    """Índice CEP -> (latitude, longitude, endereço) em arrays ordenados."""
+
+    def __init__(self):
+        self._ceps = array("I")
+        self._lats = array("d")
+        self._lons = array("d")
+        self._addr_offsets = array("I", [0])
+        self._addr_blob = b""
+
+        # Centróides por setor (5 dígitos)
+        self._setores = array("I")
+        self._setor_lats = array("d")
+        self._setor_lons = array("d")
+        self._setor_addr_offsets = array("I", [0])
+        self._setor_addr_blob = b""
+
+    def __len__(self) -> int:
+        return len(self._ceps)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "CepIndex":
+        """Carrega o índice a partir do arquivo de dataset (uma passada, direto em arrays)."""
+        opener = gzip.open if path.suffix == ".gz" else open
+        ceps = array("I")
+        lats = array("d")
+        lons = array("d")
+        addr_offsets = array("I", [0])
+        addr_blob = bytearray()
+        cidades = {}  # setor -> (menor CEP, "cidade - UF")
+        with opener(path, "rt", encoding="utf-8", newline="") as f:
+            for record in csv.DictReader(f):
+                cep = re.sub(r"\D", "", record.get("cep") or "")
+                try:
+                    latitude = float(record["latitude"])
+                    longitude = float(record["longitude"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if len(cep) != 8:
+                    continue
+                endereco = (record.get("endereco") or "").strip()
+                cidade_uf = " - ".join(
+                    p for p in ((record.get("cidade") or "").strip(), (record.get("uf") or "").strip()) if p
+                )
+                if not endereco:
+                    endereco = cidade_uf
+                numero = int(cep)
+                ceps.append(numero)
+                lats.append(latitude)
+                lons.append(longitude)
+                addr_blob += endereco.encode("utf-8")
+                addr_offsets.append(len(addr_blob))
+                setor = numero // 1000
+                atual = cidades.get(setor)
+                if atual is None or numero < atual[0]:
+                    cidades[setor] = (numero, cidade_uf)
+
+        index = cls()
+        index._build(ceps, lats, lons, addr_offsets, bytes(addr_blob), cidades)
+        return index
+
+    def _build(self, ceps: array, lats: array, lons: array, addr_offsets: array,
+               addr_blob: bytes, cidades: dict) -> None:
+        keys = np.frombuffer(ceps, dtype=_DTYPES["I"])
+        if len(keys) > 1 and not (keys[1:] > keys[:-1]).all():
+            # Ordenação estável: em CEP duplicado a primeira ocorrência vem antes e é mantida
+            ordem = np.argsort(keys, kind="stable")
+            sorted_keys = keys[ordem]
+            keep = np.ones(len(ordem), dtype=bool)
+            keep[1:] = sorted_keys[1:] != sorted_keys[:-1]
+            ordem = ordem[keep]
+            ceps = _to_array("I", sorted_keys[keep])
+            lats = _to_array("d", np.frombuffer(lats, dtype=_DTYPES["d"])[ordem])
+            lons = _to_array("d", np.frombuffer(lons, dtype=_DTYPES["d"])[ordem])
+            blob = bytearray()
+            offsets = array("I", [0])
+            for i in ordem.tolist():
+                blob += addr_blob[addr_offsets[i]:addr_offsets[i + 1]]
+                offsets.append(len(blob))
+            addr_offsets, addr_blob = offsets, bytes(blob)
+        self._ceps, self._lats, self._lons = ceps, lats, lons
+        self._addr_offsets, self._addr_blob = addr_offsets, addr_blob
+
+        # Centróides por setor (5 dígitos)
+        setores, inverse = np.unique(np.frombuffer(ceps, dtype=_DTYPES["I"]) // 1000, return_inverse=True)
+        count = np.bincount(inverse)
+        self._setores = _to_array("I", setores)
+        self._setor_lats = _to_array("d", np.bincount(inverse, weights=np.frombuffer(lats, dtype=_DTYPES["d"])) / count)
+        self._setor_lons = _to_array("d", np.bincount(inverse, weights=np.frombuffer(lons, dtype=_DTYPES["d"])) / count)
+        setor_parts = []
+        offset = 0
+        for setor in setores.tolist():
+            encoded = cidades[setor][1].encode("utf-8")
+            setor_parts.append(encoded)
+            offset += len(encoded)
+            self._setor_addr_offsets.append(offset)
+        self._setor_addr_blob = b"".join(setor_parts)
+
+    @staticmethod
+    def _find(keys: array, key: int) -> Optional[int]:
+        pos = bisect_left(keys, key)
+        if pos < len(keys) and keys[pos] == key:
+            return pos
+        return None
+
+    def lookup_exact(self, cep: str) -> Optional[CepResult]:
+        """Busca o CEP exato (8 dígitos, sem formatação)."""
+        pos = self._find(self._ceps, int(cep))
+        if pos is None:
+            return None
+        endereco = self._addr_blob[self._addr_offsets[pos]:self._addr_offsets[pos + 1]]
+        return (self._lats[pos], self._lons[pos], endereco.decode("utf-8"))
+
+    def lookup_sector(self, cep: str) -> Optional[CepResult]:
+        """Retorna o centróide do setor (5 primeiros dígitos) do CEP."""
+        pos = self._find(self._setores, int(cep) // 1000)
+        if pos is None:
+            return None
+        endereco = self._setor_addr_blob[
+            self._setor_addr_offsets[pos]:self._setor_addr_offsets[pos + 1]
+        ]
+        return (self._setor_lats[pos], self._setor_lons[pos], endereco.decode("utf-8"))
+
+
+# Índice carregado no startup (None se não houver dataset configurado)
+cep_index: Optional[CepIndex] = None
+
+
+def load_cep_index(path: Optional[str]) -> Optional[CepIndex]:
+    """Carrega o dataset configurado em CEP_DATASET_PATH (se existir)."""
+    global cep_index
+    if not path:
+        return None
+    dataset = Path(path)
+    if not dataset.exists():
+        logger.warning(f"Dataset de CEPs não encontrado em {dataset}; usando apenas APIs externas")
+        return None
+    cep_index = CepIndex.from_file(dataset)
+    logger.info(f"Índice offline de CEPs carregado: {len(cep_index)} CEPs de {dataset}")
+    return cep_index
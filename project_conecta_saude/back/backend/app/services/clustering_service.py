@@ -0,0 +1,373 @@
+"""
+Clusterização de pacientes em microrregiões (K-means) no backend.
+
+Substitui o K-means que rodava no navegador (frontend/src/utils/kmeans.ts)
+sobre a lista completa de pacientes. Aqui o algoritmo é vetorizado com NumPy
+(mini-batch K-means para populações grandes), o k pode ser sugerido por
+cotovelo/silhueta numa amostra, e o resultado fica em cache por (k, filtro).
+
+O cache é atualizado incrementalmente: quando um paciente é adicionado ou
+muda de coordenadas, ele é atribuído ao centróide mais próximo e os
+centróides são ajustados por média móvel. Depois de muitas mudanças
+(CLUSTERING_MAX_INCREMENTAL_FRACTION) o resultado é recalculado do zero.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app import crud
+
+logger = logging.getLogger(__name__)
+
+FILTROS = ("todos", "outliers", "estaveis")
+
+# Linhas processadas por vez no cálculo de distâncias (limita memória)
+_CHUNK = 20000
+
+
+# =================================================================
+# K-means vetorizado
+# =================================================================
+
+def _project(lat: np.ndarray, lon: np.ndarray, cos_ref: float) -> np.ndarray:
+    """Projeção equiretangular local: distâncias euclidianas ~ proporcionais a km."""
+    return np.column_stack((lon * cos_ref, lat))
+
+
+def _assign(X: np.ndarray, centers: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Atribui cada ponto ao centróide mais próximo. Retorna (labels, inércia)."""
+    labels = np.empty(len(X), dtype=np.int64)
+    inertia = 0.0
+    c_sq = (centers ** 2).sum(axis=1)
+    for start in range(0, len(X), _CHUNK):
+        block = X[start:start + _CHUNK]
+        d2 = (block ** 2).sum(axis=1)[:, None] - 2.0 * block @ centers.T + c_sq[None, :]
+        block_labels = d2.argmin(axis=1)
+        labels[start:start + _CHUNK] = block_labels
+        inertia += float(np.clip(d2[np.arange(len(block)), block_labels], 0, None).sum())
+    return labels, inertia
+
+
+def _kmeans_pp_init(X: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Inicialização K-means++ (mesma estratégia do kmeans.ts)."""
+    n = len(X)
+    centers = np.empty((k, X.shape[1]))
+    centers[0] = X[rng.integers(n)]
+    d2 = ((X - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        total = d2.sum()
+        idx = rng.integers(n) if total <= 0 else rng.choice(n, p=d2 / total)
+        centers[i] = X[idx]
+        d2 = np.minimum(d2, ((X - centers[i]) ** 2).sum(axis=1))
+    return centers
+
+
+def kmeans(
+    X: np.ndarray, k: int, *, max_iter: int = 100, tol: float = 1e-6, seed: int = 42
+) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    K-means (Lloyd) vetorizado.
+    Retorna (centróides, labels, inércia).
+    """
+    rng = np.random.default_rng(seed)
+    centers = _kmeans_pp_init(X, k, rng)
+    labels = np.zeros(len(X), dtype=np.int64)
+    inertia = 0.0
+    for _ in range(max_iter):
+        labels, inertia = _assign(X, centers)
+        counts = np.bincount(labels, minlength=k)
+        new_centers = np.column_stack([
+            np.bincount(labels, weights=X[:, d], minlength=k) for d in range(X.shape[1])
+        ])
+        empty = counts == 0
+        new_centers[~empty] /= counts[~empty, None]
+        if empty.any():
+            # Cluster vazio: reposiciona nos pontos mais distantes do seu centróide
+            far = np.argsort(((X - centers[labels]) ** 2).sum(axis=1))[::-1][:empty.sum()]
+            new_centers[empty] = X[far]
+        shift = float(((new_centers - centers) ** 2).sum())
+        centers = new_centers
+        if shift < tol:
+            break
+    labels, inertia = _assign(X, centers)
+    return centers, labels, inertia
+
+
+def minibatch_kmeans(
+    X: np.ndarray, k: int, *, batch_size: int = 2048, max_iter: int = 100, seed: int = 42
+) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Mini-batch K-means (Sculley, 2010) para populações grandes.
+    Cada iteração usa uma amostra; a taxa de aprendizado de cada centróide
+    decai com a quantidade de pontos que ele já recebeu.
+    """
+    rng = np.random.default_rng(seed)
+    init_sample = X[rng.choice(len(X), size=min(len(X), batch_size * 4), replace=False)]
+    centers = _kmeans_pp_init(init_sample, k, rng)
+    seen = np.zeros(k)
+    for _ in range(max_iter):
+        batch = X[rng.integers(0, len(X), size=batch_size)]
+        labels, _ = _assign(batch, centers)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.column_stack([
+            np.bincount(labels, weights=batch[:, d], minlength=k) for d in range(X.shape[1])
+        ])
+        hit = counts > 0
+        seen[hit] += counts[hit]
+        eta = counts[hit] / seen[hit]
+        centers[hit] += eta[:, None] * (sums[hit] / counts[hit, None] - centers[hit])
+    labels, inertia = _assign(X, centers)
+    return centers, labels, inertia
+
+
+def _silhouette(X: np.ndarray, labels: np.ndarray, k: int) -> float:
+    """Silhueta média (vetorizada; usar apenas em amostras)."""
+    if k < 2 or len(X) <= k:
+        return -1.0
+    sq = (X ** 2).sum(axis=1)
+    D = np.sqrt(np.clip(sq[:, None] - 2.0 * X @ X.T + sq[None, :], 0, None))
+    onehot = np.zeros((len(X), k))
+    onehot[np.arange(len(X)), labels] = 1.0
+    counts = onehot.sum(axis=0)
+    sums = D @ onehot  # soma das distâncias de cada ponto a cada cluster
+    own = counts[labels]
+    a = np.where(own > 1, sums[np.arange(len(X)), labels] / np.maximum(own - 1, 1), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_other = sums / counts[None, :]
+    mean_other[np.arange(len(X)), labels] = np.inf
+    mean_other[:, counts == 0] = np.inf
+    b = mean_other.min(axis=1)
+    s = np.where(own > 1, (b - a) / np.maximum(a, b), 0.0)
+    return float(np.nan_to_num(s).mean())
+
+
+def suggest_k(X: np.ndarray, *, k_min: int = 2, k_max: int = 10, sample_size: int = 1500, seed: int = 42) -> dict:
+    """
+    Sugere k por silhueta (e informa o k do cotovelo) numa amostra dos pontos.
+    """
+    rng = np.random.default_rng(seed)
+    if len(X) > sample_size:
+        X = X[rng.choice(len(X), size=sample_size, replace=False)]
+    k_max = min(k_max, len(X) - 1)
+    if k_max < k_min:
+        return {"k_sugerido": max(1, min(k_min, len(X))), "k_cotovelo": None, "candidatos": []}
+
+    candidatos = []
+    for k in range(k_min, k_max + 1):
+        _, labels, inertia = kmeans(X, k, seed=seed)
+        candidatos.append({"k": k, "inercia": inertia, "silhueta": _silhouette(X, labels, k)})
+
+    # Cotovelo: ponto mais distante da reta entre o primeiro e o último k
+    ks = np.array([c["k"] for c in candidatos], dtype=float)
+    inertias = np.array([c["inercia"] for c in candidatos])
+    k_cotovelo = None
+    if len(candidatos) >= 3 and inertias[0] > inertias[-1]:
+        xs = (ks - ks[0]) / (ks[-1] - ks[0])
+        ys = (inertias - inertias[-1]) / (inertias[0] - inertias[-1])
+        k_cotovelo = int(ks[np.argmax(np.abs(1 - xs - ys))])
+
+    best = max(candidatos, key=lambda c: c["silhueta"])
+    return {"k_sugerido": best["k"], "k_cotovelo": k_cotovelo, "candidatos": candidatos}
+
+
+# =================================================================
+# Cache por (k, filtro) com atualização incremental
+# =================================================================
+
+@dataclass
+class _ClusteringResult:
+    k: int
+    filtro: str
+    cos_ref: float
+    centers: np.ndarray  # coordenadas projetadas
+    counts: np.ndarray
+    outliers: np.ndarray
+    # paciente_id -> (label, x, y, is_outlier)
+    members: Dict[int, Tuple[int, float, float, bool]] = field(default_factory=dict)
+    base_n: int = 0
+    incremental_changes: int = 0
+    computed_at: float = field(default_factory=time.time)
+
+    def _remove(self, paciente_id: int) -> None:
+        label, x, y, is_outlier = self.members.pop(paciente_id)
+        n = self.counts[label]
+        if n > 1:
+            self.centers[label] = (self.centers[label] * n - (x, y)) / (n - 1)
+        self.counts[label] -= 1
+        self.outliers[label] -= int(is_outlier)
+
+    def _add(self, paciente_id: int, x: float, y: float, is_outlier: bool) -> None:
+        point = np.array([x, y])
+        label = int(((self.centers - point) ** 2).sum(axis=1).argmin())
+        n = self.counts[label]
+        self.centers[label] = (self.centers[label] * n + point) / (n + 1)
+        self.counts[label] += 1
+        self.outliers[label] += int(is_outlier)
+        self.members[paciente_id] = (label, x, y, is_outlier)
+
+
+def _matches(filtro: str, is_outlier: Optional[bool]) -> bool:
+    if filtro == "outliers":
+        return bool(is_outlier)
+    if filtro == "estaveis":
+        return not is_outlier
+    return True
+
+
+class ClusteringCache:
+    """Cache em memória (por processo) dos resultados de K-means."""
+
+    def __init__(self):
+        self._results: Dict[Tuple[int, str], _ClusteringResult] = {}
+        self._suggestions: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._results.clear()
+            self._suggestions.clear()
+
+    def notify_patient(
+        self, paciente_id: int, latitude: Optional[float], longitude: Optional[float],
+        is_outlier: Optional[bool]
+    ) -> None:
+        """Paciente criado/movido/reclassificado: atualiza os resultados em cache."""
+        with self._lock:
+            self._suggestions.clear()
+            for key, result in list(self._results.items()):
+                if paciente_id in result.members:
+                    result._remove(paciente_id)
+                if latitude is not None and longitude is not None and _matches(result.filtro, is_outlier):
+                    x, y = longitude * result.cos_ref, latitude
+                    result._add(paciente_id, x, y, bool(is_outlier))
+                result.incremental_changes += 1
+                self._drop_if_stale(key, result)
+
+    def notify_removed(self, paciente_id: int) -> None:
+        """Paciente removido: tira o ponto dos resultados em cache."""
+        self.notify_patient(paciente_id, None, None, None)
+
+    def _drop_if_stale(self, key, result: _ClusteringResult) -> None:
+        limit = max(1, int(result.base_n * settings.CLUSTERING_MAX_INCREMENTAL_FRACTION))
+        if result.incremental_changes > limit:
+            # Muitas mudanças acumuladas: o próximo acesso recalcula do zero
+            del self._results[key]
+
+    def get(self, key) -> Optional[_ClusteringResult]:
+        with self._lock:
+            return self._results.get(key)
+
+    def put(self, key, result: _ClusteringResult) -> None:
+        with self._lock:
+            self._results[key] = result
+
+    def get_suggestion(self, filtro: str) -> Optional[dict]:
+        with self._lock:
+            return self._suggestions.get(filtro)
+
+    def put_suggestion(self, filtro: str, suggestion: dict) -> None:
+        with self._lock:
+            self._suggestions[filtro] = suggestion
+
+
+clustering_cache = ClusteringCache()
+
+
+def _load_points(db: Session, filtro: str):
+    rows = crud.get_all_with_coordinates(db)
+    rows = [r for r in rows if _matches(filtro, r.is_outlier)]
+    ids = np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows))
+    lat = np.fromiter((r.latitude for r in rows), dtype=float, count=len(rows))
+    lon = np.fromiter((r.longitude for r in rows), dtype=float, count=len(rows))
+    outlier = np.fromiter((bool(r.is_outlier) for r in rows), dtype=bool, count=len(rows))
+    return ids, lat, lon, outlier
+
+
+def _compute(db: Session, k: int, filtro: str) -> Optional[_ClusteringResult]:
+    ids, lat, lon, outlier = _load_points(db, filtro)
+    if len(ids) == 0:
+        return None
+    k = min(k, len(ids))
+    cos_ref = float(np.cos(np.radians(lat.mean())))
+    X = _project(lat, lon, cos_ref)
+
+    started = time.perf_counter()
+    if len(X) > settings.CLUSTERING_MINIBATCH_THRESHOLD:
+        centers, labels, _ = minibatch_kmeans(X, k)
+    else:
+        centers, labels, _ = kmeans(X, k)
+    logger.info(f"K-means (k={k}, filtro={filtro}, n={len(X)}) em "
+                f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    result = _ClusteringResult(
+        k=k, filtro=filtro, cos_ref=cos_ref, centers=centers,
+        counts=np.bincount(labels, minlength=k).astype(np.int64),
+        outliers=np.bincount(labels, weights=outlier, minlength=k).astype(np.int64),
+        base_n=len(ids),
+    )
+    result.members = {
+        int(pid): (int(label), float(x), float(y), bool(o))
+        for pid, label, (x, y), o in zip(ids, labels, X, outlier)
+    }
+    return result
+
+
+def get_suggested_k(db: Session, *, filtro: str = "todos") -> dict:
+    """Sugestão de k (cotovelo/silhueta numa amostra), em cache por filtro."""
+    cached = clustering_cache.get_suggestion(filtro)
+    if cached is not None:
+        return cached
+    _, lat, lon, _ = _load_points(db, filtro)
+    if len(lat) == 0:
+        return {"k_sugerido": 1, "k_cotovelo": None, "candidatos": []}
+    X = _project(lat, lon, float(np.cos(np.radians(lat.mean()))))
+    suggestion = suggest_k(X, k_max=settings.CLUSTERING_MAX_K)
+    clustering_cache.put_suggestion(filtro, suggestion)
+    return suggestion
+
+
+def get_microrregioes(
+    db: Session, *, k: Optional[int] = None, filtro: str = "todos", incluir_pacientes: bool = False
+) -> dict:
+    """
+    Retorna as microrregiões (clusters) dos pacientes.
+    Se 'k' não for informado, usa o k sugerido pela silhueta.
+    """
+    if k is None:
+        k = get_suggested_k(db, filtro=filtro)["k_sugerido"]
+
+    key = (k, filtro)
+    result = clustering_cache.get(key)
+    from_cache = result is not None
+    if result is None:
+        result = _compute(db, k, filtro)
+        if result is None:
+            return {"k": k, "filtro": filtro, "total": 0, "cache": False, "clusters": []}
+        clustering_cache.put(key, result)
+
+    with clustering_cache._lock:
+        pacientes_por_cluster: Dict[int, List[int]] = {}
+        if incluir_pacientes:
+            for pid, (label, _, _, _) in result.members.items():
+                pacientes_por_cluster.setdefault(label, []).append(pid)
+        clusters = [
+            {
+                "id": i,
+                "latitude": float(result.centers[i, 1]),
+                "longitude": float(result.centers[i, 0] / result.cos_ref),
+                "total": int(result.counts[i]),
+                "outliers": int(result.outliers[i]),
+                "paciente_ids": pacientes_por_cluster.get(i, []) if incluir_pacientes else None,
+            }
+            for i in range(result.k)
+            if result.counts[i] > 0
+        ]
+        total = int(result.counts.sum())
+
+    return {"k": result.k, "filtro": filtro, "total": total, "cache": from_cache, "clusters": clusters}
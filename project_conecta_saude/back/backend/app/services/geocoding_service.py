@@ -1,9 +1,16 @@
 """
-Serviço de Geocodificação usando BrasilAPI V2 + Nominatim (fallback)
+Serviço de Geocodificação usando BrasilAPI V2 + Nominatim (fallback),
+com índice offline de CEPs (ver cep_index.py) e cache de CEPs em
+memória, Redis e Postgres (ver cep_cache.py).
 """
 import httpx
+import re
 from typing import Optional, Tuple
 import logging
+from app.core.config import settings
+from .cep_cache import cep_cache, MISS
+from .upstreams import CircuitOpenError, brasilapi_upstream, nominatim_upstream
+from . import cep_index as offline
 
 logger = logging.getLogger(__name__)
 
@@ -14,41 +21,55 @@ class GeocodingService:
     NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
     
     @staticmethod
-    async def _geocode_with_nominatim(endereco: str, city: str, state: str) -> Optional[Tuple[float, float]]:
+    async def _geocode_with_nominatim(
+        endereco: str, city: str, state: str
+    ) -> Tuple[Optional[Tuple[float, float]], bool]:
         """
         Usa Nominatim do OpenStreetMap para geocodificar um endereço.
+
+        Returns:
+            Tupla (coordenadas, definitivo). 'definitivo' é False em erros
+            transitórios (timeout, 429/5xx, circuito aberto): a falta de
+            coordenadas só é definitiva quando o Nominatim responde 200 sem
+            nenhum resultado.
         """
         try:
             query = f"{endereco}, {city}, {state}, Brazil"
             
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    GeocodingService.NOMINATIM_URL,
-                    params={
-                        "q": query,
-                        "format": "json",
-                        "limit": 1,
-                        "countrycodes": "br"
-                    },
-                    headers={"User-Agent": "ConectaSaude/1.0"}
-                )
-                
-                if response.status_code == 200:
-                    results = response.json()
-                    if results and len(results) > 0:
-                        lat = float(results[0]["lat"])
-                        lon = float(results[0]["lon"])
-                        logger.info(f"Geocodificação Nominatim bem-sucedida: ({lat}, {lon})")
-                        return (lat, lon)
+            # Pool compartilhado (keep-alive); o User-Agent é definido no upstream
+            response = await nominatim_upstream.get(
+                GeocodingService.NOMINATIM_URL,
+                params={
+                    "q": query,
+                    "format": "json",
+                    "limit": 1,
+                    "countrycodes": "br"
+                },
+            )
+            
+            if response.status_code != 200:
+                logger.error(f"Erro ao geocodificar com Nominatim: Status {response.status_code}")
+                return None, False
+            results = response.json()
+            if not results:
+                return None, True
+            lat = float(results[0]["lat"])
+            lon = float(results[0]["lon"])
+            logger.info(f"Geocodificação Nominatim bem-sucedida: ({lat}, {lon})")
+            return (lat, lon), True
+        except CircuitOpenError:
+            logger.warning("Nominatim indisponível (circuito aberto)")
         except Exception as e:
             logger.error(f"Erro ao geocodificar com Nominatim: {str(e)}")
         
-        return None
+        return None, False
     
     @staticmethod
     async def get_coordinates_from_cep(cep: str) -> Optional[Tuple[float, float, str]]:
         """
         Busca as coordenadas (latitude, longitude) e endereço completo a partir de um CEP.
+        Ordem de consulta: índice offline (CEP exato) -> cache (memória ->
+        Redis -> Postgres) -> centróide do setor no índice offline -> APIs externas.
         
         Args:
             cep: CEP no formato "12345-678" ou "12345678"
@@ -57,57 +78,102 @@ class GeocodingService:
             Tupla (latitude, longitude, endereco_completo) ou None se falhar
         """
         # Remove caracteres não numéricos do CEP
-        cep_limpo = cep.replace("-", "").replace(".", "").strip()
+        cep_limpo = re.sub(r"\D", "", cep or "")
         
         if len(cep_limpo) != 8:
             logger.warning(f"CEP inválido: {cep}")
             return None
         
+        # 1. Índice offline (CEP exato)
+        index = offline.cep_index
+        if index is not None:
+            result = index.lookup_exact(cep_limpo)
+            if result:
+                return result
+        
+        # 2. Cache de resultados das APIs externas
+        cached = await cep_cache.get(cep_limpo)
+        if cached is not MISS and cached is not None:
+            return cached
+        
+        # 3. Centróide do setor (5 dígitos) no índice offline; também vale
+        # para CEPs que as APIs já responderam como não encontrados
+        if index is not None and settings.CEP_OFFLINE_SECTOR_FALLBACK:
+            result = index.lookup_sector(cep_limpo)
+            if result:
+                logger.info(f"CEP {cep_limpo} fora do índice; usando centróide do setor {cep_limpo[:5]}")
+                return result
+        if cached is None:
+            return None  # negativo no cache: não consulta as APIs de novo
+        
+        # 4. APIs externas (BrasilAPI + Nominatim)
+        result, cacheable = await GeocodingService._fetch_from_apis(cep_limpo)
+        if cacheable:
+            await cep_cache.set(cep_limpo, result)
+        return result
+    
+    @staticmethod
+    async def _fetch_from_apis(cep: str) -> Tuple[Optional[Tuple[float, float, str]], bool]:
+        """
+        Consulta BrasilAPI (+ Nominatim como fallback de coordenadas).
+        
+        Returns:
+            Tupla (resultado, cacheavel). Erros transitórios (timeout, 5xx)
+            não são cacheados; CEP inexistente é cacheado como negativo.
+        """
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{GeocodingService.BRASILAPI_URL}/{cep_limpo}")
+            response = await brasilapi_upstream.get(f"{GeocodingService.BRASILAPI_URL}/{cep}")
+            
+            if response.status_code == 200:
+                data = response.json()
+                
+                # Monta o endereço completo
+                street = data.get('street', '')
+                neighborhood = data.get('neighborhood', '')
+                city = data.get('city', '')
+                state = data.get('state', '')
+                
+                endereco_completo = f"{street}, {neighborhood}, {city} - {state}".strip()
+                
+                # Tenta obter coordenadas da BrasilAPI
+                location = data.get("location", {})
+                coordinates = location.get("coordinates", {})
+                latitude = coordinates.get("latitude")
+                longitude = coordinates.get("longitude")
+                
+                # Se BrasilAPI não retornou coordenadas, usa Nominatim como fallback
+                definitivo = True
+                if not latitude or not longitude:
+                    logger.info(f"BrasilAPI sem coordenadas, usando Nominatim para CEP {cep}")
+                    coords, definitivo = await GeocodingService._geocode_with_nominatim(
+                        street or neighborhood, city, state
+                    )
+                    if coords:
+                        latitude, longitude = coords
+                
+                if latitude and longitude:
+                    logger.info(f"Geocodificação bem-sucedida para CEP {cep}: ({latitude}, {longitude})")
+                    return (float(latitude), float(longitude), endereco_completo), True
+                
+                logger.warning(f"Não foi possível obter coordenadas para o CEP: {cep}")
+                # Falha transitória do Nominatim não vira negativo no cache
+                return None, definitivo
+            elif response.status_code in (400, 404):
+                logger.warning(f"CEP {cep} não encontrado na BrasilAPI")
+                return None, True
+            else:
+                logger.error(f"Erro ao buscar CEP {cep}: Status {response.status_code}")
+                return None, False
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    # Monta o endereço completo
-                    street = data.get('street', '')
-                    neighborhood = data.get('neighborhood', '')
-                    city = data.get('city', '')
-                    state = data.get('state', '')
-                    
-                    endereco_completo = f"{street}, {neighborhood}, {city} - {state}".strip()
-                    
-                    # Tenta obter coordenadas da BrasilAPI
-                    location = data.get("location", {})
-                    coordinates = location.get("coordinates", {})
-                    latitude = coordinates.get("latitude")
-                    longitude = coordinates.get("longitude")
-                    
-                    # Se BrasilAPI não retornou coordenadas, usa Nominatim como fallback
-                    if not latitude or not longitude:
-                        logger.info(f"BrasilAPI sem coordenadas, usando Nominatim para CEP {cep}")
-                        coords = await GeocodingService._geocode_with_nominatim(street or neighborhood, city, state)
-                        if coords:
-                            latitude, longitude = coords
-                    
-                    if latitude and longitude:
-                        logger.info(f"Geocodificação bem-sucedida para CEP {cep}: ({latitude}, {longitude})")
-                        return (float(latitude), float(longitude), endereco_completo)
-                    
-                    logger.warning(f"Não foi possível obter coordenadas para o CEP: {cep}")
-                    # Retorna o endereço mesmo sem coordenadas
-                    return None
-                else:
-                    logger.error(f"Erro ao buscar CEP {cep}: Status {response.status_code}")
-                    return None
-                    
         except httpx.TimeoutException:
             logger.error(f"Timeout ao buscar CEP {cep}")
-            return None
+            return None, False
+        except CircuitOpenError:
+            logger.warning(f"BrasilAPI indisponível (circuito aberto); CEP {cep} não geocodificado")
+            return None, False
         except Exception as e:
             logger.error(f"Erro ao geocodificar CEP {cep}: {str(e)}")
-            return None
+            return None, False
     
     @staticmethod
     async def get_address_from_cep(cep: str) -> Optional[str]:
@@ -1,30 +1,51 @@
+import asyncio
 import httpx
+import logging
+from typing import List, Optional
+from urllib.parse import urlsplit, urlunsplit
 from fastapi import HTTPException, status
 from app.core.config import settings
+from .resultado_cache import ml_result_cache, llm_result_cache, quantizar_features, MISS
+from .upstreams import CircuitOpenError, ml_upstream, llm_upstream
 
-# Usamos um AsyncClient para chamadas de API assíncronas
-# Isso evita que nosso servidor trave enquanto espera a resposta do ML/LLM
-client = httpx.AsyncClient(
-    timeout=30.0  # timeout de 30 segundos
-)
+logger = logging.getLogger(__name__)
 
-async def call_ml_service(data: dict) -> dict:
+# Clientes assíncronos com pool, timeout, retry e circuit breaker por serviço
+# (ver upstreams.py). Isso evita que nosso servidor trave esperando o ML/LLM.
+
+async def call_ml_service(data: dict, use_cache: bool = True) -> dict:
     """
     Chama o microserviço de classificação de ML.
-    (Esta é a função que estava faltando)
+    O resultado é memoizado pelo vetor de features (mesmo vetor, mesma
+    classificação enquanto a versão do modelo não mudar).
     """
+    if not use_cache:
+        return await _post_ml_service(data)
+    return await ml_result_cache.get_or_call(data, lambda: _post_ml_service(data))
+
+
+async def _post_ml_service(data: dict) -> dict:
     url = settings.ML_SERVICE_URL # "http://localhost:8001/classify"
     
     try:
-        response = await client.post(url, json=data)
+        response = await ml_upstream.post(url, json=data)
         response.raise_for_status() # Lança exceção se for 4xx ou 5xx
-        return response.json()
+        result = response.json()
+        # Serviço informando outra versão de modelo: as chaves antigas deixam de valer
+        ml_result_cache.set_version(result.get("model_version"))
+        return result
     
     except httpx.HTTPStatusError as e:
         # O serviço de ML retornou um erro (ex: 422 Unprocessable Entity)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Erro ao classificar paciente (ML): {e.response.json()}"
+            detail=f"Erro ao classificar paciente (ML): {_corpo_erro(e.response)}"
+        )
+    except CircuitOpenError:
+        # Falhas seguidas recentes: falha rápido em vez de esperar o timeout
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serviço de classificação (ML) indisponível (circuito aberto)"
         )
     except httpx.RequestError as e:
         # Erro de conexão (serviço ML está offline)
@@ -33,18 +54,134 @@ async def call_ml_service(data: dict) -> dict:
             detail=f"Serviço de classificação (ML) está offline: {e}"
         )
 
-async def call_llm_service(data: dict) -> dict:
+async def refresh_ml_model_version(retry: bool = True) -> Optional[str]:
+    """
+    Consulta a versão ativa do modelo (GET / do serviço de ML) e atualiza a
+    versão das chaves do cache. Retorna a versão ou None se a consulta falhar.
+    """
+    url = settings.ML_SERVICE_INFO_URL
+    if not url:
+        partes = urlsplit(settings.ML_SERVICE_URL)
+        url = urlunsplit((partes.scheme, partes.netloc, "/", "", ""))
+    try:
+        response = await ml_upstream.get(url, retry=retry)
+        response.raise_for_status()
+        version = response.json().get("model_version")
+    except (httpx.HTTPError, CircuitOpenError, ValueError) as e:
+        logger.warning(f"Não foi possível consultar a versão do modelo de ML: {e}")
+        return None
+    ml_result_cache.set_version(version)
+    return version
+
+
+async def watch_ml_model_version() -> None:
+    """
+    Laço em background: reconsulta a versão a cada
+    ML_MODEL_VERSION_REFRESH_INTERVAL segundos, para que uma recarga ou um
+    retreino do modelo invalide o cache mesmo sem novas classificações.
+    """
+    while True:
+        await asyncio.sleep(settings.ML_MODEL_VERSION_REFRESH_INTERVAL)
+        await refresh_ml_model_version()
+
+
+async def call_ml_service_batch(items: List[dict], reuse_cached: bool = True) -> List[dict]:
+    """
+    Classifica vários pacientes via /classify/batch (uma predição vetorizada
+    por lote de até ML_BATCH_SIZE). Vetores já memoizados não são enviados,
+    a menos que 'reuse_cached' seja False (reclassificação); os resultados
+    novos sempre atualizam o cache. Retorna na mesma ordem de 'items'.
+    """
+    results: List = [MISS] * len(items)
+    if reuse_cached:
+        for i, data in enumerate(items):
+            results[i] = await ml_result_cache.get(data)
+
+    faltando = [i for i, result in enumerate(results) if result is MISS]
+    for inicio in range(0, len(faltando), settings.ML_BATCH_SIZE):
+        indices = faltando[inicio:inicio + settings.ML_BATCH_SIZE]
+        lote = await _post_ml_service_batch([items[i] for i in indices])
+        if len(lote) != len(indices):
+            # Resposta incompleta: não dá para saber qual paciente ficou de fora
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=(f"Serviço de classificação (ML) retornou {len(lote)} resultados "
+                        f"para um lote de {len(indices)} pacientes")
+            )
+        for i, result in zip(indices, lote):
+            results[i] = result
+            await ml_result_cache.set(items[i], result)
+    return results
+
+
+async def _post_ml_service_batch(items: List[dict]) -> List[dict]:
+    url = settings.ML_SERVICE_BATCH_URL or f"{settings.ML_SERVICE_URL.rstrip('/')}/batch"
+
+    try:
+        response = await ml_upstream.post(url, json={"patients": items})
+        response.raise_for_status()
+        body = response.json()
+        ml_result_cache.set_version(body.get("model_version"))
+        return body["results"]
+
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Erro ao classificar lote de pacientes (ML): {_corpo_erro(e.response)}"
+        )
+    except CircuitOpenError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serviço de classificação (ML) indisponível (circuito aberto)"
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Serviço de classificação (ML) está offline: {e}"
+        )
+
+
+def _corpo_erro(response: httpx.Response):
+    # Gateways (502/503/504) costumam responder HTML em vez de JSON
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+async def call_llm_service(data: dict, use_cache: bool = True) -> dict:
+    """
+    Chama o agente LLM. O plano gerado é memoizado pelo perfil do paciente
+    (opcionalmente com as medições clínicas quantizadas, LLM_CACHE_QUANTIZE).
+    """
+    if not use_cache:
+        return await _post_llm_service(data)
+    chave = data
+    if settings.LLM_CACHE_QUANTIZE and isinstance(data.get("patient_data"), dict):
+        chave = {**data, "patient_data": quantizar_features(data["patient_data"])}
+    return await llm_result_cache.get_or_call(
+        chave, lambda: _post_llm_service(data),
+        cacheable=lambda result: bool(result.get("generated_actions")),
+    )
+
+
+async def _post_llm_service(data: dict) -> dict:
     url = settings.LLM_SERVICE_URL
     print(f"🔗 Chamando LLM em: {url}")
     print(f"📦 Payload enviado: {data}")
 
     try:
-        response = await client.post(url, json=data)
+        response = await llm_upstream.post(url, json=data)
         print(f"📬 Resposta do LLM: {response.status_code}")
         print(await response.aread())  # mostra o corpo bruto
         response.raise_for_status()
         return response.json()
 
+    except CircuitOpenError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serviço de geração de ações (LLM) indisponível (circuito aberto)"
+        )
     except httpx.RequestError as e:
         print(f"❌ Erro de conexão: {e}")
         raise HTTPException(
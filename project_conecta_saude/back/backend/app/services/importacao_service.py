@@ -0,0 +1,347 @@
+"""
+Importação em massa de pacientes (onboarding de municípios).
+
+O arquivo (CSV ou NDJSON) é lido em streaming direto do corpo da requisição,
+validado linha a linha e inserido em lotes multi-linha dentro de uma única
+transação. Geocodificação (concorrência limitada) e classificação ML (uma
+chamada em lote ao /classify/batch) de cada lote rodam em paralelo; outliers
+seguem para a fila de orquestração (LLM).
+"""
+import asyncio
+import csv
+import json
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud import crud_paciente_async as crud_paciente, crud_orquestracao
+from app.schemas.paciente_schema import PacienteCreate
+from .http_client import call_ml_service_batch
+from .geocoding_service import GeocodingService
+from .orquestracao_worker import worker_pool
+from .clustering_service import clustering_cache
+
+logger = logging.getLogger(__name__)
+
+# Campos booleanos aceitam também "sim"/"não" vindos de planilhas
+_BOOL_FIELDS = {"tabagismo_atual", "historico_familiar_dc"}
+_BOOL_VALUES = {"sim": True, "s": True, "não": False, "nao": False, "n": False}
+
+
+async def _iter_lines(
+    chunks: AsyncIterator[bytes]
+) -> AsyncIterator[Tuple[Optional[str], Optional[str]]]:
+    """
+    Converte o stream de bytes do corpo da requisição em linhas de texto.
+    Produz tuplas (linha, erro): uma linha que não é UTF-8 válido vira erro
+    só dela, sem abortar a importação.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield _decode_line(line)
+    if buffer:
+        yield _decode_line(buffer)
+
+
+def _decode_line(line: bytes) -> Tuple[Optional[str], Optional[str]]:
+    try:
+        return line.decode("utf-8-sig").rstrip("\r"), None
+    except UnicodeDecodeError as e:
+        return None, f"Codificação inválida (esperado UTF-8): {e}"
+
+
+async def _iter_csv_records(
+    chunks: AsyncIterator[bytes]
+) -> AsyncIterator[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Lê um CSV com cabeçalho em streaming (suporta campos entre aspas com
+    quebra de linha). Produz tuplas (registro, erro).
+    """
+    header: Optional[List[str]] = None
+    pending = ""
+    async for line, erro in _iter_lines(chunks):
+        if erro:
+            # Descarta também o registro entre aspas que estava em aberto
+            pending = ""
+            yield None, erro
+            continue
+        pending = f"{pending}\n{line}" if pending else line
+        # Campo entre aspas ainda aberto: aguarda a próxima linha
+        if pending.count('"') % 2 == 1:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        try:
+            values = next(csv.reader([record]))
+        except csv.Error as e:
+            yield None, f"Linha inválida: {e}"
+            continue
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        yield dict(zip(header, values)), None
+
+
+async def _iter_ndjson_records(
+    chunks: AsyncIterator[bytes]
+) -> AsyncIterator[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    """Lê um NDJSON (um objeto JSON por linha) em streaming. Produz tuplas (registro, erro)."""
+    async for line, erro in _iter_lines(chunks):
+        if erro:
+            yield None, erro
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(record, dict):
+            # JSON válido mas não é um paciente (ex: lista, string, número)
+            yield None, f"Objeto JSON esperado, recebido {type(record).__name__}"
+            continue
+        yield record, None
+
+
+def _normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Limpa valores vindos de planilha: vazios viram None e 'sim'/'não' viram bool."""
+    normalized = {}
+    for key, value in record.items():
+        if isinstance(value, str):
+            value = value.strip()
+            if value == "":
+                value = None
+            elif key in _BOOL_FIELDS and value.lower() in _BOOL_VALUES:
+                value = _BOOL_VALUES[value.lower()]
+        normalized[key] = value
+    return normalized
+
+
+async def _geocode_row(paciente_in: PacienteCreate, semaphore: asyncio.Semaphore):
+    """Geocodifica o CEP de um paciente (concorrência limitada pelo semáforo)."""
+    if not paciente_in.cep:
+        return None
+    async with semaphore:
+        return await GeocodingService.get_coordinates_from_cep(paciente_in.cep)
+
+
+async def _enrich_batch(
+    pacientes: List[PacienteCreate], semaphore: asyncio.Semaphore
+) -> List[Dict[str, Any]]:
+    """
+    Geocodifica os CEPs e classifica (ML) um lote de pacientes, em paralelo.
+    A classificação usa uma única chamada ao /classify/batch do serviço de ML.
+    Falhas não interrompem a importação: o paciente é salvo e a
+    orquestração é reenfileirada para ele.
+    """
+    # Import tardio para evitar import circular com paciente_service
+    from .paciente_service import _prepare_ml_features
+
+    geocode_task = asyncio.gather(
+        *[_geocode_row(paciente_in, semaphore) for paciente_in in pacientes],
+        return_exceptions=True,
+    )
+    ml_task = call_ml_service_batch([_prepare_ml_features(p) for p in pacientes])
+    geocoding_results, ml_results = await asyncio.gather(
+        geocode_task, ml_task, return_exceptions=True
+    )
+    if isinstance(ml_results, Exception):
+        # O lote inteiro fica sem classificação (ex: serviço de ML fora do ar)
+        ml_results = [ml_results] * len(pacientes)
+
+    return [
+        _enrichment(paciente_in, geocoding_result, ml_result)
+        for paciente_in, geocoding_result, ml_result in zip(pacientes, geocoding_results, ml_results)
+    ]
+
+
+def _enrichment(paciente_in: PacienteCreate, geocoding_result, ml_result) -> Dict[str, Any]:
+    """Converte os resultados de geocodificação/ML nas colunas do paciente."""
+    from .paciente_service import _feature_fingerprint
+
+    enrichment: Dict[str, Any] = {}
+    if geocoding_result and not isinstance(geocoding_result, Exception):
+        latitude, longitude, endereco_completo = geocoding_result
+        enrichment["latitude"] = latitude
+        enrichment["longitude"] = longitude
+        if not paciente_in.endereco or not paciente_in.endereco.strip():
+            enrichment["endereco"] = endereco_completo
+
+    if isinstance(ml_result, Exception):
+        enrichment["_erro_ml"] = getattr(ml_result, "detail", None) or str(ml_result)
+    else:
+        is_outlier = ml_result.get("is_outlier", False)
+        enrichment["is_outlier"] = is_outlier
+        enrichment["confidence"] = ml_result.get("confidence", 0.0)
+        enrichment["needs_confirmation"] = ml_result.get("needs_confirmation", False)
+        if not is_outlier:
+            enrichment["acoes_geradas_llm"] = (
+                "Paciente classificado como estável. Manter acompanhamento padrão."
+            )
+            # Orquestração completa (não precisa de LLM): registra o hash das features
+            enrichment["features_hash"] = _feature_fingerprint(paciente_in)
+    return enrichment
+
+
+async def _flush_batch(
+    db: AsyncSession,
+    batch: List[Dict[str, Any]],
+    seen_emails: set,
+    resultados: List[Dict[str, Any]],
+    pendentes_orquestracao: List[int],
+    novos_no_mapa: List[tuple],
+    enriquecer: bool,
+    semaphore: asyncio.Semaphore,
+) -> None:
+    """Valida duplicidade, enriquece em paralelo e insere um lote com um único INSERT."""
+    existentes = await crud_paciente.get_existing_emails(
+        db, emails=[item["paciente_in"].email for item in batch]
+    )
+
+    validos = []
+    for item in batch:
+        email = item["paciente_in"].email
+        if email in existentes or email in seen_emails:
+            resultados.append({
+                "linha": item["linha"], "status": "erro", "email": email,
+                "erro": "Email já cadastrado",
+            })
+            continue
+        seen_emails.add(email)
+        validos.append(item)
+
+    if not validos:
+        return
+
+    if enriquecer:
+        enrichments = await _enrich_batch([item["paciente_in"] for item in validos], semaphore)
+    else:
+        enrichments = [{"_erro_ml": None} for _ in validos]
+
+    rows = []
+    for item, enrichment in zip(validos, enrichments):
+        row = item["paciente_in"].model_dump()
+        row.update({k: v for k, v in enrichment.items() if not k.startswith("_")})
+        rows.append(row)
+
+    ids = await crud_paciente.create_pacientes_bulk(db, rows=rows)
+    for row, paciente_id in zip(rows, ids):
+        if row.get("latitude") is not None:
+            novos_no_mapa.append((paciente_id, row["latitude"], row["longitude"], row.get("is_outlier")))
+
+    for item, enrichment, paciente_id in zip(validos, enrichments, ids):
+        resultado = {
+            "linha": item["linha"],
+            "status": "importado",
+            "email": item["paciente_in"].email,
+            "paciente_id": paciente_id,
+            "is_outlier": enrichment.get("is_outlier"),
+        }
+        if "_erro_ml" in enrichment or enrichment.get("is_outlier"):
+            # Sem classificação (falha/skip) ou outlier que precisa do LLM:
+            # o restante do fluxo segue pela fila de orquestração.
+            pendentes_orquestracao.append(paciente_id)
+            if enrichment.get("_erro_ml"):
+                resultado["erro"] = f"Classificação adiada: {enrichment['_erro_ml']}"
+        resultados.append(resultado)
+
+
+async def importar_pacientes(
+    db: AsyncSession,
+    *,
+    chunks: AsyncIterator[bytes],
+    formato: str,
+    enriquecer: bool = True,
+) -> Dict[str, Any]:
+    """
+    Importa pacientes de um arquivo CSV/NDJSON em streaming.
+
+    Args:
+        db: Sessão do banco
+        chunks: Stream de bytes do corpo da requisição
+        formato: "csv" ou "ndjson"
+        enriquecer: Se deve geocodificar e classificar (ML) durante a importação
+
+    Returns:
+        Resumo com totais e o resultado de cada linha
+    """
+    records = _iter_csv_records(chunks) if formato == "csv" else _iter_ndjson_records(chunks)
+    semaphore = asyncio.Semaphore(settings.BULK_IMPORT_CONCURRENCY)
+
+    resultados: List[Dict[str, Any]] = []
+    pendentes_orquestracao: List[int] = []
+    novos_no_mapa: List[tuple] = []
+    seen_emails: set = set()
+    batch: List[Dict[str, Any]] = []
+    linha = 0
+
+    try:
+        async for record, erro in records:
+            linha += 1
+            if erro:
+                # Linha malformada: registra e segue para a próxima
+                resultados.append({"linha": linha, "status": "erro", "erro": erro})
+                continue
+
+            try:
+                paciente_in = PacienteCreate(**_normalize_record(record))
+            except (ValidationError, TypeError) as e:
+                resultados.append({
+                    "linha": linha, "status": "erro",
+                    "email": record.get("email") if isinstance(record, dict) else None,
+                    "erro": str(e),
+                })
+                continue
+
+            batch.append({"linha": linha, "paciente_in": paciente_in})
+            if len(batch) >= settings.BULK_IMPORT_BATCH_SIZE:
+                await _flush_batch(db, batch, seen_emails, resultados,
+                                   pendentes_orquestracao, novos_no_mapa, enriquecer, semaphore)
+                batch = []
+
+        if batch:
+            await _flush_batch(db, batch, seen_emails, resultados,
+                               pendentes_orquestracao, novos_no_mapa, enriquecer, semaphore)
+
+        # Uma única transação para toda a importação
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    if len(novos_no_mapa) > 1000:
+        # Importação grande: mais barato recalcular as microrregiões do zero
+        clustering_cache.invalidate()
+    else:
+        for paciente_id, latitude, longitude, is_outlier in novos_no_mapa:
+            clustering_cache.notify_patient(paciente_id, latitude, longitude, is_outlier)
+
+    jobs_enfileirados = 0
+    if pendentes_orquestracao:
+        jobs_enfileirados = await db.run_sync(
+            lambda session: crud_orquestracao.create_jobs_bulk(
+                session, paciente_ids=pendentes_orquestracao, tipo="importacao",
+                max_tentativas=settings.ORCHESTRATION_MAX_RETRIES
+            )
+        )
+        worker_pool.notify()
+
+    resultados.sort(key=lambda r: r["linha"])
+    importados = sum(1 for r in resultados if r["status"] == "importado")
+    logger.info(f"Importação concluída: {importados}/{linha} pacientes importados")
+
+    return {
+        "total": linha,
+        "importados": importados,
+        "falhas": linha - importados,
+        "jobs_enfileirados": jobs_enfileirados,
+        "resultados": resultados,
+    }
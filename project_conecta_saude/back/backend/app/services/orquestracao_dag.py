@@ -0,0 +1,108 @@
+"""
+Executor de DAG das etapas da orquestração.
+
+Cada etapa declara de quais outras depende; etapas independentes (ex:
+geocodificação e classificação ML) rodam em paralelo com asyncio e as
+dependentes (ex: LLM, só para outliers) começam quando as anteriores
+terminam. O tempo de cada etapa é medido para identificar onde está a
+latência.
+
+As etapas não devem usar a sessão do banco (que não é segura para uso
+concorrente): recebem os resultados das etapas anteriores e devolvem o
+próprio resultado; quem chama grava tudo no final.
+"""
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+Resultados = Dict[str, Any]
+
+
+@dataclass
+class Etapa:
+    nome: str
+    executar: Callable[[Resultados], Awaitable[Any]]
+    depende_de: Tuple[str, ...] = ()
+    # Etapa pulada quando a condição (avaliada sobre os resultados) é falsa
+    condicao: Optional[Callable[[Resultados], bool]] = None
+
+
+@dataclass
+class ExecucaoDAG:
+    resultados: Resultados = field(default_factory=dict)
+    tempos_ms: Dict[str, float] = field(default_factory=dict)  # por etapa + "total"
+    puladas: List[str] = field(default_factory=list)
+
+
+async def executar_dag(
+    etapas: List[Etapa],
+    *,
+    execucao: Optional[ExecucaoDAG] = None,
+    ao_iniciar: Optional[Callable[[List[str]], Any]] = None,
+) -> ExecucaoDAG:
+    """
+    Executa as etapas respeitando as dependências.
+    'ao_iniciar' recebe os nomes das etapas em execução sempre que uma nova
+    começa (ex: registrar a etapa atual no job); pode ser uma corrotina,
+    aguardada com as etapas já disparadas. Se uma etapa falha, as
+    demais em andamento são canceladas e a exceção é propagada; os tempos
+    medidos até ali ficam em 'execucao' (passe uma instância para lê-los).
+    """
+    execucao = execucao if execucao is not None else ExecucaoDAG()
+    nomes = {etapa.nome for etapa in etapas}
+    for etapa in etapas:
+        faltando = set(etapa.depende_de) - nomes
+        if faltando:
+            raise ValueError(f"Etapa '{etapa.nome}' depende de etapas inexistentes: {faltando}")
+
+    pendentes = {etapa.nome: etapa for etapa in etapas}
+    concluidas: set = set()
+    em_execucao: Dict[asyncio.Task, str] = {}
+    inicio_total = time.perf_counter()
+
+    async def _medir(etapa: Etapa) -> Any:
+        inicio = time.perf_counter()
+        try:
+            return await etapa.executar(execucao.resultados)
+        finally:
+            execucao.tempos_ms[etapa.nome] = round((time.perf_counter() - inicio) * 1000, 1)
+
+    try:
+        while pendentes or em_execucao:
+            # Dispara todas as etapas cujas dependências já terminaram
+            iniciadas = False
+            for nome, etapa in list(pendentes.items()):
+                if not set(etapa.depende_de) <= concluidas:
+                    continue
+                del pendentes[nome]
+                if etapa.condicao is not None and not etapa.condicao(execucao.resultados):
+                    execucao.puladas.append(nome)
+                    concluidas.add(nome)
+                    continue
+                em_execucao[asyncio.create_task(_medir(etapa))] = nome
+                iniciadas = True
+
+            if not em_execucao:
+                if pendentes:  # só sobra quem depende de etapas que nunca terminam
+                    raise ValueError(f"Dependência circular entre as etapas: {list(pendentes)}")
+                break
+            if iniciadas and ao_iniciar is not None:
+                retorno = ao_iniciar(sorted(em_execucao.values()))
+                if inspect.isawaitable(retorno):
+                    await retorno
+
+            feitas, _ = await asyncio.wait(em_execucao, return_when=asyncio.FIRST_COMPLETED)
+            for task in feitas:
+                nome = em_execucao.pop(task)
+                execucao.resultados[nome] = task.result()  # propaga a exceção da etapa
+                concluidas.add(nome)
+    finally:
+        for task in em_execucao:
+            task.cancel()
+        if em_execucao:
+            await asyncio.gather(*em_execucao, return_exceptions=True)
+        execucao.tempos_ms["total"] = round((time.perf_counter() - inicio_total) * 1000, 1)
+
+    return execucao
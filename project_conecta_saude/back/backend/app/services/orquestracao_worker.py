@@ -0,0 +1,141 @@
+"""
+Pool de workers da fila de orquestração (ML/LLM em background).
+
+Os endpoints de criação/atualização de pacientes apenas salvam o registro
+e enfileiram um OrquestracaoJob. Os workers deste módulo rodam dentro do
+próprio processo do backend, reservam jobs pendentes no banco e executam
+(Geocodificação || ML) -> LLM com retry e backoff exponencial.
+
+A sessão do banco é síncrona: toda chamada a ela (reserva, etapas,
+conclusão/falha) roda numa thread com asyncio.to_thread, para que a
+latência do banco não bloqueie o event loop da API. Jobs presos em
+'processando' (réplica que caiu no meio da execução) são devolvidos à fila
+no startup e periodicamente.
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from app.core.config import settings
+from app.crud import crud_orquestracao
+from app.db.session import SessionLocal
+from app.models.orquestracao_models import TIPO_RECLASSIFICACAO_EM_MASSA
+
+logger = logging.getLogger(__name__)
+
+
+class OrquestracaoWorkerPool:
+    """Conjunto de tarefas asyncio que consomem a tabela orquestracao_jobs."""
+
+    def __init__(self, num_workers: int, poll_interval: float):
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._requeue_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        """Inicia os workers. Chamado no startup da aplicação."""
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+
+        # Recupera jobs que ficaram presos em 'processando' (ex: restart do container)
+        await asyncio.to_thread(self._requeue_stale)
+
+        for worker_id in range(self.num_workers):
+            self._tasks.append(asyncio.create_task(self._worker_loop(worker_id)))
+        self._requeue_task = asyncio.create_task(self._requeue_loop())
+        logger.info(f"Fila de orquestração iniciada com {self.num_workers} worker(s)")
+
+    async def stop(self) -> None:
+        """Para os workers. Jobs em andamento voltam para a fila no próximo startup."""
+        self._stopping = True
+        tasks = self._tasks + ([self._requeue_task] if self._requeue_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._requeue_task = None
+
+    @staticmethod
+    def _requeue_stale() -> int:
+        """Devolve à fila os jobs presos em 'processando' (síncrono: rodar em thread)."""
+        db = SessionLocal()
+        try:
+            count = crud_orquestracao.requeue_stale_jobs(
+                db, older_than_seconds=settings.ORCHESTRATION_STALE_AFTER
+            )
+            if count:
+                logger.warning(f"{count} job(s) de orquestração presos reenfileirado(s)")
+            return count
+        except Exception as e:
+            logger.error(f"Não foi possível recuperar jobs pendentes: {e}")
+            return 0
+        finally:
+            db.close()
+
+    async def _requeue_loop(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(settings.ORCHESTRATION_REQUEUE_INTERVAL)
+            if await asyncio.to_thread(self._requeue_stale):
+                self.notify()
+
+    def notify(self) -> None:
+        """Acorda os workers imediatamente quando um novo job é enfileirado."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker_loop(self, worker_id: int) -> None:
+        while not self._stopping:
+            try:
+                processed = await self._process_one()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Worker {worker_id}: erro inesperado na fila: {e}")
+                processed = False
+
+            if processed:
+                # Há trabalho na fila: continua consumindo sem esperar
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _process_one(self) -> bool:
+        """Reserva e processa um job. Retorna False se a fila estava vazia."""
+        # Import tardio para evitar import circular com paciente_service
+        from app.services.paciente_service import process_orchestration_job
+        from app.services.reclassificacao_service import process_reclassificacao_job
+
+        # expire_on_commit=False: ler os objetos após um commit (feito em thread)
+        # não dispara um SELECT implícito dentro do event loop
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            db_job = await asyncio.to_thread(crud_orquestracao.claim_next_job, db)
+            if not db_job:
+                return False
+            if db_job.tipo == TIPO_RECLASSIFICACAO_EM_MASSA:
+                logger.info(f"Processando job {db_job.id} (reclassificação em massa, "
+                            f"tentativa {db_job.tentativas})")
+                await process_reclassificacao_job(db, db_job)
+            else:
+                logger.info(f"Processando job {db_job.id} (paciente {db_job.paciente_id}, "
+                            f"tentativa {db_job.tentativas})")
+                await process_orchestration_job(db, db_job)
+            return True
+        finally:
+            await asyncio.to_thread(db.close)
+
+
+# Instância única usada pela aplicação
+worker_pool = OrquestracaoWorkerPool(
+    num_workers=settings.ORCHESTRATION_WORKERS,
+    poll_interval=settings.ORCHESTRATION_POLL_INTERVAL,
+)
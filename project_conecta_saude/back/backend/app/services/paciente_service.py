@@ -1,11 +1,21 @@
-from typing import Optional
+from typing import Optional, Tuple, Union
 from sqlalchemy.orm import Session
-from app.schemas.paciente_schema import PacienteCreate, ProfessionalConfirmation
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.paciente_schema import PacienteCreate, PacienteUpdate, ProfessionalConfirmation
 from app.models.paciente_models import Paciente, RetrainingData
+from app.models.orquestracao_models import (
+    OrquestracaoJob, ETAPA_GEOCODIFICACAO, ETAPA_CLASSIFICACAO_ML, ETAPA_GERACAO_LLM
+)
 from app import crud
+from app.crud import crud_orquestracao, crud_paciente_async
 from .http_client import call_ml_service, call_llm_service
+from .resultado_cache import hash_canonico
 from .geocoding_service import GeocodingService
+from .orquestracao_worker import worker_pool
+from .orquestracao_dag import Etapa, ExecucaoDAG, executar_dag
+from .clustering_service import clustering_cache
 from app.core.config import settings
+import asyncio
 import math
 import json
 from datetime import date, datetime
@@ -15,10 +25,11 @@ def _calculate_age(born: date) -> int:
     today = date.today()
     return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
 
-def _prepare_ml_features(paciente_in: PacienteCreate) -> dict:
+def _prepare_ml_features(paciente_in: Union[PacienteCreate, Paciente]) -> dict:
     """
     Prepara os dados do paciente no formato esperado pelo modelo ML.
     Inclui todas as 28 features do modelo retreinado.
+    Aceita tanto o schema de entrada quanto o registro já salvo no banco.
     """
     features = {
         # Dados demográficos
@@ -65,134 +76,333 @@ def _prepare_ml_features(paciente_in: PacienteCreate) -> dict:
     
     return features
 
-async def _run_orchestration(db: Session, paciente_in: PacienteCreate, db_paciente: Paciente) -> Paciente:
+def _feature_fingerprint(paciente: Union[PacienteCreate, Paciente]) -> str:
     """
-    Função helper que executa a orquestração ML/LLM para um paciente.
-    Agora inclui lógica de confiança e armazenamento para retreinamento.
+    Hash estável das features do modelo. Usa a data de nascimento no lugar
+    da idade, para que o hash não mude sozinho no aniversário do paciente.
     """
-    ml_input_data = _prepare_ml_features(paciente_in)
-    
-    try:
-        # Chama o Serviço de ML
-        ml_result = await call_ml_service(ml_input_data)
-        
+    features = _prepare_ml_features(paciente)
+    features.pop("idade")
+    features["data_nascimento"] = paciente.data_nascimento.isoformat()
+    return hash_canonico(features)
+
+
+async def _run_orchestration(
+    db: Session, db_paciente: Paciente, db_job: OrquestracaoJob, execucao: ExecucaoDAG
+) -> Paciente:
+    """
+    Executa a orquestração de um paciente já salvo como um DAG:
+    Geocodificação e ML rodam em paralelo (a classificação não depende das
+    coordenadas); o LLM encadeia após o ML, apenas para outliers.
+    Chamada pelos workers da fila; as etapas em andamento são registradas no
+    job e os tempos ficam em 'execucao'. Erros são propagados para que o
+    worker faça o retry. A sessão é síncrona: o acesso ao banco roda em
+    threads (asyncio.to_thread) para não bloquear o event loop.
+    """
+    ml_input_data = _prepare_ml_features(db_paciente)
+    fingerprint = _feature_fingerprint(db_paciente)
+    # Features iguais às da última classificação: ML/LLM dariam o mesmo resultado
+    reclassificar = db_paciente.features_hash != fingerprint
+    cep = db_paciente.cep
+
+    async def geocodificar(resultados):
+        return await GeocodingService.get_coordinates_from_cep(cep)
+
+    async def classificar(resultados):
+        return await call_ml_service(ml_input_data)
+
+    async def gerar_acoes(resultados):
+        return await call_llm_service({"patient_data": ml_input_data})
+
+    etapas = []
+    # 1. Geocodificação (apenas se ainda não temos coordenadas para o CEP)
+    if cep and db_paciente.latitude is None:
+        etapas.append(Etapa(ETAPA_GEOCODIFICACAO, geocodificar))
+    if reclassificar:
+        # 2. Serviço de ML, em paralelo com a geocodificação
+        etapas.append(Etapa(ETAPA_CLASSIFICACAO_ML, classificar))
+        # 3. LLM apenas se for outlier
+        etapas.append(Etapa(
+            ETAPA_GERACAO_LLM, gerar_acoes,
+            depende_de=(ETAPA_CLASSIFICACAO_ML,),
+            condicao=lambda resultados: resultados[ETAPA_CLASSIFICACAO_ML].get("is_outlier", False),
+        ))
+
+    await executar_dag(
+        etapas, execucao=execucao,
+        ao_iniciar=lambda nomes: asyncio.to_thread(
+            crud_orquestracao.set_etapa, db, db_job, "+".join(nomes)
+        ),
+    )
+    await asyncio.to_thread(
+        _salvar_resultados, db, db_paciente, execucao.resultados, reclassificar, fingerprint
+    )
+
+    # Mantém as microrregiões em cache coerentes com a nova posição/classificação
+    clustering_cache.notify_patient(
+        db_paciente.id, db_paciente.latitude, db_paciente.longitude, db_paciente.is_outlier
+    )
+    return db_paciente
+
+
+def _salvar_resultados(
+    db: Session, db_paciente: Paciente, resultados: dict, reclassificar: bool, fingerprint: str
+) -> None:
+    """Grava no paciente os resultados das etapas (síncrono: roda numa thread)."""
+    geocoding_result = resultados.get(ETAPA_GEOCODIFICACAO)
+    if geocoding_result:
+        latitude, longitude, endereco_completo = geocoding_result
+        db_paciente.latitude = latitude
+        db_paciente.longitude = longitude
+        if not db_paciente.endereco or not db_paciente.endereco.strip():
+            db_paciente.endereco = endereco_completo
+
+    if not reclassificar:
+        print(f"Paciente {db_paciente.id}: features inalteradas, ML/LLM não re-executados.")
+    else:
+        ml_result = resultados[ETAPA_CLASSIFICACAO_ML]
         is_outlier = ml_result.get("is_outlier", False)
         confidence = ml_result.get("confidence", 0.0)
         needs_confirmation = ml_result.get("needs_confirmation", False)
-        
+
         # Salva os resultados do ML
         db_paciente.is_outlier = is_outlier
         db_paciente.confidence = confidence
         db_paciente.needs_confirmation = needs_confirmation
-        
+
         # Se precisa de confirmação, armazena para possível retreinamento
         if needs_confirmation:
             print(f"Paciente {db_paciente.id} precisa de confirmação profissional. "
                   f"Confiança: {confidence:.2%}")
-        
-        # Chama o LLM apenas se for outlier
+
         if is_outlier:
-            print(f"Paciente {db_paciente.id} é outlier. Chamando Agente LLM...")
-            
-            llm_input_payload = {
-                "patient_data": ml_input_data
-            }
-            
-            llm_result = await call_llm_service(llm_input_payload)
-            generated_text = llm_result.get("generated_actions")
-            db_paciente.acoes_geradas_llm = generated_text
+            print(f"Paciente {db_paciente.id} é outlier. Ações geradas pelo Agente LLM.")
+            db_paciente.acoes_geradas_llm = resultados[ETAPA_GERACAO_LLM].get("generated_actions")
         else:
             db_paciente.acoes_geradas_llm = "Paciente classificado como estável. Manter acompanhamento padrão."
-            
-        db.commit()
-        db.refresh(db_paciente)
-        
+
+        # Só grava o hash com ML e LLM concluídos (um retry após falha refaz tudo)
+        db_paciente.features_hash = fingerprint
+
+    db.commit()
+    db.refresh(db_paciente)
+
+
+async def process_orchestration_job(db: Session, db_job: OrquestracaoJob) -> None:
+    """
+    Processa um job reservado pela fila. Em caso de erro, o job volta para
+    a fila com backoff exponencial até esgotar 'max_tentativas'.
+    Os tempos de cada etapa (ms) são gravados no job, inclusive em falhas.
+    """
+    db_paciente = await asyncio.to_thread(crud.get_by_id, db, id=db_job.paciente_id)
+    if not db_paciente:
+        await asyncio.to_thread(
+            crud_orquestracao.mark_falha,
+            db, db_job, erro="Paciente não encontrado", backoff_seconds=0
+        )
+        return
+
+    execucao = ExecucaoDAG()
+    try:
+        await _run_orchestration(db, db_paciente, db_job, execucao)
+        await asyncio.to_thread(
+            crud_orquestracao.mark_concluido, db, db_job, tempos_etapas=execucao.tempos_ms
+        )
     except Exception as e:
-        print(f"ALERTA: Falha na orquestração para paciente {db_paciente.id}: {e}")
+        print(f"ALERTA: Falha na orquestração para paciente {db_job.paciente_id} "
+              f"(job {db_job.id}, tentativa {db_job.tentativas}/{db_job.max_tentativas}): {e}")
+        detail = getattr(e, "detail", None) or str(e)
+        await asyncio.to_thread(_registrar_falha, db, db_job, str(detail), execucao.tempos_ms)
 
-    return db_paciente
+
+def _registrar_falha(
+    db: Session, db_job: OrquestracaoJob, erro: str, tempos_etapas: Optional[dict]
+) -> None:
+    """Desfaz a transação do paciente e devolve o job à fila (síncrono: roda numa thread)."""
+    db.rollback()
+    crud_orquestracao.mark_falha(
+        db, db_job, erro=erro,
+        backoff_seconds=settings.ORCHESTRATION_RETRY_BACKOFF,
+        tempos_etapas=tempos_etapas
+    )
+
+
+async def _enqueue_orchestration(db: AsyncSession, db_paciente: Paciente, tipo: str) -> OrquestracaoJob:
+    """Cria o job de orquestração e acorda os workers da fila."""
+    paciente_id = db_paciente.id
+    db_job = await db.run_sync(
+        lambda session: crud_orquestracao.create_job(
+            session, paciente_id=paciente_id, tipo=tipo,
+            max_tentativas=settings.ORCHESTRATION_MAX_RETRIES
+        )
+    )
+    worker_pool.notify()
+    return db_job
 
 
 async def create_paciente_with_orchestration(
-    db: Session, *, paciente_in: PacienteCreate
-) -> Paciente:
+    db: AsyncSession, *, paciente_in: PacienteCreate
+) -> Tuple[Paciente, OrquestracaoJob]:
     """
-    Orquestra o fluxo completo: Geocodifica CEP, Salva, Classifica (ML) e Gera Ações (LLM).
+    Salva o paciente e enfileira a orquestração (Geocodificação, ML e LLM).
+    Retorna imediatamente o paciente e o job; o enriquecimento roda em background.
     """
-    
-    # 1. Se CEP foi fornecido, buscar coordenadas
-    if paciente_in.cep:
-        geocoding_result = await GeocodingService.get_coordinates_from_cep(paciente_in.cep)
-        if geocoding_result:
-            latitude, longitude, endereco_completo = geocoding_result
-            if not paciente_in.endereco or not paciente_in.endereco.strip():
-                paciente_in.endereco = endereco_completo
-        else:
-            latitude, longitude = None, None
-    else:
-        latitude, longitude = None, None
-    
-    # 2. Salva o paciente no banco
-    db_paciente = crud.create_paciente(db, paciente_in=paciente_in)
-    
-    # 3. Salva as coordenadas obtidas
-    if latitude and longitude:
-        db_paciente.latitude = latitude
-        db_paciente.longitude = longitude
-        db.commit()
-        db.refresh(db_paciente)
-    
-    # 4. Executa orquestração ML/LLM
-    return await _run_orchestration(db, paciente_in, db_paciente)
+    db_paciente = await crud_paciente_async.create_paciente(db, paciente_in=paciente_in)
+    db_job = await _enqueue_orchestration(db, db_paciente, "criacao")
+    return db_paciente, db_job
 
 
 def get_pacientes_paginados(
-    db: Session, *, page: int, page_size: int, search: str
+    db: Session, *, page: int, page_size: int, search: str,
+    cursor: Optional[str] = None, paginacao: str = "offset", total_modo: str = "exato"
 ):
     """
     Busca pacientes paginados e prepara a resposta 
     exatamente como o frontend (api.ts) espera.
+
+    paginacao:  "offset" (page/page_size, padrão do frontend) ou "cursor"
+                (keyset em created_at,id; usa 'cursor' e devolve meta.next_cursor).
+    total_modo: "exato" (COUNT), "estimado" (estimativa do planner) ou "nenhum".
     """
-    pacientes, total = crud.get_multi(
-        db, page=page, page_size=page_size, search=search
-    )
-    
+    if cursor:
+        paginacao = "cursor"
+
+    if paginacao == "cursor":
+        pacientes, next_cursor = crud.get_multi_keyset(
+            db, limit=page_size, cursor=cursor, search=search
+        )
+        total = None
+    else:
+        pacientes, total = crud.get_multi(
+            db, page=page, page_size=page_size, search=search,
+            with_total=(total_modo == "exato")
+        )
+        next_cursor = None
+
+    if total_modo == "exato" and total is None:
+        total = crud.count_pacientes(db, search=search)
+    elif total_modo == "estimado":
+        total = crud.count_estimate(db, search=search)
+
     meta = {
         "total": total,
-        "page": page,
+        "page": page if paginacao == "offset" else None,
         "page_size": page_size,
-        "total_pages": math.ceil(total / page_size)
+        "total_pages": math.ceil(total / page_size) if total is not None else None,
+        "total_estimado": total_modo == "estimado",
+        "next_cursor": next_cursor,
     }
     
     return {"items": pacientes, "meta": meta}
 
 
-async def update_paciente_with_orchestration(
-    db: Session, *, id: int, paciente_in: PacienteCreate
-) -> Optional[Paciente]:
+def _status_saude(is_outlier: Optional[bool]) -> str:
+    return "Crítico" if is_outlier else "Estável"
+
+
+def get_mapa_agregado(
+    db: Session, *, zoom: int, bbox: Optional[Tuple[float, float, float, float]] = None
+) -> dict:
     """
-    Atualiza um paciente e re-executa o fluxo de orquestração (ML/LLM).
+    Monta a resposta do mapa para a área visível.
+    Em zoom baixo retorna clusters pré-agregados numa grade (o tamanho da
+    célula acompanha o zoom); em zoom alto retorna os pontos individuais,
+    limitados a MAP_MAX_POINTS. O payload não cresce com a população.
     """
-    db_paciente = crud.get_by_id(db, id=id)
+    if zoom <= settings.MAP_CLUSTER_MAX_ZOOM:
+        cell_size = 360.0 / (2 ** zoom) / settings.MAP_GRID_CELLS_PER_TILE
+        rows = crud.get_map_clusters(db, cell_size=cell_size, bbox=bbox)
+        clusters = [
+            {
+                "latitude": row.latitude,
+                "longitude": row.longitude,
+                "total": row.total,
+                "outliers": row.outliers or 0,
+                "estaveis": row.total - (row.outliers or 0),
+            }
+            for row in rows
+        ]
+        return {
+            "tipo": "clusters",
+            "zoom": zoom,
+            "total": sum(c["total"] for c in clusters),
+            "clusters": clusters,
+        }
+
+    limit = settings.MAP_MAX_POINTS
+    rows = crud.get_all_with_coordinates(db, bbox=bbox, limit=limit + 1)
+    pontos = [
+        {
+            "id": row.id,
+            "nome": row.nome,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "status_saude": _status_saude(row.is_outlier),
+            "is_outlier": row.is_outlier,
+        }
+        for row in rows[:limit]
+    ]
+    return {
+        "tipo": "pontos",
+        "zoom": zoom,
+        "total": len(pontos),
+        "pontos": pontos,
+        "truncado": len(rows) > limit,
+    }
+
+
+async def _update_paciente_with_orchestration(
+    db: AsyncSession, *, id: int, data: dict
+) -> Optional[Tuple[Paciente, Optional[OrquestracaoJob]]]:
+    """
+    Aplica 'data' ao paciente e enfileira só o que for necessário:
+    - CEP alterado: nova geocodificação;
+    - features do modelo alteradas (hash diferente): ML e, se outlier, LLM.
+    Se nada disso mudou (ex: só nome, email ou endereço), nenhum job é criado.
+    """
+    db_paciente = await crud_paciente_async.get_by_id(db, id=id)
     if not db_paciente:
         return None
     
-    # Se CEP foi fornecido, buscar coordenadas
-    if paciente_in.cep:
-        geocoding_result = await GeocodingService.get_coordinates_from_cep(paciente_in.cep)
-        if geocoding_result:
-            latitude, longitude, endereco_completo = geocoding_result
-            db_paciente.latitude = latitude
-            db_paciente.longitude = longitude
-            if not paciente_in.endereco or not paciente_in.endereco.strip():
-                paciente_in.endereco = endereco_completo
+    # Se o CEP mudou, as coordenadas antigas não valem mais:
+    # o worker vai geocodificar o novo CEP.
+    cep_alterado = "cep" in data and data["cep"] != db_paciente.cep
+    if cep_alterado:
+        data["latitude"] = None
+        data["longitude"] = None
         
     # Atualiza os campos do paciente
-    for field, value in paciente_in.model_dump().items():
-        setattr(db_paciente, field, value)
+    db_paciente = await crud_paciente_async.update_paciente(db, db_paciente=db_paciente, data=data)
+
+    features_alteradas = _feature_fingerprint(db_paciente) != db_paciente.features_hash
+    if not cep_alterado and not features_alteradas:
+        return db_paciente, None
     
-    # Re-executa a orquestração
-    return await _run_orchestration(db, paciente_in, db_paciente)
+    # Re-executa a orquestração em background (o worker pula ML/LLM se o hash bater)
+    db_job = await _enqueue_orchestration(db, db_paciente, "atualizacao")
+    return db_paciente, db_job
+
+
+async def update_paciente_with_orchestration(
+    db: AsyncSession, *, id: int, paciente_in: PacienteCreate
+) -> Optional[Tuple[Paciente, Optional[OrquestracaoJob]]]:
+    """
+    Atualiza um paciente (PUT, todos os campos) e re-executa a orquestração
+    apenas se CEP ou features do modelo mudaram.
+    """
+    return await _update_paciente_with_orchestration(db, id=id, data=paciente_in.model_dump())
+
+
+async def patch_paciente_with_orchestration(
+    db: AsyncSession, *, id: int, paciente_in: PacienteUpdate
+) -> Optional[Tuple[Paciente, Optional[OrquestracaoJob]]]:
+    """
+    Atualização parcial (PATCH): altera só os campos enviados, com a mesma
+    regra de re-orquestração do PUT.
+    """
+    return await _update_paciente_with_orchestration(
+        db, id=id, data=paciente_in.model_dump(exclude_unset=True)
+    )
 
 
 def confirm_patient_classification(
@@ -0,0 +1,51 @@
+"""
+Cache dos usuários autenticados (gestores e agentes) usado por
+deps.get_current_user, para que cada requisição protegida não precise
+consultar o banco. A chave é (papel, email do token); o TTL curto limita
+quanto tempo uma réplica pode enxergar um cadastro desatualizado, e as
+alterações feitas por este processo invalidam a entrada na hora.
+"""
+from typing import Any, Optional
+
+from app.core.cache import LRUTTLCache, MISS
+from app.core.config import settings
+from app.core.security import ROLE_AGENTE, ROLE_GESTOR
+
+
+class PrincipalCache:
+    """Usuários autenticados por (papel, email), com expiração curta."""
+
+    # None = token antigo, sem o claim 'role'
+    _ROLES = (ROLE_GESTOR, ROLE_AGENTE, None)
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self._cache = LRUTTLCache(max_entries)
+
+    def get(self, role: Optional[str], email: str) -> Any:
+        """Retorna o usuário cacheado ou MISS."""
+        if self.ttl <= 0:
+            return MISS
+        return self._cache.get((role, email))
+
+    def set(self, role: Optional[str], email: str, principal: Any) -> None:
+        if self.ttl > 0:
+            self._cache.set((role, email), principal, self.ttl)
+
+    def invalidate(self, *emails: Optional[str]) -> None:
+        """Remove os usuários com esses emails (em qualquer papel)."""
+        for email in emails:
+            if not email:
+                continue
+            for role in self._ROLES:
+                self._cache.delete((role, email))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+# Instância única usada pela aplicação
+principal_cache = PrincipalCache(
+    ttl=settings.AUTH_PRINCIPAL_CACHE_TTL,
+    max_entries=settings.AUTH_PRINCIPAL_CACHE_MAX_ENTRIES,
+)
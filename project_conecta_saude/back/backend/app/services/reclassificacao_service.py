@@ -0,0 +1,192 @@
+"""
+Reclassificação em massa dos pacientes (ex: após retreinar o modelo de ML).
+
+Percorre a tabela por id em lotes de ML_BATCH_SIZE e classifica cada lote
+com uma única chamada ao /classify/batch, ignorando os resultados
+memoizados (o objetivo é justamente refletir o modelo atual). As colunas
+são atualizadas com um UPDATE em lote por PK; pacientes que passaram a ser
+outliers vão para a fila de orquestração para receber as ações do LLM.
+
+A base inteira não cabe no tempo de uma requisição HTTP: o endpoint só
+enfileira um job 'reclassificacao_em_massa' na fila de orquestração e um
+worker o executa, gravando o resumo parcial no job a cada lote.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_orquestracao
+from app.db.session import AsyncSessionLocal
+from app.models.orquestracao_models import (
+    OrquestracaoJob, ETAPA_CLASSIFICACAO_ML, TIPO_RECLASSIFICACAO_EM_MASSA
+)
+from app.models.paciente_models import Paciente
+from .http_client import call_ml_service_batch
+from .orquestracao_worker import worker_pool
+from .clustering_service import clustering_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def enfileirar_reclassificacao(db: AsyncSession) -> OrquestracaoJob:
+    """
+    Enfileira a reclassificação em massa. Se já houver uma pendente ou em
+    andamento, devolve o mesmo job em vez de criar outro.
+    """
+    def criar(session: Session) -> OrquestracaoJob:
+        db_job = crud_orquestracao.get_job_ativo(session, tipo=TIPO_RECLASSIFICACAO_EM_MASSA)
+        if db_job is None:
+            db_job = crud_orquestracao.create_job(
+                session, paciente_id=None, tipo=TIPO_RECLASSIFICACAO_EM_MASSA,
+                max_tentativas=settings.ORCHESTRATION_MAX_RETRIES
+            )
+        return db_job
+
+    db_job = await db.run_sync(criar)
+    worker_pool.notify()
+    return db_job
+
+
+async def process_reclassificacao_job(db: Session, db_job: OrquestracaoJob) -> None:
+    """
+    Executa um job de reclassificação em massa reservado pela fila. A sessão
+    do worker (síncrona, usada em threads) só registra o job; os pacientes
+    são lidos e atualizados por uma sessão assíncrona própria.
+    """
+    # Import tardio para evitar import circular com paciente_service
+    from .paciente_service import _registrar_falha
+
+    async def progresso(resumo: Dict[str, Any]) -> None:
+        await asyncio.to_thread(crud_orquestracao.set_resultado, db, db_job, resumo)
+
+    try:
+        await asyncio.to_thread(crud_orquestracao.set_etapa, db, db_job, ETAPA_CLASSIFICACAO_ML)
+        async with AsyncSessionLocal() as async_db:
+            resumo = await reclassificar_pacientes(async_db, ao_progresso=progresso)
+        tempo_ms = round(resumo["tempo_segundos"] * 1000, 1)
+        await asyncio.to_thread(
+            crud_orquestracao.mark_concluido, db, db_job,
+            tempos_etapas={ETAPA_CLASSIFICACAO_ML: tempo_ms, "total": tempo_ms}, resultado=resumo
+        )
+    except Exception as e:
+        logger.error(f"Falha na reclassificação em massa (job {db_job.id}, tentativa "
+                     f"{db_job.tentativas}/{db_job.max_tentativas}): {e}")
+        detail = getattr(e, "detail", None) or str(e)
+        await asyncio.to_thread(_registrar_falha, db, db_job, str(detail), None)
+
+
+async def reclassificar_pacientes(
+    db: AsyncSession,
+    ao_progresso: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Reclassifica todos os pacientes com o modelo atual. 'ao_progresso', se
+    informado, recebe o resumo parcial após cada lote.
+
+    Returns:
+        Resumo com totais (pacientes, classificações alteradas, novos
+        outliers, jobs enfileirados) e o tempo gasto
+    """
+    # Import tardio para evitar import circular com paciente_service
+    from .paciente_service import _prepare_ml_features, _feature_fingerprint
+
+    inicio = time.perf_counter()
+    total = alterados = jobs_enfileirados = 0
+    novos_outliers: List[int] = []
+    mudancas_mapa: List[tuple] = []
+    ultimo_id = 0
+
+    while True:
+        result = await db.execute(
+            select(Paciente)
+            .where(Paciente.id > ultimo_id)
+            .order_by(Paciente.id)
+            .limit(settings.ML_BATCH_SIZE)
+        )
+        lote = list(result.scalars().all())
+        if not lote:
+            break
+        ultimo_id = lote[-1].id
+
+        ml_results = await call_ml_service_batch(
+            [_prepare_ml_features(paciente) for paciente in lote], reuse_cached=False
+        )
+
+        updates = []
+        novos_lote: List[int] = []
+        for paciente, ml_result in zip(lote, ml_results):
+            is_outlier = ml_result.get("is_outlier", False)
+            valores = {
+                "id": paciente.id,
+                "is_outlier": is_outlier,
+                "confidence": ml_result.get("confidence", 0.0),
+                "needs_confirmation": ml_result.get("needs_confirmation", False),
+                "features_hash": _feature_fingerprint(paciente),
+            }
+            if not is_outlier:
+                valores["acoes_geradas_llm"] = (
+                    "Paciente classificado como estável. Manter acompanhamento padrão."
+                )
+            elif not paciente.is_outlier or not paciente.acoes_geradas_llm:
+                # Novo outlier: sem hash, o job da fila refaz ML (memoizado) + LLM.
+                # Sem ações, um retry da reclassificação também o reconhece como
+                # novo (e não grava o hash antes de o job rodar)
+                valores["features_hash"] = None
+                valores["acoes_geradas_llm"] = None
+                novos_lote.append(paciente.id)
+
+            if bool(paciente.is_outlier) != is_outlier:
+                alterados += 1
+                if paciente.latitude is not None:
+                    mudancas_mapa.append((paciente.id, paciente.latitude, paciente.longitude, is_outlier))
+            updates.append(valores)
+
+        # UPDATE em lote por chave primária (executemany)
+        await db.execute(update(Paciente), updates)
+        if novos_lote:
+            # Jobs do LLM na mesma transação do UPDATE (o commit do
+            # create_jobs_bulk grava os dois): se um lote seguinte falhar,
+            # os outliers deste lote já estão na fila
+            jobs_enfileirados += await db.run_sync(
+                lambda session: crud_orquestracao.create_jobs_bulk(
+                    session, paciente_ids=novos_lote, tipo="reclassificacao",
+                    max_tentativas=settings.ORCHESTRATION_MAX_RETRIES
+                )
+            )
+            novos_outliers.extend(novos_lote)
+            worker_pool.notify()
+        await db.commit()
+        # Libera os objetos do lote (a tabela inteira não fica em memória)
+        db.expunge_all()
+        total += len(lote)
+        if ao_progresso is not None:
+            await ao_progresso(_resumo(total, alterados, len(novos_outliers), jobs_enfileirados, inicio))
+
+    if len(mudancas_mapa) > 1000:
+        clustering_cache.invalidate()
+    else:
+        for paciente_id, latitude, longitude, is_outlier in mudancas_mapa:
+            clustering_cache.notify_patient(paciente_id, latitude, longitude, is_outlier)
+
+    resumo = _resumo(total, alterados, len(novos_outliers), jobs_enfileirados, inicio)
+    logger.info(f"Reclassificação concluída: {total} pacientes, {alterados} alterados "
+                f"em {resumo['tempo_segundos']:.1f}s")
+    return resumo
+
+
+def _resumo(total: int, alterados: int, novos_outliers: int, jobs_enfileirados: int,
+            inicio: float) -> Dict[str, Any]:
+    """Resumo no formato de ReclassificacaoResponse."""
+    return {
+        "total": total,
+        "alterados": alterados,
+        "novos_outliers": novos_outliers,
+        "jobs_enfileirados": jobs_enfileirados,
+        "tempo_segundos": round(time.perf_counter() - inicio, 3),
+    }
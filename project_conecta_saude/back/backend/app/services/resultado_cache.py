@@ -0,0 +1,226 @@
+"""
+Memoização dos resultados dos serviços de ML e LLM.
+
+Pacientes de uma mesma comunidade repetem perfis categóricos e medições
+parecidas; o mesmo vetor de features sempre gera a mesma classificação.
+A chave é o hash do vetor canonicalizado, prefixado pela versão do modelo
+(ML) ou do índice de protocolos (LLM): trocar a versão invalida tudo. A
+versão do modelo vem do próprio serviço de ML (GET / no startup e
+periodicamente, e em cada resposta de classificação).
+
+Camadas: memória do processo (LRU com TTL) e Redis opcional (compartilhado
+entre réplicas e preservado entre deploys). Chamadas concorrentes com a
+mesma chave aguardam uma única requisição ao serviço.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.cache import LRUTTLCache, MISS
+from app.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis é opcional: sem o pacote, o cache fica só em memória
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Passo de quantização das medições clínicas na chave do LLM (opcional).
+# Pacientes no mesmo "degrau" recebem o mesmo plano de ação.
+_PASSOS_LLM = {
+    "idade": 5,
+    "imc": 1.0,
+    "pressao_sistolica_mmHg": 5,
+    "pressao_diastolica_mmHg": 5,
+    "glicemia_jejum_mg_dl": 5,
+    "colesterol_total_mg_dl": 10,
+    "hdl_mg_dl": 5,
+    "triglicerides_mg_dl": 10,
+}
+
+
+def canonical_value(value: Any) -> Any:
+    """Normaliza um valor para compor chaves/hashes (25 e 25.0 são a mesma medição)."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {key: canonical_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical_value(item) for item in value]
+    return str(value)
+
+
+def hash_canonico(data: Any) -> str:
+    """SHA-256 do JSON canônico (chaves ordenadas, números normalizados)."""
+    payload = json.dumps(canonical_value(data), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def quantizar_features(features: Dict[str, Any]) -> Dict[str, Any]:
+    """Arredonda as medições clínicas para o degrau configurado em _PASSOS_LLM."""
+    quantizadas = dict(features)
+    for campo, passo in _PASSOS_LLM.items():
+        valor = quantizadas.get(campo)
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            quantizadas[campo] = round(valor / passo) * passo
+    return quantizadas
+
+
+class ResultCache:
+    """Cache de respostas de um serviço, com métricas de acerto."""
+
+    def __init__(self, nome: str, version: str, ttl: float, max_entries: int):
+        self.nome = nome
+        self.version = version
+        self.ttl = ttl
+        self.memory = LRUTTLCache(max_entries)
+        self._redis = None
+        if aioredis is not None and settings.REDIS_URL:
+            self._redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits_memoria = 0
+        self.hits_redis = 0
+        self.misses = 0
+
+    def chave(self, data: Any) -> str:
+        return f"{self.nome}:{self.version}:{hash_canonico(data)}"
+
+    def set_version(self, version: Optional[str]) -> None:
+        """Troca a versão (ex: modelo retreinado); as chaves antigas deixam de ser usadas."""
+        if version and version != self.version:
+            logger.info(f"Cache {self.nome}: versão {self.version} -> {version}")
+            self.version = version
+            self.memory.clear()
+
+    async def get(self, data: Any) -> Any:
+        """Resultado memoizado para 'data' (memória -> Redis) ou MISS."""
+        if self.ttl <= 0:
+            return MISS
+        key = self.chave(data)
+        value = self.memory.get(key)
+        if value is not MISS:
+            self.hits_memoria += 1
+            return value
+        value = await self._get_redis(key)
+        if value is not MISS:
+            self.hits_redis += 1
+            self.memory.set(key, value, self.ttl)
+            return value
+        self.misses += 1
+        return MISS
+
+    async def set(self, data: Any, result: dict) -> None:
+        """Grava um resultado calculado fora de get_or_call (ex: chamadas em lote)."""
+        if self.ttl <= 0:
+            return
+        key = self.chave(data)
+        self.memory.set(key, result, self.ttl)
+        await self._set_redis(key, result)
+
+    async def get_or_call(
+        self, data: Any, call: Callable[[], Awaitable[dict]],
+        cacheable: Callable[[dict], bool] = lambda result: True,
+    ) -> dict:
+        """
+        Retorna o resultado memoizado para 'data' ou executa 'call'.
+        Só resultados aprovados por 'cacheable' são guardados.
+        """
+        if self.ttl <= 0:
+            return await call()
+
+        key = self.chave(data)
+        value = self.memory.get(key)
+        if value is not MISS:
+            self.hits_memoria += 1
+            return value
+
+        value = await self._get_redis(key)
+        if value is not MISS:
+            self.hits_redis += 1
+            self.memory.set(key, value, self.ttl)
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # Mesmo vetor já está sendo calculado: aguarda o resultado dele
+            self.hits_memoria += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise  # quem foi cancelado é este chamador
+                # O cálculo em andamento foi cancelado: refaz a chamada
+                return await self.get_or_call(data, call, cacheable)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            # Cancelado (DAG abortado, parada dos workers): libera quem aguarda
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # evita o aviso de exceção não consumida
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(result)
+        if cacheable(result):
+            # A chave usa a versão vigente no momento da gravação
+            key = self.chave(data)
+            self.memory.set(key, result, self.ttl)
+            await self._set_redis(key, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.hits_memoria + self.hits_redis
+        total = hits + self.misses
+        return {
+            "versao": self.version,
+            "hits_memoria": self.hits_memoria,
+            "hits_redis": self.hits_redis,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+    # --- Redis ---
+
+    async def _get_redis(self, key: str) -> Any:
+        if self._redis is None:
+            return MISS
+        try:
+            raw = await self._redis.get(key)
+        except Exception as e:
+            logger.warning(f"Redis indisponível para leitura do cache {self.nome}: {e}")
+            return MISS
+        return MISS if raw is None else json.loads(raw)
+
+    async def _set_redis(self, key: str, result: dict) -> None:
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(key, json.dumps(result), ex=int(self.ttl))
+        except Exception as e:
+            logger.warning(f"Redis indisponível para escrita do cache {self.nome}: {e}")
+
+
+# Instâncias usadas pelo http_client
+ml_result_cache = ResultCache(
+    "ml", settings.ML_MODEL_VERSION,
+    ttl=settings.ML_RESULT_CACHE_TTL, max_entries=settings.ML_RESULT_CACHE_MAX_ENTRIES,
+)
+llm_result_cache = ResultCache(
+    "llm", settings.LLM_PROTOCOL_INDEX_VERSION,
+    ttl=settings.LLM_RESULT_CACHE_TTL, max_entries=settings.LLM_RESULT_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,244 @@
+"""
+Clientes HTTP de saída compartilhados, um pool por serviço externo.
+
+Cada upstream (ML, LLM, BrasilAPI, Nominatim) tem seu próprio
+httpx.AsyncClient com conexões keep-alive limitadas, timeouts próprios,
+retry com backoff exponencial e jitter (apenas para chamadas idempotentes)
+e um circuit breaker: após falhas seguidas o circuito abre e as chamadas
+falham na hora (CircuitOpenError) até o próximo teste, em vez de prender
+requisições e workers esperando um serviço fora do ar.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Métodos que podem ser repetidos sem efeito colateral
+_IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Respostas transitórias que valem um retry
+_STATUS_RETRY = {429, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """O circuito do upstream está aberto: a chamada nem foi feita."""
+
+    def __init__(self, nome: str):
+        super().__init__(f"Circuito aberto para o serviço '{nome}'")
+        self.nome = nome
+
+
+class CircuitBreaker:
+    """
+    Estados: 'fechado' (normal) -> 'aberto' após 'failure_threshold' falhas
+    seguidas -> 'meio_aberto' depois de 'reset_timeout' segundos, quando uma
+    única chamada de teste decide se o circuito fecha ou abre de novo.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "fechado"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0:
+            return True
+        now = time.monotonic()
+        if self.state == "aberto":
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            self.state = "meio_aberto"
+            self._probe_at = None
+        if self.state == "meio_aberto":
+            # Uma chamada de teste por vez (libera de novo se ela se perder)
+            if self._probe_at is not None and now - self._probe_at < self.reset_timeout:
+                return False
+            self._probe_at = now
+        return True
+
+    def record_success(self) -> None:
+        self.state = "fechado"
+        self.failures = 0
+        self._probe_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "meio_aberto" or (
+            self.failure_threshold > 0 and self.failures >= self.failure_threshold
+        ):
+            self.state = "aberto"
+            self._opened_at = time.monotonic()
+            self._probe_at = None
+
+
+class Upstream:
+    """Pool de conexões + política de timeout/retry/circuito de um serviço."""
+
+    def __init__(
+        self,
+        nome: str,
+        *,
+        timeout: float,
+        max_connections: int,
+        max_keepalive: int,
+        retries: int = settings.HTTP_RETRIES,
+        retry_post: bool = False,
+        min_interval: float = 0.0,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.nome = nome
+        self.retries = retries
+        # POST só é repetido quando o serviço é uma função pura (ex: classificação)
+        self.retry_post = retry_post
+        # Intervalo mínimo entre requisições (limite de taxa do serviço); 0 desativa
+        self.min_interval = min_interval
+        self._rate_lock = asyncio.Lock()
+        self._last_request = 0.0
+        self.breaker = CircuitBreaker(
+            settings.HTTP_CIRCUIT_FAILURE_THRESHOLD, settings.HTTP_CIRCUIT_RESET_TIMEOUT
+        )
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=settings.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            headers=headers,
+        )
+
+    async def request(
+        self, method: str, url: str, *, retry: Optional[bool] = None, **kwargs: Any
+    ) -> httpx.Response:
+        """
+        Faz a requisição pelo pool do upstream.
+        Retorna a resposta (inclusive 4xx/5xx; quem chama decide) ou propaga
+        httpx.RequestError após esgotar os retries. Levanta CircuitOpenError
+        sem chamar o serviço quando o circuito está aberto.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.nome)
+
+        method = method.upper()
+        if retry is None:
+            retry = method in _IDEMPOTENTES or self.retry_post
+        # A chamada de teste do circuito meio aberto não repete
+        if self.breaker.state == "meio_aberto":
+            retry = False
+        tentativas = 1 + (self.retries if retry else 0)
+
+        response: Optional[httpx.Response] = None
+        erro: Optional[httpx.RequestError] = None
+        for tentativa in range(tentativas):
+            try:
+                await self._aguardar_vez()
+                response = await self.client.request(method, url, **kwargs)
+                erro = None
+            except httpx.RequestError as e:
+                response, erro = None, e
+            else:
+                if response.status_code not in _STATUS_RETRY:
+                    break
+
+            if tentativa + 1 < tentativas:
+                # Full jitter: espalha os retries de várias requisições no tempo
+                espera = random.uniform(0, settings.HTTP_RETRY_BACKOFF * 2 ** tentativa)
+                logger.warning(
+                    f"{self.nome}: tentativa {tentativa + 1}/{tentativas} falhou "
+                    f"({erro or response.status_code}); nova tentativa em {espera:.2f}s"
+                )
+                await asyncio.sleep(espera)
+
+        if erro is not None or response.status_code >= 500:
+            self.breaker.record_failure()
+            if self.breaker.state == "aberto":
+                logger.error(f"{self.nome}: circuito aberto após {self.breaker.failures} falhas")
+        else:
+            self.breaker.record_success()
+
+        if erro is not None:
+            raise erro
+        return response
+
+    async def _aguardar_vez(self) -> None:
+        """Espaça as requisições (inclusive retries) em pelo menos min_interval segundos."""
+        if self.min_interval <= 0:
+            return
+        async with self._rate_lock:
+            espera = self._last_request + self.min_interval - time.monotonic()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            self._last_request = time.monotonic()
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"circuito": self.breaker.state, "falhas_seguidas": self.breaker.failures}
+
+
+class UpstreamRegistry:
+    """Registro dos upstreams da aplicação (um cliente por serviço)."""
+
+    def __init__(self):
+        self._upstreams: Dict[str, Upstream] = {}
+
+    def register(self, upstream: Upstream) -> Upstream:
+        self._upstreams[upstream.nome] = upstream
+        return upstream
+
+    def get(self, nome: str) -> Upstream:
+        return self._upstreams[nome]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {nome: upstream.stats() for nome, upstream in self._upstreams.items()}
+
+    async def aclose(self) -> None:
+        """Fecha os pools (shutdown da aplicação)."""
+        for upstream in self._upstreams.values():
+            await upstream.client.aclose()
+
+
+upstreams = UpstreamRegistry()
+
+ml_upstream = upstreams.register(Upstream(
+    "ml",
+    timeout=settings.HTTP_ML_TIMEOUT,
+    max_connections=settings.HTTP_MAX_CONNECTIONS,
+    max_keepalive=settings.HTTP_MAX_KEEPALIVE,
+    retry_post=True,  # classificação não tem efeito colateral
+))
+llm_upstream = upstreams.register(Upstream(
+    "llm",
+    timeout=settings.HTTP_LLM_TIMEOUT,
+    max_connections=settings.HTTP_MAX_CONNECTIONS,
+    max_keepalive=settings.HTTP_MAX_KEEPALIVE,
+))
+brasilapi_upstream = upstreams.register(Upstream(
+    "brasilapi",
+    timeout=settings.HTTP_GEOCODING_TIMEOUT,
+    max_connections=settings.HTTP_MAX_CONNECTIONS,
+    max_keepalive=settings.HTTP_MAX_KEEPALIVE,
+))
+# A política de uso do Nominatim pede no máximo ~1 requisição por segundo
+# (o limite vale por processo; réplicas somam as taxas)
+nominatim_upstream = upstreams.register(Upstream(
+    "nominatim",
+    timeout=settings.HTTP_GEOCODING_TIMEOUT,
+    max_connections=2,
+    max_keepalive=2,
+    min_interval=settings.NOMINATIM_MIN_INTERVAL,
+    headers={"User-Agent": "ConectaSaude/1.0"},
+))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Migration: Busca indexada de pacientes e agentes
+- Coluna 'nome_normalizado' (sem acentos, minúsculo) em pacientes e agentes
+- Extensão pg_trgm e índices GIN de trigramas (nome normalizado e email)
+- Índices em lower(email) para o atalho de email exato
+Execute com: python migrations/add_busca_trigram.py
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar o diretório do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.texto import normalizar_texto
+from app.db.session import engine
+from sqlalchemy import text
+
+TABELAS = ("pacientes", "agentes")
+LOTE = 1000
+
+
+def _backfill(connection, tabela):
+    """Preenche nome_normalizado das linhas existentes (em Python, sem depender de unaccent)."""
+    total = 0
+    ultimo_id = 0
+    while True:
+        linhas = connection.execute(text(
+            f"SELECT id, nome FROM {tabela} "
+            "WHERE id > :ultimo AND nome_normalizado IS NULL ORDER BY id LIMIT :lote"
+        ), {"ultimo": ultimo_id, "lote": LOTE}).all()
+        if not linhas:
+            return total
+        connection.execute(
+            text(f"UPDATE {tabela} SET nome_normalizado = :normalizado WHERE id = :id"),
+            [{"id": id_, "normalizado": normalizar_texto(nome)} for id_, nome in linhas],
+        )
+        connection.commit()
+        total += len(linhas)
+        ultimo_id = linhas[-1][0]
+
+
+def run_migration():
+    """Cria a coluna normalizada, preenche os dados existentes e cria os índices"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for tabela in TABELAS:
+                connection.execute(text(
+                    f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS nome_normalizado VARCHAR"
+                ))
+            connection.commit()
+
+            for tabela in TABELAS:
+                print(f"ℹ️ {tabela}: {_backfill(connection, tabela)} nomes normalizados")
+
+            for tabela in TABELAS:
+                connection.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{tabela}_nome_normalizado_trgm "
+                    f"ON {tabela} USING gin (nome_normalizado gin_trgm_ops)"
+                ))
+                connection.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{tabela}_email_trgm "
+                    f"ON {tabela} USING gin (lower(email) gin_trgm_ops)"
+                ))
+                connection.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{tabela}_email_lower "
+                    f"ON {tabela} (lower(email))"
+                ))
+            connection.commit()
+            print("✅ Índices de busca criados com sucesso!")
+            return True
+    except Exception as e:
+        print(f"❌ Erro ao executar migration: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
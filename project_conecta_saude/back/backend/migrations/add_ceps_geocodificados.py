@@ -0,0 +1,28 @@
+"""
+Migration: Criar tabela de cache persistente de CEPs
+
+Adiciona a tabela:
+- ceps_geocodificados: CEPs já resolvidos (e CEPs inexistentes) pelo GeocodingService
+
+Para rodar:
+python migrations/add_ceps_geocodificados.py
+"""
+import sys
+from pathlib import Path
+
+# Adicionar o diretório do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.base import Base
+from app.models.geocoding_models import CepGeocodificado
+
+def create_tables():
+    """
+    Cria a tabela ceps_geocodificados (se ainda não existir).
+    """
+    from app.db.session import engine
+    Base.metadata.create_all(bind=engine, tables=[CepGeocodificado.__table__])
+    print("✅ Tabela 'ceps_geocodificados' criada com sucesso!")
+
+if __name__ == "__main__":
+    create_tables()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Migration: Coluna features_hash em pacientes
+Execute com: python migrations/add_features_hash.py
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar o diretório do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.session import engine
+from sqlalchemy import text
+
+def run_migration():
+    """Adiciona o hash das features usadas na última classificação ML/LLM"""
+    try:
+        with engine.connect() as connection:
+            # Pacientes existentes ficam com NULL: a próxima atualização
+            # de cada um re-executa ML/LLM uma vez e grava o hash.
+            connection.execute(text(
+                "ALTER TABLE pacientes ADD COLUMN IF NOT EXISTS features_hash VARCHAR(64)"
+            ))
+            connection.commit()
+            print("✅ Coluna 'features_hash' adicionada com sucesso!")
+            return True
+    except Exception as e:
+        print(f"❌ Erro ao executar migration: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
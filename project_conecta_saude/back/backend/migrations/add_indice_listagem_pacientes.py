@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Migration: Índice (created_at, id) para a listagem de pacientes por cursor
+Execute com: python migrations/add_indice_listagem_pacientes.py
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar o diretório do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.session import engine
+from sqlalchemy import text
+
+def run_migration():
+    """Cria o índice usado pela paginação keyset (created_at, id)"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_pacientes_created_at_id "
+                "ON pacientes(created_at, id)"
+            ))
+            # Atualiza as estatísticas usadas pelo total estimado
+            connection.execute(text("ANALYZE pacientes"))
+            connection.commit()
+            print("✅ Índice 'ix_pacientes_created_at_id' criado com sucesso!")
+            return True
+    except Exception as e:
+        print(f"❌ Erro ao executar migration: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
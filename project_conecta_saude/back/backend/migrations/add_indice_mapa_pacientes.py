@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Migration: Índice de coordenadas para o mapa de pacientes
+Execute com: python migrations/add_indice_mapa_pacientes.py
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar o diretório do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.session import engine
+from sqlalchemy import text
+
+def run_migration():
+    """Cria o índice usado pelos filtros de bounding box do mapa"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_pacientes_lat_lon "
+                "ON pacientes(latitude, longitude)"
+            ))
+            connection.commit()
+            print("✅ Índice 'ix_pacientes_lat_lon' criado com sucesso!")
+            return True
+    except Exception as e:
+        print(f"❌ Erro ao executar migration: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
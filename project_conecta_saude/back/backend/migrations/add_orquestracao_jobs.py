@@ -0,0 +1,29 @@
+"""
+Migration: Criar tabela da fila de orquestração ML/LLM
+
+Adiciona a tabela:
+- orquestracao_jobs: Jobs de Geocodificação -> ML -> LLM processados em background
+
+Para rodar:
+python migrations/add_orquestracao_jobs.py
+"""
+import sys
+from pathlib import Path
+
+# Adicionar o diretório do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.base import Base
+from app.models.paciente_models import Paciente
+from app.models.orquestracao_models import OrquestracaoJob
+
+def create_tables():
+    """
+    Cria a tabela orquestracao_jobs (se ainda não existir).
+    """
+    from app.db.session import engine
+    Base.metadata.create_all(bind=engine, tables=[OrquestracaoJob.__table__])
+    print("✅ Tabela 'orquestracao_jobs' criada com sucesso!")
+
+if __name__ == "__main__":
+    create_tables()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Migration: Jobs de reclassificação em massa na fila de orquestração
+Execute com: python migrations/add_reclassificacao_em_massa_jobs.py
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar o diretório do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.session import engine
+from sqlalchemy import text
+
+def run_migration():
+    """Permite jobs sem paciente e adiciona o resumo (resultado) do job"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text(
+                "ALTER TABLE orquestracao_jobs ALTER COLUMN paciente_id DROP NOT NULL"
+            ))
+            connection.execute(text(
+                "ALTER TABLE orquestracao_jobs ADD COLUMN IF NOT EXISTS resultado JSON"
+            ))
+            connection.commit()
+            print("✅ Coluna 'paciente_id' opcional e coluna 'resultado' adicionada com sucesso!")
+            return True
+    except Exception as e:
+        print(f"❌ Erro ao executar migration: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
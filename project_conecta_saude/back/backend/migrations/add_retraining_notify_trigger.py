@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Migration: Trigger NOTIFY em retraining_data
+Cada nova confirmação do profissional avisa o scheduler de retreinamento
+(model-LLM/scheduler_retrain.py, que faz LISTEN no canal 'retraining_data')
+em vez de ele consultar a tabela a cada poucas horas.
+Execute com: python migrations/add_retraining_notify_trigger.py
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar o diretório do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.session import engine
+from sqlalchemy import text
+
+def run_migration():
+    """Cria a função e o trigger que publicam o id de cada nova confirmação"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("""
+                CREATE OR REPLACE FUNCTION notify_retraining_data() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM pg_notify('retraining_data', NEW.id::text);
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            connection.execute(text(
+                "DROP TRIGGER IF EXISTS retraining_data_notify ON retraining_data"
+            ))
+            connection.execute(text("""
+                CREATE TRIGGER retraining_data_notify
+                AFTER INSERT ON retraining_data
+                FOR EACH ROW EXECUTE FUNCTION notify_retraining_data()
+            """))
+            connection.commit()
+            print("✅ Trigger 'retraining_data_notify' criado com sucesso!")
+            return True
+    except Exception as e:
+        print(f"❌ Erro ao executar migration: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
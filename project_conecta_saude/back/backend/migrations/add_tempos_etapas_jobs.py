@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Migration: Coluna tempos_etapas em orquestracao_jobs
+Execute com: python migrations/add_tempos_etapas_jobs.py
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar o diretório do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.session import engine
+from sqlalchemy import text
+
+def run_migration():
+    """Adiciona a duração (ms) de cada etapa da orquestração ao job"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text(
+                "ALTER TABLE orquestracao_jobs ADD COLUMN IF NOT EXISTS tempos_etapas JSON"
+            ))
+            connection.commit()
+            print("✅ Coluna 'tempos_etapas' adicionada com sucesso!")
+            return True
+    except Exception as e:
+        print(f"❌ Erro ao executar migration: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
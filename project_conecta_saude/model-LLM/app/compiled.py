@@ -0,0 +1,220 @@
+"""
+Artefato de inferência compilado: o pipeline ajustado exportado em arrays
+NumPy e avaliado sem scikit-learn, pandas ou joblib.
+
+    models/registry/<versao>/model.npz   ao lado do model.pkl de cada versão
+    models/modelo_outliers_v1.npz        versão ativa (copiada na promoção)
+
+O arquivo é um .npz sem objetos pickle:
+
+    meta          JSON com formato, motor, versão, data de treino e as tabelas
+                  do codificador (app/encoder.compile_spec)
+    calibration   (inclinação, intercepto) da probabilidade de outlier
+    engine.*      arrays do motor (to_arrays de app/engines.py; as árvores
+                  vêm achatadas em arrays de nós)
+
+No serviço (MODEL_SERVING=compiled, ver app/model.py) os pacientes passam
+pelo mesmo FeatureEncoder do modo pipeline e o motor é avaliado com
+NumPy: a subida não importa o scikit-learn nem o pandas, o que reduz o
+tempo de partida e a memória residente do processo.
+"""
+import io
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+
+from app.encoder import FeatureEncoder, UnsupportedPipeline
+
+FORMAT_VERSION = 1
+
+_Scorer = Callable[[np.ndarray], np.ndarray]
+
+
+def export_compiled(artifact: Dict[str, Any], path: Path) -> None:
+    """
+    Exporta o artefato do retrain_model.py ({'model': Pipeline, 'version',
+    'trained_at', ...}) para 'path' (troca atômica). Levanta
+    UnsupportedPipeline se algum passo não tiver versão compilada.
+    """
+    from app.encoder import compile_spec
+    from app.engines import ENGINES
+
+    model = artifact["model"]
+    spec = compile_spec(model)
+    if len(model.steps) != 2:
+        raise UnsupportedPipeline("passos entre o pré-processamento e o motor")
+    estimator = model.steps[1][1]
+    names = [name for name, engine_class in ENGINES.items() if type(estimator) is engine_class]
+    if not names:
+        raise UnsupportedPipeline(f"motor {type(estimator).__name__}")
+    try:
+        arrays = estimator.to_arrays()
+    except NotImplementedError as e:
+        raise UnsupportedPipeline(str(e))
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "engine": names[0],
+        "version": artifact.get("version"),
+        "trained_at": artifact.get("trained_at"),
+        "features": list(artifact.get("features") or spec["fields"]),
+        "encoder": spec,
+    }
+    payload = {f"engine.{key}": value for key, value in arrays.items()}
+    # Motores sem calibração (gradient boosting) já produzem o logito
+    payload["calibration"] = np.array(getattr(estimator, "calibration_", (1.0, 0.0)), dtype=np.float64)
+
+    buffer = io.BytesIO()
+    np.savez(buffer, meta=np.array(json.dumps(meta, ensure_ascii=False)), **payload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(buffer.getvalue())
+    os.replace(tmp_path, path)
+
+
+class CompiledModel:
+    """Versão compilada carregada: codificador + motor avaliado com NumPy."""
+
+    def __init__(self, meta: Dict[str, Any], arrays: Dict[str, np.ndarray], calibration: np.ndarray):
+        self.engine = meta["engine"]
+        self.version = meta.get("version")
+        self.trained_at = meta.get("trained_at")
+        self.features = meta["features"]
+        estimator = CompiledEstimator(_SCORERS[self.engine](arrays), calibration)
+        self.encoder = FeatureEncoder.from_spec(meta["encoder"], estimator)
+
+    @classmethod
+    def load(cls, source) -> "CompiledModel":
+        """Lê o artefato de um caminho ou arquivo aberto (sem pickle)."""
+        with np.load(source, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("format") != FORMAT_VERSION:
+                raise ValueError(f"Formato de artefato compilado não suportado: {meta.get('format')}")
+            if meta.get("engine") not in _SCORERS:
+                raise ValueError(f"Motor sem avaliação compilada: {meta.get('engine')}")
+            arrays = {key[len("engine."):]: data[key] for key in data.files if key.startswith("engine.")}
+            return cls(meta, arrays, data["calibration"])
+
+
+class CompiledEstimator:
+    """
+    Estimador final: mesma interface dos motores de app/engines.py. A decisão
+    é score > 0 (limiar do detector; no gradient boosting o score é o logito,
+    então equivale a probabilidade > 0.5) e a calibração só dá a confiança.
+    """
+
+    def __init__(self, score: _Scorer, calibration: np.ndarray):
+        self._score = score
+        self.slope, self.intercept = (float(value) for value in calibration)
+
+    def _proba(self, scores: np.ndarray) -> np.ndarray:
+        z = self.slope * scores + self.intercept
+        outlier = 1.0 / (1.0 + np.exp(-np.clip(z, -500, 500)))
+        return np.column_stack([1.0 - outlier, outlier])
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self._proba(self._score(np.asarray(X, dtype=np.float64)))
+
+    def predict(self, X) -> np.ndarray:
+        return (self._score(np.asarray(X, dtype=np.float64)) > 0).astype(int)
+
+    def predict_with_proba(self, X) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self._score(np.asarray(X, dtype=np.float64))
+        return (scores > 0).astype(int), self._proba(scores)
+
+
+class _TreeEnsemble:
+    """Árvores achatadas: desce todas as linhas em todas as árvores ao mesmo tempo."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.value = arrays["value"]
+        self.missing_left = arrays["missing_left"]
+        self.has_missing = bool(self.missing_left.any())
+        self.roots = arrays["roots"]
+        self.depth = int(arrays["depth"])
+        self.float32_input = bool(arrays.get("float32_input", False))
+
+    def leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Valor da folha de cada linha em cada árvore (n x árvores)."""
+        if self.float32_input:
+            X = X.astype(np.float32)
+        node = np.tile(self.roots, (len(X), 1))
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self.depth):
+            values = X[rows, self.feature[node]]
+            go_left = values <= self.threshold[node]
+            if self.has_missing:
+                go_left |= np.isnan(values) & self.missing_left[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+
+def _isolation_forest(arrays: Dict[str, np.ndarray]) -> _Scorer:
+    trees = _TreeEnsemble(arrays)
+    normalizer = float(arrays["path_normalizer"])
+    offset = float(arrays["offset"])
+
+    def score(X: np.ndarray) -> np.ndarray:
+        # -decision_function do IsolationForest: offset_ - score_samples
+        return offset + 2.0 ** (-trees.leaf_values(X).sum(axis=1) / normalizer)
+    return score
+
+
+def _gradient_boosting(arrays: Dict[str, np.ndarray]) -> _Scorer:
+    trees = _TreeEnsemble(arrays)
+    baseline = float(arrays["baseline"])
+
+    def score(X: np.ndarray) -> np.ndarray:
+        return baseline + trees.leaf_values(X).sum(axis=1)
+    return score
+
+
+def _lof(arrays: Dict[str, np.ndarray]) -> _Scorer:
+    fit_X = arrays["fit_X"]
+    fit_norms = (fit_X ** 2).sum(axis=1)
+    k_distance = arrays["k_distance"]
+    lrd = arrays["lrd"]
+    k = int(arrays["n_neighbors"])
+    offset = float(arrays["offset"])
+
+    def score(X: np.ndarray) -> np.ndarray:
+        squared = np.maximum((X ** 2).sum(axis=1)[:, None] - 2.0 * X @ fit_X.T + fit_norms, 0.0)
+        neighbors = np.argpartition(squared, k - 1, axis=1)[:, :k]
+        distances = np.sqrt(np.take_along_axis(squared, neighbors, axis=1))
+        reach = np.maximum(distances, k_distance[neighbors])
+        x_lrd = 1.0 / (reach.mean(axis=1) + 1e-10)
+        score_samples = -(lrd[neighbors] / x_lrd[:, None]).mean(axis=1)
+        return offset - score_samples
+    return score
+
+
+def _hbos(arrays: Dict[str, np.ndarray]) -> _Scorer:
+    edges, log_density = arrays["edges"], arrays["log_density"]
+    edge_offsets, density_offsets = arrays["edge_offsets"], arrays["density_offsets"]
+    columns = [
+        (edges[edge_offsets[j]:edge_offsets[j + 1]], log_density[density_offsets[j]:density_offsets[j + 1]])
+        for j in range(len(edge_offsets) - 1)
+    ]
+    threshold = float(arrays["threshold"])
+
+    def score(X: np.ndarray) -> np.ndarray:
+        total = np.zeros(len(X))
+        for j, (column_edges, column_density) in enumerate(columns):
+            total += column_density[np.searchsorted(column_edges, X[:, j], side="right")]
+        return total - threshold
+    return score
+
+
+_SCORERS: Dict[str, Callable[[Dict[str, np.ndarray]], _Scorer]] = {
+    "isolation_forest": _isolation_forest,
+    "lof": _lof,
+    "hbos": _hbos,
+    "gradient_boosting": _gradient_boosting,
+}
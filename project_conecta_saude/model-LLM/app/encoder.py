@@ -0,0 +1,254 @@
+"""
+Codificador de features sem pandas para a inferência.
+
+O modelo salvo é um Pipeline do scikit-learn cujo primeiro passo é um
+ColumnTransformer (OneHot/Ordinal para categorias, StandardScaler para
+números). Montar um DataFrame a cada requisição domina a latência de uma
+predição; aqui o ColumnTransformer ajustado é "compilado" no carregamento
+em tabelas de consulta (categoria -> coluna de saída, média/escala por
+coluna) e cada paciente é escrito direto numa linha NumPy pré-alocada, que
+segue para o restante do pipeline.
+
+As tabelas compiladas (compile_spec) só têm tipos JSON: o artefato
+exportado por app/compiled.py as guarda e o codificador é remontado com
+from_spec, sem importar o scikit-learn.
+
+Transformadores não suportados fazem from_pipeline retornar None e o
+modelo continua usando o caminho com DataFrame.
+"""
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.pipeline import DEFAULT_VALUES
+
+# Operação compilada: escreve o valor de uma feature na linha de saída
+_Op = Callable[[np.ndarray, Any], None]
+# Descrição serializável de uma operação: [tipo, argumentos...]
+_OpSpec = List[Any]
+
+
+class UnsupportedPipeline(Exception):
+    """O pipeline usa algum passo que o codificador não sabe compilar."""
+
+
+class FeatureEncoder:
+    """
+    Converte pacientes (objetos com os atributos das features) na matriz
+    de entrada do estimador final, equivalente ao ColumnTransformer.
+    """
+
+    def __init__(self, fields: List[str], ops: List[List[_Op]], width: int, estimator):
+        self.fields = fields
+        self._ops = ops  # uma lista de operações por campo de entrada
+        self.width = width
+        # Restante do pipeline (recebe a matriz já codificada)
+        self.estimator = estimator
+        self._local = threading.local()
+
+    @classmethod
+    def from_pipeline(cls, model) -> Optional["FeatureEncoder"]:
+        """Compila o ColumnTransformer do pipeline; None se não for suportado."""
+        try:
+            return cls._compile(model)
+        except UnsupportedPipeline as e:
+            print(f"AVISO: Codificador rápido desativado ({e}). Usando DataFrame.")
+            return None
+
+    @classmethod
+    def _compile(cls, model) -> "FeatureEncoder":
+        from sklearn.pipeline import Pipeline
+
+        spec = compile_spec(model)
+        estimator = model.steps[1][1] if len(model.steps) == 2 else Pipeline(model.steps[1:])
+        return cls.from_spec(spec, estimator)
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any], estimator) -> "FeatureEncoder":
+        """Monta o codificador a partir das tabelas de compile_spec."""
+        fields = spec["fields"]
+        ops = [[_build_op(op_spec) for op_spec in spec["ops"][field]] for field in fields]
+        return cls(fields, ops, spec["width"], estimator)
+
+    def _write(self, row: np.ndarray, patient) -> None:
+        for field, field_ops in zip(self.fields, self._ops):
+            value = getattr(patient, field)
+            if value is None:
+                value = DEFAULT_VALUES.get(field)
+            for op in field_ops:
+                op(row, value)
+
+    def encode(self, patient) -> np.ndarray:
+        """Uma linha (1 x largura) num buffer pré-alocado por thread."""
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = self._local.row = np.zeros((1, self.width))
+        else:
+            row.fill(0.0)
+        self._write(row[0], patient)
+        return row
+
+    def encode_batch(self, patients: Sequence) -> np.ndarray:
+        """Matriz (n x largura) para vários pacientes."""
+        matrix = np.zeros((len(patients), self.width))
+        for row, patient in zip(matrix, patients):
+            self._write(row, patient)
+        return matrix
+
+
+def compile_spec(model) -> Dict[str, Any]:
+    """
+    Tabelas do ColumnTransformer do pipeline ajustado:
+    {"fields": [...], "width": n, "ops": {campo: [[tipo, argumentos...], ...]}}.
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+
+    if not isinstance(model, Pipeline) or not isinstance(model.steps[0][1], ColumnTransformer):
+        raise UnsupportedPipeline("o modelo não começa com um ColumnTransformer")
+    transformer = model.steps[0][1]
+    if getattr(transformer, "sparse_output_", False):
+        raise UnsupportedPipeline("ColumnTransformer com saída esparsa")
+    fields = [str(field) for field in getattr(transformer, "feature_names_in_", [])]
+    if not fields:
+        raise UnsupportedPipeline("ColumnTransformer ajustado sem nomes de colunas")
+
+    ops: Dict[str, List[_OpSpec]] = {field: [] for field in fields}
+    offset = 0
+    for name, step, columns in transformer.transformers_:
+        if step == "drop":
+            continue
+        columns = _column_names(columns, fields)
+        if not columns:
+            continue
+        steps = list(step.steps) if isinstance(step, Pipeline) else [("", step)]
+        offset = _compile_columns(steps, columns, offset, ops)
+    return {"fields": fields, "width": offset, "ops": ops}
+
+
+def _column_names(columns, fields: List[str]) -> List[str]:
+    """Normaliza a seleção de colunas do ColumnTransformer para nomes."""
+    if isinstance(columns, slice) or callable(columns):
+        raise UnsupportedPipeline("seleção de colunas por slice/função")
+    columns = list(np.atleast_1d(columns))
+    if columns and isinstance(columns[0], (bool, np.bool_)):
+        return [field for field, selected in zip(fields, columns) if selected]
+    return [fields[c] if isinstance(c, (int, np.integer)) else str(c) for c in columns]
+
+
+def _compile_columns(steps, columns: List[str], offset: int, ops: Dict[str, List[_OpSpec]]) -> int:
+    """
+    Compila uma cadeia (imputer opcional -> codificador/escala) aplicada a
+    'columns'. Retorna o próximo índice livre da linha de saída.
+    """
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import (
+        FunctionTransformer, OneHotEncoder, OrdinalEncoder, StandardScaler
+    )
+
+    *pre, (_, last) = steps
+    fills: Dict[int, Any] = {}
+    for _, step in pre:
+        if not isinstance(step, SimpleImputer):
+            raise UnsupportedPipeline(f"passo intermediário {type(step).__name__}")
+        fills = {i: _key(value) for i, value in enumerate(step.statistics_)}
+
+    # Versões recentes do scikit-learn guardam o 'passthrough' ajustado como
+    # um FunctionTransformer identidade
+    if isinstance(last, FunctionTransformer) and last.func is None:
+        last = "passthrough"
+    if isinstance(last, str) and last == "passthrough":
+        for i, column in enumerate(columns):
+            ops[column].append(["number", offset + i, fills.get(i), 0.0, 1.0])
+        return offset + len(columns)
+
+    if isinstance(last, StandardScaler):
+        for i, column in enumerate(columns):
+            mean = float(last.mean_[i]) if last.mean_ is not None else 0.0
+            scale = float(last.scale_[i]) if last.scale_ is not None else 1.0
+            ops[column].append(["number", offset + i, fills.get(i), mean, scale])
+        return offset + len(columns)
+
+    if isinstance(last, OneHotEncoder):
+        if any(c is not None for c in getattr(last, "infrequent_categories_", None) or []):
+            raise UnsupportedPipeline("OneHotEncoder com categorias infrequentes")
+        if last.handle_unknown not in ("ignore", "infrequent_if_exist", "error"):
+            raise UnsupportedPipeline(f"OneHotEncoder handle_unknown={last.handle_unknown}")
+        drop_idx = last.drop_idx_ if last.drop_idx_ is not None else [None] * len(columns)
+        for i, column in enumerate(columns):
+            positions: List[List[Any]] = []
+            for j, category in enumerate(last.categories_[i]):
+                if drop_idx[i] is not None and j == drop_idx[i]:
+                    continue
+                positions.append([_key(category), offset + len(positions)])
+            known = [_key(category) for category in last.categories_[i]]
+            ops[column].append([
+                "onehot", column, positions, fills.get(i),
+                known if last.handle_unknown == "error" else None
+            ])
+            offset += len(positions)
+        return offset
+
+    if isinstance(last, OrdinalEncoder):
+        unknown = _key(last.unknown_value) if last.handle_unknown == "use_encoded_value" else None
+        for i, column in enumerate(columns):
+            codes = [[_key(category), float(j)] for j, category in enumerate(last.categories_[i])]
+            ops[column].append(["ordinal", column, offset + i, codes, fills.get(i), unknown])
+        return offset + len(columns)
+
+    raise UnsupportedPipeline(f"transformador {type(last).__name__}")
+
+
+def _key(value: Any) -> Any:
+    """Chave de consulta: categorias numpy viram tipos Python (np.str_ -> str etc.)."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _build_op(spec: _OpSpec) -> _Op:
+    kind, *args = spec
+    if kind == "number":
+        return _op_number(*args)
+    if kind == "onehot":
+        column, positions, fill, known = args
+        return _op_onehot(column, {category: index for category, index in positions}, fill,
+                          None if known is None else set(known))
+    if kind == "ordinal":
+        column, index, codes, fill, unknown = args
+        return _op_ordinal(column, index, {category: code for category, code in codes}, fill, unknown)
+    raise UnsupportedPipeline(f"operação {kind}")
+
+
+def _op_number(index: int, fill, mean: float, scale: float) -> _Op:
+    def op(row: np.ndarray, value: Any) -> None:
+        if value is None:
+            value = fill
+        row[index] = (float(value) - mean) / scale
+    return op
+
+
+def _op_onehot(column: str, positions: Dict[Any, int], fill, known: Optional[set]) -> _Op:
+    # 'known' só é informado com handle_unknown="error" (a categoria removida
+    # por 'drop' é conhecida, mas não tem coluna)
+    def op(row: np.ndarray, value: Any) -> None:
+        if value is None:
+            value = fill
+        index = positions.get(value)
+        if index is not None:
+            row[index] = 1.0
+        elif known is not None and value not in known:
+            raise ValueError(f"Categoria desconhecida para '{column}': {value!r}")
+    return op
+
+
+def _op_ordinal(column: str, index: int, codes: Dict[Any, float], fill, unknown) -> _Op:
+    def op(row: np.ndarray, value: Any) -> None:
+        if value is None:
+            value = fill
+        code = codes.get(value)
+        if code is None:
+            if unknown is None:
+                raise ValueError(f"Categoria desconhecida para '{column}': {value!r}")
+            code = unknown
+        row[index] = code
+    return op
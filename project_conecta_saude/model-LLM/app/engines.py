@@ -0,0 +1,427 @@
+"""
+Motores de detecção de outliers.
+
+Todo motor é o último passo do pipeline (recebe a matriz já codificada
+pelo pré-processamento de app/pipeline.py) e segue a mesma interface:
+
+    fit(X, y=None)           y = confirmações dos profissionais (1 = outlier), se houver
+    predict(X)               1 = outlier
+    predict_proba(X)         colunas [normal, outlier], probabilidade calibrada
+    predict_with_proba(X)    os dois acima com um único cálculo do score (serviço)
+
+Os motores não supervisionados (Isolation Forest, LOF, HBOS) produzem um
+score de anomalia centrado no próprio limiar: predict é score > 0, ou
+seja, a fração de outliers é a do 'contamination'. A calibração só dá a
+confiança (a probabilidade) a partir desse score, sem mudar a decisão:
+
+- com labels das duas classes: escala de Platt (regressão logística do
+  score contra as confirmações), ou seja, a probabilidade reflete a taxa
+  real de outliers confirmados para aquele score;
+- sem labels: logística na escala do desvio-padrão dos scores de treino
+  (0.5 no limiar).
+
+O gradient boosting é supervisionado (treinado nas confirmações) e já
+produz probabilidades pela perda logística.
+
+Cada motor declara o espaço de busca dos seus hiperparâmetros
+(SEARCH_SPACE, usado por app/tuning.py), uma estimativa de memória e a
+exportação do modelo ajustado em arrays NumPy (to_arrays), avaliados sem
+o scikit-learn por app/compiled.py.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+# Bytes aproximados por nó de árvore do scikit-learn (estrutura + valores)
+_BYTES_PER_NODE = 100
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -500, 500)))
+
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """Profundidade média de uma busca sem sucesso numa árvore de n amostras (Isolation Forest)."""
+    n = np.asarray(n_samples, dtype=np.float64)
+    length = np.zeros_like(n)
+    length[n == 2] = 1.0
+    large = n > 2
+    length[large] = 2.0 * (np.log(n[large] - 1.0) + np.euler_gamma) - 2.0 * (n[large] - 1.0) / n[large]
+    return length
+
+
+def _flatten_trees(trees) -> Dict[str, np.ndarray]:
+    """
+    Concatena árvores binárias (left, right, feature, threshold, value,
+    missing_left; left = -1 nas folhas) num único conjunto de arrays. As
+    folhas apontam para si mesmas, então 'depth' passos de descida levam
+    qualquer linha até a sua folha em todas as árvores de uma vez.
+    """
+    left, right, feature, threshold, value, missing_left, roots = [], [], [], [], [], [], []
+    offset, depth = 0, 0
+    for tree_left, tree_right, tree_feature, tree_threshold, tree_value, tree_missing in trees:
+        n_nodes = len(tree_left)
+        index = np.arange(n_nodes)
+        leaf = tree_left < 0
+        # Filhos têm índice maior que o pai nas árvores do scikit-learn
+        node_depth = np.zeros(n_nodes, dtype=np.int64)
+        for node in np.flatnonzero(~leaf):
+            node_depth[tree_left[node]] = node_depth[tree_right[node]] = node_depth[node] + 1
+        depth = max(depth, int(node_depth.max()))
+        left.append(np.where(leaf, index, tree_left) + offset)
+        right.append(np.where(leaf, index, tree_right) + offset)
+        feature.append(np.where(leaf, 0, tree_feature))
+        threshold.append(np.where(leaf, 0.0, tree_threshold))
+        value.append(tree_value)
+        missing_left.append(tree_missing)
+        roots.append(offset)
+        offset += n_nodes
+    return {
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "value": np.concatenate(value).astype(np.float64),
+        "missing_left": np.concatenate(missing_left).astype(bool),
+        "roots": np.array(roots, dtype=np.int32),
+        "depth": np.array(depth),
+    }
+
+
+class OutlierEngine(ClassifierMixin, BaseEstimator):
+    """Base dos motores não supervisionados: score de anomalia + calibração."""
+
+    # Hiperparâmetros avaliados pela busca (contamination é acrescentado por ela)
+    SEARCH_SPACE: Dict[str, list] = {}
+    supervised = False
+
+    def fit(self, X, y=None) -> "OutlierEngine":
+        X = np.asarray(X, dtype=np.float64)
+        self._fit_detector(X)
+        self.classes_ = np.array([0, 1])
+        self._fit_calibration(self._anomaly_score(X), y)
+        return self
+
+    def _fit_detector(self, X: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def _anomaly_score(self, X: np.ndarray) -> np.ndarray:
+        """Score de anomalia: > 0 acima do limiar do detector (outlier)."""
+        raise NotImplementedError
+
+    def _fit_calibration(self, scores: np.ndarray, y) -> None:
+        if y is not None and len(np.unique(y)) == 2:
+            from sklearn.linear_model import LogisticRegression
+
+            platt = LogisticRegression().fit(scores.reshape(-1, 1), np.asarray(y, dtype=int))
+            self.calibration_ = (float(platt.coef_[0, 0]), float(platt.intercept_[0]))
+        else:
+            self.calibration_ = (1.0 / max(float(np.std(scores)), 1e-6), 0.0)
+
+    def _proba(self, scores: np.ndarray) -> np.ndarray:
+        slope, intercept = self.calibration_
+        outlier = _sigmoid(slope * scores + intercept)
+        return np.column_stack([1.0 - outlier, outlier])
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self._proba(self._anomaly_score(np.asarray(X, dtype=np.float64)))
+
+    def predict(self, X) -> np.ndarray:
+        # Limiar do detector (contamination); a calibração não altera a decisão
+        return (self._anomaly_score(np.asarray(X, dtype=np.float64)) > 0).astype(int)
+
+    def predict_with_proba(self, X) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self._anomaly_score(np.asarray(X, dtype=np.float64))
+        return (scores > 0).astype(int), self._proba(scores)
+
+    @classmethod
+    def estimate_bytes(cls, n_rows: int, n_cols: int, params: Dict[str, Any]) -> int:
+        """Memória aproximada do motor ajustado (usada no planejamento da busca)."""
+        return 0
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Modelo ajustado em arrays NumPy para o artefato compilado (app/compiled.py)."""
+        raise NotImplementedError(f"{type(self).__name__} não tem exportação compilada")
+
+
+def _contamination_threshold(raw: np.ndarray, contamination) -> float:
+    """Limiar do score bruto que deixa a fração 'contamination' acima dele."""
+    if contamination == "auto":
+        contamination = 0.1
+    return float(np.quantile(raw, 1.0 - float(contamination)))
+
+
+class IsolationForestClassifier(OutlierEngine):
+    """
+    Isolation Forest. n_jobs só vale para o treino: o modelo salvo prevê
+    numa thread só (no serviço as predições são pequenas e paralelizar
+    custa mais).
+    """
+    SEARCH_SPACE = {
+        "n_estimators": [100, 200, 400],
+        "max_samples": ["auto", 512, 0.5],
+    }
+
+    def __init__(self, contamination="auto", n_estimators: int = 100, max_samples="auto",
+                 random_state=42, n_jobs=None):
+        self.contamination = contamination
+        self.n_estimators = n_estimators
+        self.max_samples = max_samples
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+
+    def __setstate__(self, state):
+        # Artefatos anteriores guardavam só a escala da logística
+        if "calibration_" not in state and "scale_" in state:
+            state["calibration_"] = (1.0 / state["scale_"], 0.0)
+        super().__setstate__(state)
+
+    def _fit_detector(self, X: np.ndarray) -> None:
+        from sklearn.ensemble import IsolationForest
+
+        self.forest_ = IsolationForest(
+            contamination=self.contamination,
+            n_estimators=self.n_estimators,
+            max_samples=self.max_samples,
+            random_state=self.random_state,
+            n_jobs=self.n_jobs
+        ).fit(X)
+        self.forest_.set_params(n_jobs=None)
+
+    def _anomaly_score(self, X: np.ndarray) -> np.ndarray:
+        # decision_function < 0 => outlier
+        return -self.forest_.decision_function(X)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        forest = self.forest_
+        # Com todas as colunas, as árvores indexam X direto (sem o subconjunto sorteado)
+        subsample = getattr(forest, "_max_features", forest.n_features_in_) != forest.n_features_in_
+        trees = []
+        for estimator, features in zip(forest.estimators_, forest.estimators_features_):
+            tree = estimator.tree_
+            # Valor da folha: profundidade + correção pelas amostras que sobraram nela
+            node_depth = np.zeros(tree.node_count)
+            for node in np.flatnonzero(tree.children_left >= 0):
+                node_depth[tree.children_left[node]] = node_depth[tree.children_right[node]] = node_depth[node] + 1
+            feature = np.asarray(features)[np.maximum(tree.feature, 0)] if subsample else tree.feature
+            trees.append((tree.children_left, tree.children_right, feature, tree.threshold,
+                          node_depth + _average_path_length(tree.n_node_samples),
+                          np.zeros(tree.node_count, dtype=bool)))
+        arrays = _flatten_trees(trees)
+        arrays.update(
+            # As árvores do scikit-learn comparam a entrada em float32
+            float32_input=np.array(True),
+            path_normalizer=np.array(len(forest.estimators_) * _average_path_length([forest.max_samples_])[0]),
+            offset=np.array(forest.offset_),
+        )
+        return arrays
+
+    @classmethod
+    def estimate_bytes(cls, n_rows: int, n_cols: int, params: Dict[str, Any]) -> int:
+        max_samples = params.get("max_samples", "auto")
+        if max_samples == "auto":
+            samples = min(256, n_rows)
+        elif isinstance(max_samples, float):
+            samples = max(1, int(max_samples * n_rows))
+        else:
+            samples = min(int(max_samples), n_rows)
+        # Uma árvore sobre m amostras tem no máximo 2m - 1 nós
+        return params.get("n_estimators", 100) * 2 * samples * _BYTES_PER_NODE
+
+
+class LOFEngine(OutlierEngine):
+    """Local Outlier Factor em modo novelty (prevê pacientes novos)."""
+    SEARCH_SPACE = {"n_neighbors": [10, 20, 35]}
+
+    def __init__(self, contamination="auto", n_neighbors: int = 20, n_jobs=None):
+        self.contamination = contamination
+        self.n_neighbors = n_neighbors
+        self.n_jobs = n_jobs
+
+    def _fit_detector(self, X: np.ndarray) -> None:
+        from sklearn.neighbors import LocalOutlierFactor
+
+        self.lof_ = LocalOutlierFactor(
+            n_neighbors=min(self.n_neighbors, max(1, len(X) - 1)),
+            contamination=self.contamination,
+            novelty=True,
+            n_jobs=self.n_jobs
+        ).fit(X)
+        self.lof_.set_params(n_jobs=None)
+
+    def _anomaly_score(self, X: np.ndarray) -> np.ndarray:
+        return -self.lof_.decision_function(X)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        lof = self.lof_
+        if lof.effective_metric_ != "euclidean":
+            raise NotImplementedError(f"LOF com métrica {lof.effective_metric_}")
+        # Dados de treino, distância ao k-ésimo vizinho e densidade local de cada linha
+        return {
+            "fit_X": np.asarray(lof._fit_X, dtype=np.float64),
+            "k_distance": lof._distances_fit_X_[:, lof.n_neighbors_ - 1].astype(np.float64),
+            "lrd": np.asarray(lof._lrd, dtype=np.float64),
+            "n_neighbors": np.array(lof.n_neighbors_),
+            "offset": np.array(lof.offset_),
+        }
+
+    @classmethod
+    def estimate_bytes(cls, n_rows: int, n_cols: int, params: Dict[str, Any]) -> int:
+        # Guarda os dados de treino (+ árvore de vizinhos) e as distâncias dos k vizinhos
+        return 2 * n_rows * n_cols * 8 + n_rows * params.get("n_neighbors", 20) * 16
+
+
+class HBOSEngine(OutlierEngine):
+    """
+    Histogram-based Outlier Score: um histograma por coluna; o score de
+    um paciente é a soma de -log(densidade) da faixa de cada coluna
+    (colunas tratadas como independentes). Treino e predição são
+    lineares no número de linhas e o modelo ocupa alguns KB.
+    """
+    SEARCH_SPACE = {"n_bins": [10, 20, 40]}
+
+    def __init__(self, contamination="auto", n_bins: int = 20, alpha: float = 0.1):
+        self.contamination = contamination
+        self.n_bins = n_bins
+        self.alpha = alpha  # suavização das faixas vazias
+
+    def _fit_detector(self, X: np.ndarray) -> None:
+        self.edges_ = []
+        self.log_density_ = []
+        for column in X.T:
+            values = np.unique(column)
+            if len(values) <= 2:
+                # Colunas binárias (one-hot/booleanas): uma faixa por valor
+                edges = np.array([values[0] - 0.5, values[-1] + 0.5]) if len(values) == 1 else \
+                    np.array([values[0] - 0.5, (values[0] + values[1]) / 2, values[1] + 0.5])
+            else:
+                edges = np.histogram_bin_edges(column, bins=self.n_bins)
+            counts, _ = np.histogram(column, bins=edges)
+            density = (counts + self.alpha) / (len(column) + self.alpha * len(counts))
+            self.edges_.append(edges[1:-1])  # bordas internas (searchsorted)
+            self.log_density_.append(-np.log(density))
+        self.threshold_ = 0.0
+        self.threshold_ = _contamination_threshold(self._anomaly_score(X), self.contamination)
+
+    def _anomaly_score(self, X: np.ndarray) -> np.ndarray:
+        score = np.zeros(len(X))
+        for j, (edges, log_density) in enumerate(zip(self.edges_, self.log_density_)):
+            # Valores fora do intervalo de treino caem na primeira/última faixa
+            score += log_density[np.searchsorted(edges, X[:, j], side="right")]
+        return score - self.threshold_
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "edges": np.concatenate(self.edges_),
+            "edge_offsets": np.cumsum([0] + [len(edges) for edges in self.edges_]),
+            "log_density": np.concatenate(self.log_density_),
+            "density_offsets": np.cumsum([0] + [len(density) for density in self.log_density_]),
+            "threshold": np.array(self.threshold_),
+        }
+
+    @classmethod
+    def estimate_bytes(cls, n_rows: int, n_cols: int, params: Dict[str, Any]) -> int:
+        return n_cols * params.get("n_bins", 20) * 16
+
+
+class GradientBoostingEngine(OutlierEngine):
+    """
+    Classificador supervisionado (HistGradientBoosting) treinado nas
+    confirmações dos profissionais. Exige labels das duas classes.
+    """
+    SEARCH_SPACE = {
+        "max_iter": [100, 200],
+        "learning_rate": [0.05, 0.1],
+        "max_leaf_nodes": [15, 31],
+    }
+    supervised = True
+
+    def __init__(self, max_iter: int = 200, learning_rate: float = 0.1, max_leaf_nodes: int = 31,
+                 random_state=42):
+        self.max_iter = max_iter
+        self.learning_rate = learning_rate
+        self.max_leaf_nodes = max_leaf_nodes
+        self.random_state = random_state
+
+    def fit(self, X, y=None) -> "GradientBoostingEngine":
+        from sklearn.ensemble import HistGradientBoostingClassifier
+
+        if y is None or len(np.unique(y)) < 2:
+            raise ValueError("O gradient boosting precisa de confirmações das duas classes")
+        self.booster_ = HistGradientBoostingClassifier(
+            max_iter=self.max_iter,
+            learning_rate=self.learning_rate,
+            max_leaf_nodes=self.max_leaf_nodes,
+            random_state=self.random_state
+        ).fit(np.asarray(X, dtype=np.float64), np.asarray(y, dtype=int))
+        self.classes_ = np.array([0, 1])
+        return self
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.booster_.predict_proba(np.asarray(X, dtype=np.float64))
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_with_proba(X)[0]
+
+    def predict_with_proba(self, X) -> Tuple[np.ndarray, np.ndarray]:
+        proba = self.predict_proba(X)
+        return (proba[:, 1] > 0.5).astype(int), proba
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        booster = self.booster_
+        if booster.n_trees_per_iteration_ != 1:
+            raise NotImplementedError("gradient boosting com mais de duas classes")
+        trees = []
+        for (predictor,) in booster._predictors:
+            nodes = predictor.nodes
+            if nodes["is_categorical"].any():
+                raise NotImplementedError("gradient boosting com features categóricas nativas")
+            leaf = nodes["is_leaf"].astype(bool)
+            # left/right são uint32: converte antes de marcar as folhas com -1
+            trees.append((np.where(leaf, -1, nodes["left"].astype(np.int64)),
+                          np.where(leaf, -1, nodes["right"].astype(np.int64)),
+                          nodes["feature_idx"], nodes["num_threshold"], nodes["value"],
+                          nodes["missing_go_to_left"].astype(bool)))
+        arrays = _flatten_trees(trees)
+        # Logito = base + soma das folhas (o learning_rate já está nos valores)
+        arrays["baseline"] = np.array(float(np.ravel(booster._baseline_prediction)[0]))
+        return arrays
+
+    @classmethod
+    def estimate_bytes(cls, n_rows: int, n_cols: int, params: Dict[str, Any]) -> int:
+        # Dados discretizados (1 byte por valor) + árvores
+        return n_rows * n_cols + params.get("max_iter", 200) * 2 * params.get("max_leaf_nodes", 31) * _BYTES_PER_NODE
+
+
+ENGINES = {
+    "isolation_forest": IsolationForestClassifier,
+    "lof": LOFEngine,
+    "hbos": HBOSEngine,
+    "gradient_boosting": GradientBoostingEngine,
+}
+DEFAULT_ENGINE = "isolation_forest"
+
+
+def default_params(name: str, y) -> Dict[str, Any]:
+    """
+    Parâmetros iniciais do motor para os labels 'y': nos não
+    supervisionados, contamination = proporção de outliers confirmados.
+    """
+    if ENGINES[name].supervised:
+        return {}
+    return {"contamination": round(min(max(float(np.mean(y)), 0.001), 0.5), 4)}
+
+
+def make_engine(name: str, random_state: Optional[int] = 42, n_jobs=None, **params) -> OutlierEngine:
+    """Instancia o motor 'name' (ver ENGINES) com os parâmetros que ele aceita."""
+    try:
+        engine_class = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Motor desconhecido: {name} (opções: {', '.join(ENGINES)})")
+    accepted = engine_class().get_params()
+    if "random_state" in accepted:
+        params.setdefault("random_state", random_state)
+    if "n_jobs" in accepted:
+        params.setdefault("n_jobs", n_jobs)
+    return engine_class(**params)
@@ -1,29 +1,154 @@
-from fastapi import FastAPI
-from app.schemas import PatientData, ClassificationResponse
-from app.model import model_instance
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+from app.schemas import (
+    PatientData, ClassificationResponse, BatchClassificationRequest, BatchClassificationResponse
+)
+from app.model import model_manager
+from app.shadow import shadow_monitor
+
+# Token exigido no header X-Admin-Token pelos endpoints /admin (se definido)
+ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Recarrega o modelo automaticamente quando o arquivo for substituído
+    model_manager.start_watching()
+    yield
+    model_manager.stop_watching()
+
 
 app = FastAPI(
     title="Conecta+Saúde - Serviço de Classificação",
     description="API para detectar pacientes outliers com base em dados clínicos.",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
+def _check_admin_token(x_admin_token: Optional[str]) -> None:
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
+
+def _schedule_shadow(background_tasks: BackgroundTasks, model, patients, predictions, start: float):
+    """
+    Com uma versão candidata no registro, agenda a mesma classificação nela
+    para depois do envio da resposta (modo sombra).
+    """
+    candidate = model_manager.candidate
+    if candidate is None:
+        return
+    active_ms = (time.perf_counter() - start) * 1000
+    background_tasks.add_task(shadow_monitor.score, model, candidate, patients, predictions, active_ms)
+
 @app.post("/classify", response_model=ClassificationResponse)
-def classify_patient(patient_data: PatientData):
+def classify_patient(patient_data: PatientData, background_tasks: BackgroundTasks):
     """
     Recebe os dados de um paciente e retorna:
     - se ele é classificado como um outlier
     - o grau de confiança da predição
     - se precisa de confirmação do profissional
+    - a versão do modelo usada
     """
-    is_outlier, confidence, needs_confirmation = model_instance.predict(patient_data)
+    # Uma única leitura: a requisição inteira usa a mesma versão do modelo
+    model = model_manager.current
+    start = time.perf_counter()
+    is_outlier, confidence, needs_confirmation = model.predict(patient_data)
+    _schedule_shadow(
+        background_tasks, model, [patient_data],
+        [(is_outlier, confidence, needs_confirmation)], start
+    )
     
     return {
         "is_outlier": is_outlier,
         "confidence": confidence,
-        "needs_confirmation": needs_confirmation
+        "needs_confirmation": needs_confirmation,
+        "model_version": model.version,
+        "trained_at": model.trained_at
+    }
+
+@app.post("/classify/batch", response_model=BatchClassificationResponse)
+def classify_batch(batch: BatchClassificationRequest, background_tasks: BackgroundTasks):
+    """
+    Classifica vários pacientes de uma vez (uma única predição vetorizada).
+    Os resultados vêm na mesma ordem dos pacientes enviados.
+    """
+    model = model_manager.current
+    start = time.perf_counter()
+    predictions = model.predict_batch(batch.patients)
+    _schedule_shadow(background_tasks, model, batch.patients, predictions, start)
+    
+    return {
+        "results": [
+            {
+                "is_outlier": is_outlier,
+                "confidence": confidence,
+                "needs_confirmation": needs_confirmation,
+                "model_version": model.version,
+                "trained_at": model.trained_at
+            }
+            for is_outlier, confidence, needs_confirmation in predictions
+        ],
+        "model_version": model.version,
+        "trained_at": model.trained_at
     }
 
+@app.post("/admin/reload")
+async def reload_model(response: Response, x_admin_token: Optional[str] = Header(None)):
+    """
+    Recarrega o modelo do disco (ex: logo após o retreinamento).
+    A nova versão é carregada e aquecida em background e substitui a atual
+    sem interromper requisições em andamento. A versão candidata do
+    registro (modo sombra) também é relida.
+
+    No servidor pre-fork (serve.py) a recarga é pedida ao processo mestre,
+    que substitui os workers; a resposta (202) traz a versão ainda ativa.
+    """
+    _check_admin_token(x_admin_token)
+    if model_manager.reload_delegate is not None:
+        model_manager.reload_delegate()
+        response.status_code = status.HTTP_202_ACCEPTED
+        model = model_manager.current
+        return {
+            "reload_requested": True,
+            "model_version": model.version,
+            "trained_at": model.trained_at,
+            "candidate_version": model_manager.candidate.version if model_manager.candidate else None
+        }
+    try:
+        model = await run_in_threadpool(model_manager.reload)
+        candidate = await run_in_threadpool(model_manager.reload_candidate)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Falha ao recarregar o modelo (versão anterior mantida): {e}"
+        )
+    return {
+        "model_version": model.version,
+        "trained_at": model.trained_at,
+        "candidate_version": candidate.version if candidate else None
+    }
+
+@app.get("/admin/shadow")
+def shadow_stats(x_admin_token: Optional[str] = Header(None)):
+    """
+    Comparação da versão ativa com a candidata (modo sombra): pacientes
+    avaliados, divergências de classificação e latências (p50/p99, ms).
+    """
+    _check_admin_token(x_admin_token)
+    return shadow_monitor.stats()
+
 @app.get("/")
 def health_check():
-    return {"status": "ok", "version": "2.0.0"}
+    model = model_manager.current
+    candidate = model_manager.candidate
+    return {
+        "status": "ok",
+        "version": "2.0.0",
+        "model_version": model.version,
+        "trained_at": model.trained_at,
+        "candidate_version": candidate.version if candidate else None
+    }
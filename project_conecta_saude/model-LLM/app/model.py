@@ -1,30 +1,101 @@
-import pandas as pd
+import hashlib
+import io
+import os
+import threading
 import numpy as np
-from joblib import load
+from datetime import datetime
 from pathlib import Path
 from app.schemas import PatientData 
-from typing import Tuple
+from app.compiled import CompiledModel
+from app.encoder import FeatureEncoder
+from app.pipeline import SELF_TEST_PATIENTS, apply_defaults
+from app.registry import ModelRegistry
+from typing import Callable, List, Optional, Tuple
 
 # --- Caminho do Modelo ---
 CURRENT_FILE_PATH = Path(__file__).resolve()
 APP_DIR = CURRENT_FILE_PATH.parent
 PROJECT_ROOT = APP_DIR.parent
 MODEL_PATH = PROJECT_ROOT / "models" / "modelo_outliers_v1.pkl"
+COMPILED_MODEL_PATH = MODEL_PATH.with_suffix(".npz")
+
+# Modo de serviço: "pipeline" (artefato joblib com o Pipeline do scikit-learn)
+# ou "compiled" (artefato NumPy exportado pelo retrain_model.py, ver
+# app/compiled.py; não importa scikit-learn nem pandas)
+MODEL_SERVING = os.getenv("MODEL_SERVING", "pipeline")
 
 # Limiar de confiança para solicitar confirmação
 CONFIDENCE_THRESHOLD = 0.7
 
+# Intervalo (segundos) para verificar se o arquivo do modelo mudou; 0 desativa
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "30"))
+
+def _to_record(patient_data: PatientData) -> dict:
+    """Converte o paciente em uma linha de entrada do modelo (com os valores padrão)."""
+    return apply_defaults(patient_data.model_dump())
+
 class Model:
+    """
+    Uma versão carregada do modelo (imutável depois de criada).
+    A troca de versão é feita pelo ModelManager, que substitui a instância.
+    """
     def __init__(self, model_path: Path):
         print(f"Tentando carregar modelo de: {model_path}")
         print(f"O arquivo existe? {model_path.exists()}")
+        self.version: Optional[str] = None
+        self.trained_at: Optional[str] = None
         if model_path.exists():
             print("Carregando modelo...")
-            self.model = load(model_path)
-            print("Modelo carregado com sucesso!")
+            raw = model_path.read_bytes()
+            if model_path.suffix == ".npz":
+                artifact = CompiledModel.load(io.BytesIO(raw))
+            else:
+                # Import tardio: o joblib só é necessário para o artefato do pipeline
+                from joblib import load
+                artifact = load(io.BytesIO(raw))
+            if isinstance(artifact, CompiledModel):
+                self.model = artifact
+                self.version = artifact.version
+                self.trained_at = artifact.trained_at
+            elif isinstance(artifact, dict):
+                # Artefato do retrain_model.py: pipeline (pré-processamento + modelo) + metadados
+                self.model = artifact.get("model")
+                self.version = artifact.get("version") and str(artifact["version"])
+                self.trained_at = artifact.get("trained_at")
+            else:
+                self.model = artifact
+            # Sem metadados: identifica a versão pelo conteúdo do arquivo
+            self.version = self.version or hashlib.sha256(raw).hexdigest()[:12]
+            self.trained_at = self.trained_at or datetime.fromtimestamp(
+                model_path.stat().st_mtime
+            ).isoformat()
+            print(f"Modelo carregado com sucesso! Versão: {self.version}")
         else:
             print(f"AVISO: Modelo não encontrado em {model_path}.")
             self.model = None
+        # Codificador sem pandas compilado a partir do pipeline (None = usa DataFrame);
+        # o artefato compilado já traz o seu
+        if isinstance(self.model, CompiledModel):
+            self.encoder = self.model.encoder
+        else:
+            self.encoder = FeatureEncoder.from_pipeline(self.model) if self.model is not None else None
+
+    def warm_up(self) -> None:
+        """
+        Autoteste antes de a versão receber tráfego: classifica o lote fixo
+        de app/pipeline.py pelo mesmo caminho das requisições (também
+        inicializa BLAS/árvores). Um artefato que não aplica o próprio
+        pré-processamento (ex: modelo salvo sem o pipeline) falha aqui.
+        """
+        if self.model is None:
+            return
+        patients = [PatientData(**patient) for patient in SELF_TEST_PATIENTS]
+        predictions = self.predict_batch(patients)
+        if len(predictions) != len(patients) or any(
+            not 0.0 <= confidence <= 1.0 for _, confidence, _ in predictions
+        ):
+            raise RuntimeError(f"Autoteste do modelo {self.version} retornou predições inválidas")
+        print(f"Autoteste do modelo {self.version}: {len(predictions)} pacientes classificados")
 
     def predict(self, patient_data: PatientData) -> Tuple[bool, float, bool]:
         """
@@ -33,69 +104,226 @@ class Model:
         - confidence: float (grau de confiança 0.0 a 1.0)
         - needs_confirmation: bool (True se confiança < threshold)
         """
+        is_outlier, confidence, needs_confirmation = self.predict_batch([patient_data])[0]
+        
+        print(f"Predição: {'Outlier' if is_outlier else 'Normal'}, "
+              f"Confiança: {confidence:.2%}, "
+              f"Precisa confirmação: {needs_confirmation}")
+        
+        return is_outlier, confidence, needs_confirmation
+
+    def predict_batch(self, patients: List[PatientData]) -> List[Tuple[bool, float, bool]]:
+        """
+        Classifica vários pacientes com uma única chamada ao modelo
+        (uma matriz com todas as linhas e um predict_proba vetorizado).
+        Retorna uma tupla (is_outlier, confidence, needs_confirmation) por
+        paciente, na mesma ordem da entrada.
+        """
         if self.model is None:
             error_msg = "ERRO CRÍTICO: Modelo não carregado. Não é possível fazer predições."
             print(error_msg)
             raise RuntimeError(error_msg)
         
+        if not patients:
+            return []
+        
         try:
-            # Converte dados do paciente para DataFrame
-            patient_data_dict = patient_data.model_dump()
-            
-            # Preenche valores padrão para campos Optional que estão None
-            default_values = {
-                "raca_cor": "Não informado",
-                "situacao_conjugal": "Não informado",
-                "situacao_ocupacional": "Não informado",
-                "zona_moradia": "Urbana",
-                "seguranca_alimentar": "Segurança alimentar",
-                "plano_saude": "Não possui",
-                "arranjo_domiciliar": "Mora com família"
-            }
-            
-            for field, default_value in default_values.items():
-                if patient_data_dict.get(field) is None:
-                    patient_data_dict[field] = default_value
-            
-            input_df = pd.DataFrame([patient_data_dict])
+            estimator, input_data = self._prepare_input(patients)
             
-            # Verifica se o modelo tem método predict_proba
-            if hasattr(self.model, 'predict_proba'):
-                # Obtém probabilidades
-                probabilities = self.model.predict_proba(input_df)[0]
-                
-                # Para classificação binária: [prob_normal, prob_outlier]
-                prob_normal = probabilities[0]
-                prob_outlier = probabilities[1]
-                
+            # A decisão vem do predict do motor (limiar do detector); a
+            # probabilidade calibrada só dá a confiança
+            if hasattr(estimator, 'predict_with_proba'):
+                # Motores de app/engines.py: um único cálculo do score
+                labels, probabilities = estimator.predict_with_proba(input_data)
+                is_outlier = np.asarray(labels) == 1
+            elif hasattr(estimator, 'predict_proba'):
+                # Pipeline sem codificador ou estimador de artefatos antigos
+                probabilities = estimator.predict_proba(input_data)
+                is_outlier = np.asarray(estimator.predict(input_data)) == 1
+            else:
+                probabilities = None
+
+            if probabilities is not None:
+                # Para classificação binária: colunas [prob_normal, prob_outlier]
                 # A confiança é a probabilidade da classe predita
-                if prob_outlier > prob_normal:
-                    is_outlier = True
-                    confidence = prob_outlier
-                else:
-                    is_outlier = False
-                    confidence = prob_normal
+                confidence = np.where(is_outlier, probabilities[:, 1], probabilities[:, 0])
             else:
                 # Se não tem predict_proba, usa apenas predict
-                prediction = self.model.predict(input_df)
-                is_outlier = bool(prediction[0] == 1)
+                is_outlier = np.asarray(estimator.predict(input_data)) == 1
                 
                 # Sem probabilidades, assumimos confiança moderada
-                confidence = 0.75
+                confidence = np.full(len(patients), 0.75)
             
             # Verifica se precisa de confirmação
             needs_confirmation = confidence < CONFIDENCE_THRESHOLD
             
-            print(f"Predição: {'Outlier' if is_outlier else 'Normal'}, "
-                  f"Confiança: {confidence:.2%}, "
-                  f"Precisa confirmação: {needs_confirmation}")
-            
-            return is_outlier, float(confidence), needs_confirmation
+            return [
+                (bool(outlier), float(conf), bool(confirm))
+                for outlier, conf, confirm in zip(is_outlier, confidence, needs_confirmation)
+            ]
             
         except Exception as e:
             error_msg = f"ERRO CRÍTICO na predição: {e}"
             print(error_msg)
             raise RuntimeError(error_msg)
 
-# Cria uma instância única do modelo
-model_instance = Model(MODEL_PATH)
+    def _prepare_input(self, patients: List[PatientData]):
+        """
+        Retorna (estimador, entrada). Com o codificador compilado, as features
+        vão direto para uma matriz NumPy e seguem para o restante do pipeline;
+        sem ele, monta o DataFrame para o pipeline completo.
+        """
+        if self.encoder is not None:
+            if len(patients) == 1:
+                return self.encoder.estimator, self.encoder.encode(patients[0])
+            return self.encoder.estimator, self.encoder.encode_batch(patients)
+        
+        # Import tardio: o pandas só é carregado quando o caminho rápido não se aplica
+        import pandas as pd
+        return self.model, pd.DataFrame([_to_record(patient) for patient in patients])
+
+class ModelManager:
+    """
+    Mantém a versão ativa do modelo e faz a recarga a quente.
+
+    A nova versão é carregada e aquecida fora do caminho das requisições e
+    só então substitui 'current' (uma atribuição, atômica). Cada requisição
+    lê 'current' uma vez e usa essa instância até o fim, então nenhuma
+    requisição em andamento é interrompida pela troca. Se a carga falhar, a
+    versão anterior continua ativa.
+
+    A versão candidata do registro (modo sombra) fica em 'candidate' e é
+    trocada da mesma forma quando o manifesto muda.
+    """
+    def __init__(self, model_path: Path, watch_interval: float = MODEL_WATCH_INTERVAL,
+                 registry: Optional[ModelRegistry] = None):
+        self.model_path = model_path
+        self.watch_interval = watch_interval
+        self.registry = registry or ModelRegistry(active_path=model_path.with_suffix(".pkl"))
+        self.compiled = model_path.suffix == ".npz"
+        self._lock = threading.Lock()
+        self._signature = self._artifact_signature()
+        self.current = Model(model_path)
+        # Autoteste na subida: o serviço não começa com um artefato quebrado
+        self.current.warm_up()
+        self.candidate: Optional[Model] = None
+        self._candidate_signature = None
+        try:
+            self.reload_candidate()
+        except Exception as e:
+            print(f"ERRO ao carregar a versão candidata (modo sombra desativado): {e}")
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Servidor pre-fork (serve.py): a recarga é feita pelo processo mestre,
+        # e o worker só a solicita por esta função
+        self.reload_delegate: Optional[Callable[[], None]] = None
+
+    @staticmethod
+    def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _artifact_signature(self) -> Optional[Tuple[int, int]]:
+        return self._file_signature(self.model_path)
+
+    def _manifest_signature(self) -> Optional[Tuple[int, int]]:
+        return self._file_signature(self.registry.manifest_path)
+
+    def reload_candidate(self) -> Optional[Model]:
+        """
+        Carrega a candidata apontada pelo manifesto do registro (ou desativa
+        o modo sombra se não houver). Propaga erros de carga.
+        """
+        with self._lock:
+            self._candidate_signature = self._manifest_signature()
+            version = self.registry.load_manifest().get("candidate")
+            if version is None:
+                if self.candidate is not None:
+                    print("Modo sombra desativado (sem versão candidata).")
+                self.candidate = None
+                return None
+            if self.candidate is not None and self.candidate.version == version:
+                return self.candidate
+            path = self.registry.compiled_path_for(version) if self.compiled else self.registry.path_for(version)
+            candidate = Model(path)
+            if candidate.model is None:
+                raise RuntimeError(f"Versão candidata não encontrada em {path}")
+            candidate.warm_up()
+            self.candidate = candidate
+            print(f"Modo sombra: candidata {candidate.version}")
+            return candidate
+
+    def reload(self) -> Model:
+        """Carrega, aquece e ativa a versão atual do arquivo. Propaga erros de carga."""
+        with self._lock:
+            signature = self._artifact_signature()
+            candidate = Model(self.model_path)
+            if candidate.model is None:
+                raise RuntimeError(f"Modelo não encontrado em {self.model_path}")
+            candidate.warm_up()
+            previous = self.current
+            self.current = candidate
+            self._signature = signature
+            print(f"Modelo ativo: {previous.version} -> {candidate.version}")
+            return candidate
+
+    def start_watching(self) -> None:
+        """Inicia a thread que recarrega o modelo quando o arquivo muda."""
+        if self.watch_interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def check_for_updates(self) -> bool:
+        """
+        Uma verificação do watcher: recarrega a candidata se o manifesto
+        mudou e a versão ativa se o arquivo mudou. Retorna True se a versão
+        ativa ou a candidata foi trocada.
+        """
+        changed = False
+        # O manifesto é gravado com troca atômica: pode recarregar direto
+        manifest_signature = self._manifest_signature()
+        if manifest_signature != self._candidate_signature:
+            previous = self.candidate
+            try:
+                self.reload_candidate()
+            except Exception as e:
+                print(f"ERRO ao carregar a versão candidata: {e}")
+            changed = self.candidate is not previous
+
+        signature = self._artifact_signature()
+        if signature is None or signature == self._signature:
+            self._pending = None
+            return changed
+        if signature != self._pending:
+            # Arquivo mudou: espera a próxima verificação para não ler
+            # um arquivo ainda sendo escrito
+            self._pending = signature
+            return changed
+        self._pending = None
+        try:
+            self.reload()
+            return True
+        except Exception as e:
+            # Mantém a versão atual; tenta de novo se o arquivo mudar outra vez
+            self._signature = signature
+            print(f"ERRO ao recarregar o modelo (versão atual mantida): {e}")
+            return changed
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.watch_interval):
+            self.check_for_updates()
+
+# Gerenciador único do modelo (carrega a versão inicial no import)
+model_manager = ModelManager(COMPILED_MODEL_PATH if MODEL_SERVING == "compiled" else MODEL_PATH)
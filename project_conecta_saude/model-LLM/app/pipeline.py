@@ -0,0 +1,154 @@
+"""
+Pipeline único de pré-processamento + modelo, compartilhado entre o
+treinamento (retrain_model.py) e o serviço.
+
+O artefato salvo é um Pipeline do scikit-learn:
+
+    ColumnTransformer
+        cat  -> OneHotEncoder com vocabulário fixo (categorias desconhecidas
+                viram uma linha toda zerada, em vez de quebrar a predição)
+        bool -> passthrough (0/1)
+        num  -> StandardScaler
+    classificador (motor de app/engines.py: predict_proba com colunas
+                   [normal, outlier])
+
+Os vocabulários abaixo são os valores aceitos pelo formulário do
+frontend; como não dependem dos dados de cada retreinamento, todas as
+versões do modelo têm as mesmas colunas de entrada. No serviço o
+ColumnTransformer é compilado pelo app/encoder.py e cada lote é
+classificado com uma única chamada vetorizada.
+"""
+from typing import Any, Dict, List
+
+# Valores padrão para campos Optional que chegam como None
+DEFAULT_VALUES = {
+    "raca_cor": "Não informado",
+    "situacao_conjugal": "Não informado",
+    "situacao_ocupacional": "Não informado",
+    "zona_moradia": "Urbana",
+    "seguranca_alimentar": "Segurança alimentar",
+    "plano_saude": "Não possui",
+    "arranjo_domiciliar": "Mora com família"
+}
+
+# Vocabulário fixo de cada feature categórica (ordem = ordem das colunas)
+CATEGORY_VOCABULARIES: Dict[str, List[str]] = {
+    "sexo": ["Masculino", "Feminino", "Outro"],
+    "raca_cor": ["Branca", "Preta", "Parda", "Amarela", "Indígena", "Não informado"],
+    "situacao_conjugal": [
+        "Solteiro(a)", "Casado(a)", "União estável", "Divorciado(a)", "Viúvo(a)", "Não informado"
+    ],
+    "situacao_ocupacional": [
+        "Empregado", "Desempregado", "Autônomo", "Aposentado", "Estudante", "Do lar", "Não informado"
+    ],
+    "zona_moradia": ["Urbana", "Rural"],
+    "seguranca_alimentar": [
+        "Segurança alimentar", "Insegurança leve", "Insegurança moderada", "Insegurança grave"
+    ],
+    "escolaridade": [
+        "Ensino fundamental incompleto", "Ensino fundamental completo",
+        "Ensino médio incompleto", "Ensino médio completo",
+        "Superior incompleto", "Superior completo", "Pós-graduação"
+    ],
+    "renda_familiar_sm": ["Até 1", "1 a 2", "2 a 3", "3 a 4", "4 a 5", "Acima de 5"],
+    "plano_saude": ["Não possui", "Plano básico", "Plano intermediário", "Plano premium"],
+    "arranjo_domiciliar": [
+        "Mora sozinho", "Mora com família", "Mora com cônjuge", "Mora em instituição"
+    ],
+    "atividade_fisica": ["Sedentário", "Leve", "Moderado", "Ativa"],
+    "consumo_alcool": ["Não consome", "Raro", "Social", "Moderado", "Frequente"],
+    "qualidade_dieta": ["Ruim", "Regular", "Boa", "Excelente"],
+    "qualidade_sono": ["Ruim", "Regular", "Boa"],
+    "nivel_estresse": ["Baixo", "Moderado", "Alto"],
+    "suporte_social": ["Baixo", "Moderado", "Bom", "Forte"],
+    "acesso_servico_saude": ["Difícil", "UBS Próxima", "Particular"],
+    "aderencia_medicamento": ["Baixa", "Regular", "Boa", "Excelente"],
+}
+BOOLEAN_FEATURES = ["tabagismo_atual", "historico_familiar_dc"]
+NUMERIC_FEATURES = [
+    "idade", "consultas_ultimo_ano", "imc",
+    "pressao_sistolica_mmHg", "pressao_diastolica_mmHg", "glicemia_jejum_mg_dl",
+    "colesterol_total_mg_dl", "hdl_mg_dl", "triglicerides_mg_dl",
+]
+FEATURES = list(CATEGORY_VOCABULARIES) + BOOLEAN_FEATURES + NUMERIC_FEATURES
+
+# Lote fixo classificado no autoteste de cada versão carregada: um paciente
+# completo, um só com os campos obrigatórios e um com categorias fora do
+# vocabulário e medições extremas
+SELF_TEST_PATIENTS: List[Dict[str, Any]] = [
+    {
+        "idade": 58, "sexo": "Feminino", "raca_cor": "Parda", "situacao_conjugal": "Casado(a)",
+        "situacao_ocupacional": "Aposentado", "zona_moradia": "Urbana",
+        "seguranca_alimentar": "Insegurança leve", "escolaridade": "Ensino médio completo",
+        "renda_familiar_sm": "1 a 2", "plano_saude": "Não possui",
+        "arranjo_domiciliar": "Mora com cônjuge", "atividade_fisica": "Leve",
+        "consumo_alcool": "Social", "tabagismo_atual": False, "qualidade_dieta": "Regular",
+        "qualidade_sono": "Regular", "nivel_estresse": "Moderado", "suporte_social": "Bom",
+        "historico_familiar_dc": True, "acesso_servico_saude": "UBS Próxima",
+        "aderencia_medicamento": "Boa", "consultas_ultimo_ano": 4, "imc": 27.4,
+        "pressao_sistolica_mmHg": 138, "pressao_diastolica_mmHg": 88,
+        "glicemia_jejum_mg_dl": 104, "colesterol_total_mg_dl": 210, "hdl_mg_dl": 46,
+        "triglicerides_mg_dl": 160,
+    },
+    {
+        "idade": 34, "sexo": "Masculino", "escolaridade": "Superior completo",
+        "renda_familiar_sm": "Acima de 5", "atividade_fisica": "Ativa",
+        "consumo_alcool": "Não consome", "tabagismo_atual": False, "qualidade_dieta": "Boa",
+        "qualidade_sono": "Boa", "nivel_estresse": "Baixo", "suporte_social": "Forte",
+        "historico_familiar_dc": False, "acesso_servico_saude": "Particular",
+        "aderencia_medicamento": "Excelente", "consultas_ultimo_ano": 1, "imc": 22.1,
+        "pressao_sistolica_mmHg": 115, "pressao_diastolica_mmHg": 75,
+        "glicemia_jejum_mg_dl": 86, "colesterol_total_mg_dl": 170, "hdl_mg_dl": 60,
+        "triglicerides_mg_dl": 90,
+    },
+    {
+        "idade": 81, "sexo": "Não informado", "raca_cor": "Outra", "escolaridade": "Nenhuma",
+        "renda_familiar_sm": "Até 1", "atividade_fisica": "Sedentário",
+        "consumo_alcool": "Frequente", "tabagismo_atual": True, "qualidade_dieta": "Ruim",
+        "qualidade_sono": "Ruim", "nivel_estresse": "Alto", "suporte_social": "Baixo",
+        "historico_familiar_dc": True, "acesso_servico_saude": "Difícil",
+        "aderencia_medicamento": "Baixa", "consultas_ultimo_ano": 0, "imc": 41.5,
+        "pressao_sistolica_mmHg": 210, "pressao_diastolica_mmHg": 125,
+        "glicemia_jejum_mg_dl": 320, "colesterol_total_mg_dl": 340, "hdl_mg_dl": 22,
+        "triglicerides_mg_dl": 520,
+    },
+]
+
+
+def apply_defaults(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Preenche os campos Optional ausentes com os valores padrão."""
+    for field, default_value in DEFAULT_VALUES.items():
+        if record.get(field) is None:
+            record[field] = default_value
+    return record
+
+
+def build_preprocessing():
+    """ColumnTransformer (ainda não ajustado) com o pré-processamento padrão."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    return ColumnTransformer([
+        ("cat", OneHotEncoder(
+            categories=[CATEGORY_VOCABULARIES[column] for column in CATEGORY_VOCABULARIES],
+            handle_unknown="ignore", sparse_output=False
+        ), list(CATEGORY_VOCABULARIES)),
+        ("bool", "passthrough", BOOLEAN_FEATURES),
+        ("num", StandardScaler(), NUMERIC_FEATURES),
+    ])
+
+
+def build_pipeline(estimator):
+    """Monta o pipeline (ainda não ajustado) com o pré-processamento padrão."""
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline([("preprocessamento", build_preprocessing()), ("classificador", estimator)])
+
+
+def __getattr__(name: str):
+    # Artefatos salvos referenciam app.pipeline.IsolationForestClassifier; o
+    # import é tardio para o modo compilado do serviço não carregar o scikit-learn
+    if name == "IsolationForestClassifier":
+        from app.engines import IsolationForestClassifier
+        return IsolationForestClassifier
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
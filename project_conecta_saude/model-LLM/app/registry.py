@@ -0,0 +1,198 @@
+"""
+Registro de versões do modelo em disco.
+
+    models/registry/
+        manifest.json          # versões, métricas e ponteiros active/candidate
+        <versao>/model.pkl     # artefato de cada versão
+        <versao>/model.npz     # artefato compilado (app/compiled.py), se exportado
+
+O modelo ativo continua sendo servido de models/modelo_outliers_v1.pkl
+(e .npz no modo compilado): promover uma versão copia os artefatos para
+lá (troca atômica), e o ModelManager recarrega a quente. A versão candidata é carregada ao lado da
+ativa para o modo sombra (ver app/shadow.py).
+
+Uso (linha de comando):
+    python -m app.registry list
+    python -m app.registry promote <versao>
+    python -m app.registry candidate <versao|none>
+    python -m app.registry prune [--keep N]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+REGISTRY_PATH = PROJECT_ROOT / "models" / "registry"
+ACTIVE_MODEL_PATH = PROJECT_ROOT / "models" / "modelo_outliers_v1.pkl"
+
+# Quantidade de versões mantidas (além da ativa e da candidata)
+REGISTRY_KEEP = int(os.getenv("MODEL_REGISTRY_KEEP", "5"))
+
+
+def feature_schema_hash(schema: Dict[str, str]) -> str:
+    """Hash do esquema de features (nome -> tipo), independente da ordem."""
+    payload = json.dumps(sorted(schema.items()), separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    def __init__(self, root: Path = REGISTRY_PATH, active_path: Path = ACTIVE_MODEL_PATH):
+        self.root = root
+        self.active_path = active_path
+        self.manifest_path = root / "manifest.json"
+
+    # --- Manifesto ---
+
+    def load_manifest(self) -> Dict[str, Any]:
+        if not self.manifest_path.exists():
+            return {"active": None, "candidate": None, "versions": []}
+        return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        _write_atomic(self.manifest_path, json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8"))
+
+    def get(self, version: str) -> Dict[str, Any]:
+        for entry in self.load_manifest()["versions"]:
+            if entry["version"] == version:
+                return entry
+        raise KeyError(f"Versão '{version}' não encontrada no registro")
+
+    def path_for(self, version: str) -> Path:
+        return self.root / version / "model.pkl"
+
+    def compiled_path_for(self, version: str) -> Path:
+        return self.root / version / "model.npz"
+
+    # --- Operações ---
+
+    def register(
+        self,
+        artifact: Dict[str, Any],
+        *,
+        metrics: Dict[str, Any],
+        n_samples: int,
+        feature_schema: Dict[str, str],
+    ) -> Dict[str, Any]:
+        """
+        Grava o artefato (dict com 'model', 'version', 'trained_at') no
+        registro e adiciona a versão ao manifesto.
+        """
+        version = artifact["version"]
+        destination = self.path_for(version)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = destination.with_name(destination.name + ".tmp")
+        # Import tardio: no modo compilado o serviço importa o registro sem o joblib
+        from joblib import dump
+        dump(artifact, tmp_path)
+        os.replace(tmp_path, destination)
+
+        entry = {
+            "version": version,
+            "trained_at": artifact.get("trained_at"),
+            "registered_at": datetime.now().isoformat(),
+            "metrics": metrics,
+            "n_samples": n_samples,
+            "feature_schema_hash": feature_schema_hash(feature_schema),
+        }
+        manifest = self.load_manifest()
+        manifest["versions"] = [v for v in manifest["versions"] if v["version"] != version] + [entry]
+        self._save_manifest(manifest)
+        return entry
+
+    def promote(self, version: str) -> None:
+        """Ativa a versão: o artefato substitui o servido pelo model-LLM (troca atômica)."""
+        self.get(version)
+        compiled_path = self.compiled_path_for(version)
+        active_compiled_path = self.active_path.with_suffix(".npz")
+        if compiled_path.exists():
+            _write_atomic(active_compiled_path, compiled_path.read_bytes())
+        elif active_compiled_path.exists():
+            # Sem artefato compilado: o modo compilado mantém a versão que já carregou
+            print(f"AVISO: versão {version} sem artefato compilado; {active_compiled_path.name} removido.")
+            active_compiled_path.unlink()
+        _write_atomic(self.active_path, self.path_for(version).read_bytes())
+        manifest = self.load_manifest()
+        manifest["active"] = version
+        if manifest.get("candidate") == version:
+            manifest["candidate"] = None
+        self._save_manifest(manifest)
+
+    def set_candidate(self, version: Optional[str]) -> None:
+        """Define (ou remove, com None) a versão avaliada em modo sombra."""
+        if version is not None:
+            self.get(version)
+        manifest = self.load_manifest()
+        manifest["candidate"] = version
+        self._save_manifest(manifest)
+
+    def prune(self, keep: int = REGISTRY_KEEP) -> List[str]:
+        """
+        Política de retenção: mantém as 'keep' versões mais recentes, além
+        da ativa e da candidata. Retorna as versões removidas.
+        """
+        manifest = self.load_manifest()
+        protected = {manifest.get("active"), manifest.get("candidate")}
+        ordered = sorted(manifest["versions"], key=lambda v: v["registered_at"], reverse=True)
+        kept, removed = [], []
+        unprotected = 0
+        for entry in ordered:
+            if entry["version"] in protected:
+                kept.append(entry)
+            elif unprotected < keep:
+                kept.append(entry)
+                unprotected += 1
+            else:
+                removed.append(entry["version"])
+                shutil.rmtree(self.root / entry["version"], ignore_errors=True)
+        manifest["versions"] = sorted(kept, key=lambda v: v["registered_at"])
+        self._save_manifest(manifest)
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registro de versões do modelo")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Lista as versões registradas")
+    promote = sub.add_parser("promote", help="Ativa uma versão")
+    promote.add_argument("version")
+    candidate = sub.add_parser("candidate", help="Define a versão em modo sombra ('none' remove)")
+    candidate.add_argument("version")
+    prune = sub.add_parser("prune", help="Aplica a política de retenção")
+    prune.add_argument("--keep", type=int, default=REGISTRY_KEEP)
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    if args.command == "list":
+        manifest = registry.load_manifest()
+        for entry in manifest["versions"]:
+            marker = ("*" if entry["version"] == manifest.get("active") else
+                      "~" if entry["version"] == manifest.get("candidate") else " ")
+            print(f"{marker} {entry['version']}  amostras={entry['n_samples']}  "
+                  f"schema={entry['feature_schema_hash']}  métricas={json.dumps(entry['metrics'])}")
+        print("\n* ativa   ~ candidata (modo sombra)")
+    elif args.command == "promote":
+        registry.promote(args.version)
+        print(f"Versão {args.version} ativada.")
+    elif args.command == "candidate":
+        version = None if args.version.lower() == "none" else args.version
+        registry.set_candidate(version)
+        print(f"Candidata: {version or 'nenhuma'}")
+    elif args.command == "prune":
+        removed = registry.prune(args.keep)
+        print(f"Versões removidas: {', '.join(removed) or 'nenhuma'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 # model-LLM/app/schemas.py
 # (VERSÃO ATUALIZADA COM TODAS AS FEATURES DO RETREINAMENTO)
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+# Máximo de pacientes por requisição em /classify/batch
+MAX_BATCH_SIZE = 5000
 
 class PatientData(BaseModel):
     """
@@ -56,4 +59,20 @@ class ClassificationResponse(BaseModel):
     """
     is_outlier: bool
     confidence: float  # Grau de confiança da predição (0.0 a 1.0)
-    needs_confirmation: bool  # Se precisa de confirmação do profissional
\ No newline at end of file
+    needs_confirmation: bool  # Se precisa de confirmação do profissional
+    model_version: Optional[str] = None  # Versão do modelo que fez a predição
+    trained_at: Optional[str] = None  # Data do treinamento dessa versão
+
+class BatchClassificationRequest(BaseModel):
+    """
+    Lote de pacientes para classificação em uma única chamada.
+    """
+    patients: List[PatientData] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class BatchClassificationResponse(BaseModel):
+    """
+    Resultados na mesma ordem dos pacientes enviados.
+    """
+    results: List[ClassificationResponse]
+    model_version: Optional[str] = None  # Todo o lote usa a mesma versão
+    trained_at: Optional[str] = None
@@ -0,0 +1,97 @@
+"""
+Modo sombra: avalia a versão candidata do modelo com o tráfego real.
+
+Quando o registro (app/registry.py) tem uma candidata, cada classificação
+também é feita por ela depois que a resposta já foi enviada (a resposta
+usa sempre a versão ativa). As divergências e as latências das duas
+versões ficam acumuladas aqui e aparecem em GET /admin/shadow.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Janela de latências usada nos percentis
+LATENCY_WINDOW = 1000
+
+Prediction = Tuple[bool, float, bool]
+
+
+class ShadowMonitor:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._window = window
+        self.reset(None, None)
+
+    def reset(self, active_version: Optional[str], candidate_version: Optional[str]) -> None:
+        """Zera as estatísticas (chamado quando a ativa ou a candidata muda)."""
+        with self._lock:
+            self.active_version = active_version
+            self.candidate_version = candidate_version
+            self.requests = 0
+            self.patients = 0
+            self.disagreements = 0
+            self.errors = 0
+            self._active_ms: deque = deque(maxlen=self._window)
+            self._candidate_ms: deque = deque(maxlen=self._window)
+
+    def score(self, active, candidate, patients: List[Any],
+              active_predictions: List[Prediction], active_ms: float) -> None:
+        """
+        Classifica 'patients' com a candidata e compara com as predições da
+        ativa. Nunca levanta exceção: roda fora do caminho da resposta.
+        """
+        if active.version != self.active_version or candidate.version != self.candidate_version:
+            self.reset(active.version, candidate.version)
+        start = time.perf_counter()
+        try:
+            candidate_predictions = candidate.predict_batch(patients)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"SOMBRA: erro na versão candidata {candidate.version}: {e}")
+            return
+        candidate_ms = (time.perf_counter() - start) * 1000
+
+        disagreements = sum(
+            1 for (active_outlier, _, _), (candidate_outlier, _, _)
+            in zip(active_predictions, candidate_predictions)
+            if active_outlier != candidate_outlier
+        )
+        with self._lock:
+            self.requests += 1
+            self.patients += len(patients)
+            self.disagreements += disagreements
+            self._active_ms.append(active_ms)
+            self._candidate_ms.append(candidate_ms)
+        if disagreements:
+            print(f"SOMBRA: {disagreements}/{len(patients)} divergência(s) "
+                  f"({active.version} x {candidate.version}); "
+                  f"latência {active_ms:.1f}ms x {candidate_ms:.1f}ms")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active_version": self.active_version,
+                "candidate_version": self.candidate_version,
+                "requests": self.requests,
+                "patients": self.patients,
+                "disagreements": self.disagreements,
+                "disagreement_rate": self.disagreements / self.patients if self.patients else 0.0,
+                "errors": self.errors,
+                "active_latency_ms": _percentiles(self._active_ms),
+                "candidate_latency_ms": _percentiles(self._candidate_ms),
+            }
+
+
+def _percentiles(values) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    p50, p99 = np.percentile(list(values), [50, 99])
+    return {"p50": round(float(p50), 3), "p99": round(float(p99), 3)}
+
+
+# Monitor único do serviço
+shadow_monitor = ShadowMonitor()
@@ -0,0 +1,208 @@
+"""
+Carregamento incremental dos dados de retreinamento.
+
+As linhas de retraining_data são lidas em blocos com cursor do lado do
+servidor (o resultado nunca fica inteiro em memória) e o features_json de
+cada bloco é decodificado de uma vez só. Cada linha é guardada já
+codificada num cache NumPy em disco (models/training_cache.npz):
+
+    ids     int64               id da linha em retraining_data
+    codes   int16  (n x cat)    índice da categoria no vocabulário fixo (-1 = fora dele)
+    values  float64 (n x num)   booleanos (0/1) e medições numéricas
+    labels  int8                confirmação do profissional (1 = outlier)
+
+O maior id do cache é a marca d'água: os próximos retreinamentos só buscam
+no banco as linhas com id maior e treinam com o cache + as novas. Se os
+vocabulários de app/pipeline.py mudarem, o cache é descartado e
+reconstruído do zero.
+
+A marca d'água só diz o que já foi codificado, não o que já foi usado num
+treino: o cache é gravado antes do treino, que pode falhar depois. As
+linhas "novas" que decidem se vale retreinar são as com
+used_for_retraining = FALSE, marcadas só depois que a nova versão é
+registrada (retrain_model.mark_data_as_used).
+"""
+import io
+import json
+import os
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from app.pipeline import (
+    BOOLEAN_FEATURES, CATEGORY_VOCABULARIES, DEFAULT_VALUES, FEATURES, NUMERIC_FEATURES
+)
+from app.registry import feature_schema_hash
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CACHE_PATH = PROJECT_ROOT / "models" / "training_cache.npz"
+
+# Linhas buscadas por vez no cursor do servidor
+CHUNK_SIZE = int(os.getenv("RETRAIN_CHUNK_SIZE", "5000"))
+
+CATEGORICAL_FEATURES = list(CATEGORY_VOCABULARIES)
+VALUE_FEATURES = BOOLEAN_FEATURES + NUMERIC_FEATURES
+# Categoria usada ao reconstruir uma linha cujo valor estava fora do vocabulário
+UNKNOWN_CATEGORY = "__desconhecida__"
+
+# Identifica o layout do cache: muda junto com os vocabulários/colunas
+CACHE_SCHEMA = feature_schema_hash({
+    **{column: "|".join(vocabulary) for column, vocabulary in CATEGORY_VOCABULARIES.items()},
+    **{column: "value" for column in VALUE_FEATURES},
+})
+
+
+class TrainingCache:
+    def __init__(self, ids: np.ndarray, codes: np.ndarray, values: np.ndarray, labels: np.ndarray):
+        self.ids = ids
+        self.codes = codes
+        self.values = values
+        self.labels = labels
+
+    @classmethod
+    def empty(cls) -> "TrainingCache":
+        return cls(
+            np.empty(0, dtype=np.int64),
+            np.empty((0, len(CATEGORICAL_FEATURES)), dtype=np.int16),
+            np.empty((0, len(VALUE_FEATURES)), dtype=np.float64),
+            np.empty(0, dtype=np.int8),
+        )
+
+    @classmethod
+    def load(cls, path: Path = CACHE_PATH) -> "TrainingCache":
+        """Lê o cache do disco (vazio se não existir ou tiver outro layout)."""
+        if not path.exists():
+            return cls.empty()
+        with np.load(path) as data:
+            if str(data["schema"]) != CACHE_SCHEMA:
+                print("Vocabulários mudaram: cache de treino descartado.")
+                return cls.empty()
+            return cls(data["ids"], data["codes"], data["values"], data["labels"])
+
+    def save(self, path: Path = CACHE_PATH) -> None:
+        """Grava o cache com troca atômica."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        buffer = io.BytesIO()
+        np.savez(buffer, schema=CACHE_SCHEMA, ids=self.ids, codes=self.codes,
+                 values=self.values, labels=self.labels)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_bytes(buffer.getvalue())
+        os.replace(tmp_path, path)
+
+    @property
+    def watermark(self) -> int:
+        return int(self.ids.max()) if len(self.ids) else 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def extend(self, chunks: List["TrainingCache"]) -> "TrainingCache":
+        """Novo cache com as linhas de 'chunks' no final (uma concatenação só)."""
+        if not chunks:
+            return self
+        parts = [self] + chunks
+        return TrainingCache(
+            np.concatenate([part.ids for part in parts]),
+            np.concatenate([part.codes for part in parts]),
+            np.concatenate([part.values for part in parts]),
+            np.concatenate([part.labels for part in parts]),
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame com as colunas de FEATURES + 'label', pronto para o pipeline."""
+        columns = {}
+        for i, column in enumerate(CATEGORICAL_FEATURES):
+            # O índice -1 cai na última posição: a categoria desconhecida
+            lookup = np.array(CATEGORY_VOCABULARIES[column] + [UNKNOWN_CATEGORY], dtype=object)
+            columns[column] = lookup[self.codes[:, i]]
+        for i, column in enumerate(VALUE_FEATURES):
+            columns[column] = self.values[:, i]
+        frame = pd.DataFrame(columns)[FEATURES]
+        frame[BOOLEAN_FEATURES] = frame[BOOLEAN_FEATURES].astype(bool)
+        frame["label"] = self.labels.astype(int)
+        return frame
+
+
+def encode_chunk(rows: List[Tuple[int, str, bool]]) -> TrainingCache:
+    """
+    Codifica um bloco de linhas (id, features_json, label): o JSON do bloco
+    inteiro é decodificado numa única chamada e as colunas são convertidas
+    de forma vetorizada.
+    """
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    labels = np.fromiter((bool(row[2]) for row in rows), dtype=np.int8, count=len(rows))
+    records = json.loads("[" + ",".join(row[1] for row in rows) + "]")
+    frame = pd.DataFrame.from_records(records)
+
+    missing = [column for column in FEATURES if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Features ausentes nos dados de treino: {', '.join(missing)}")
+    frame = frame.fillna({column: value for column, value in DEFAULT_VALUES.items()})
+
+    codes = np.column_stack([
+        pd.Categorical(frame[column], categories=CATEGORY_VOCABULARIES[column]).codes
+        for column in CATEGORICAL_FEATURES
+    ]).astype(np.int16)
+    values = frame[VALUE_FEATURES].to_numpy(dtype=np.float64)
+    return TrainingCache(ids, codes, values, labels)
+
+
+def stream_rows(engine, watermark: int, chunk_size: int = CHUNK_SIZE) -> Iterator[list]:
+    """Blocos de linhas com id > watermark, lidos com cursor do servidor."""
+    query = text("""
+        SELECT id, features_json, professional_confirmation
+        FROM retraining_data
+        WHERE id > :watermark
+        ORDER BY id
+    """)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+            query, {"watermark": watermark}
+        )
+        for partition in result.partitions(chunk_size):
+            yield partition
+
+
+def count_unused(engine, watermark: int) -> int:
+    """Linhas até a marca d'água ainda não usadas num retreinamento concluído."""
+    query = text("""
+        SELECT COUNT(*)
+        FROM retraining_data
+        WHERE used_for_retraining = FALSE
+          AND id <= :watermark
+    """)
+    with engine.connect() as conn:
+        return conn.execute(query, {"watermark": watermark}).scalar_one()
+
+
+def load_training_data(
+    engine,
+    cache_path: Path = CACHE_PATH,
+    chunk_size: int = CHUNK_SIZE,
+    rebuild: bool = False,
+) -> Tuple[Optional[pd.DataFrame], int, int]:
+    """
+    Atualiza o cache com as linhas novas do banco e retorna
+    (DataFrame com todas as linhas, quantidade de linhas ainda não usadas
+    num retreinamento, marca d'água). O DataFrame é None se não houver
+    nenhuma linha.
+    """
+    cache = TrainingCache.empty() if rebuild else TrainingCache.load(cache_path)
+    print(f"Cache de treino: {len(cache)} linhas (marca d'água id={cache.watermark}).")
+
+    chunks = [encode_chunk(rows) for rows in stream_rows(engine, cache.watermark, chunk_size)]
+    fetched = sum(len(chunk) for chunk in chunks)
+    if fetched:
+        cache = cache.extend(chunks)
+        cache.save(cache_path)
+    print(f"{fetched} registros novos adicionados ao cache.")
+
+    if not len(cache):
+        return None, 0, 0
+    # Inclui linhas já em cache de um treino que falhou antes de marcá-las
+    new_rows = count_unused(engine, cache.watermark)
+    print(f"Encontrados {new_rows} registros ainda não usados para retreinamento.")
+    return cache.to_frame(), new_rows, cache.watermark
@@ -0,0 +1,158 @@
+"""
+Busca de hiperparâmetros dos motores de detecção (app/engines.py) para o
+retrain_model.py.
+
+Avalia combinações do SEARCH_SPACE do motor (mais contamination, nos não
+supervisionados) em grade completa ou amostra aleatória, com validação
+cruzada estratificada em k partes. Cada par (combinação, parte) é uma
+tarefa independente, executada em paralelo pelo joblib em processos
+separados.
+
+- Orçamento de tempo: tarefas que começariam depois do prazo são puladas;
+  só combinações com todas as partes avaliadas entram na escolha.
+- Teto de memória: o número de processos é limitado pela estimativa de
+  memória de cada tarefa (matriz de treino + motor ajustado), e a matriz
+  codificada é compartilhada com os processos por memmap em vez de copiada.
+
+As features são codificadas uma única vez antes da busca (vocabulários
+fixos; só a normalização usa estatísticas dos dados, e com todas as
+linhas ela é a mesma para todas as combinações comparadas).
+"""
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.metrics import f1_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold
+
+from app.engines import DEFAULT_ENGINE, ENGINES, make_engine
+from app.pipeline import build_preprocessing
+
+# Contamination como múltiplo da proporção de outliers confirmados
+CONTAMINATION_FACTORS = [0.5, 0.75, 1.0, 1.5, 2.0]
+
+# Teto de memória padrão para o treino (MB)
+MEMORY_LIMIT_MB = int(os.getenv("RETRAIN_MEMORY_LIMIT_MB", "4096"))
+
+
+@dataclass
+class SearchResult:
+    best_params: Dict[str, Any]
+    best_score: float
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    n_jobs: int = 1
+    skipped_tasks: int = 0
+    elapsed: float = 0.0
+
+
+def search_space(y, mode: str, n_iter: int, random_state: int = 42,
+                 engine: str = DEFAULT_ENGINE) -> List[Dict[str, Any]]:
+    """Combinações avaliadas: grade completa ('grid') ou n_iter sorteadas ('random')."""
+    engine_class = ENGINES[engine]
+    space = dict(engine_class.SEARCH_SPACE)
+    if not engine_class.supervised:
+        outlier_rate = float(np.mean(y))
+        space["contamination"] = sorted({
+            round(min(max(outlier_rate * factor, 0.001), 0.5), 4) for factor in CONTAMINATION_FACTORS
+        })
+    if mode == "grid":
+        candidates = list(ParameterGrid(space))
+        return candidates[:n_iter] if n_iter else candidates
+    return list(ParameterSampler(space, n_iter=n_iter, random_state=random_state))
+
+
+def estimate_task_bytes(n_rows: int, n_cols: int, params: Dict[str, Any],
+                        engine: str = DEFAULT_ENGINE) -> int:
+    """Memória aproximada de uma tarefa: partição de treino + motor ajustado."""
+    data = n_rows * n_cols * 8
+    return 2 * data + ENGINES[engine].estimate_bytes(n_rows, n_cols, params)
+
+
+def plan_workers(n_jobs: int, memory_limit_mb: int, task_bytes: int) -> int:
+    """Processos em paralelo: todas as CPUs pedidas, sem passar do teto de memória."""
+    cpus = os.cpu_count() or 1
+    requested = cpus if n_jobs is None or n_jobs < 1 else min(n_jobs, cpus)
+    by_memory = max(1, (memory_limit_mb * 1024 * 1024) // max(task_bytes, 1))
+    return int(max(1, min(requested, by_memory)))
+
+
+def _evaluate(engine, X, y, train_idx, test_idx, params, deadline: float,
+              random_state: int) -> Optional[float]:
+    # O prazo é checado no início de cada tarefa (relógio de parede, comum aos processos)
+    if time.time() > deadline:
+        return None
+    model = make_engine(engine, random_state=random_state, **params).fit(X[train_idx], y[train_idx])
+    return float(f1_score(y[test_idx], model.predict(X[test_idx]), zero_division=0))
+
+
+def search(
+    X,
+    y,
+    *,
+    engine: str = DEFAULT_ENGINE,
+    mode: str = "grid",
+    n_iter: int = 0,
+    folds: int = 5,
+    budget: float = 600.0,
+    n_jobs: int = -1,
+    memory_limit_mb: int = MEMORY_LIMIT_MB,
+    random_state: int = 42,
+) -> SearchResult:
+    """
+    Busca a melhor combinação (maior F1 médio da classe outlier nas partes
+    de validação). X é o DataFrame de features e y os labels (0/1).
+    """
+    start = time.time()
+    deadline = start + budget
+    y = np.asarray(y, dtype=int)
+    matrix = np.ascontiguousarray(build_preprocessing().fit_transform(X), dtype=np.float64)
+
+    # Cada parte precisa de ao menos um exemplo de cada classe
+    n_splits = max(2, min(folds, int(np.bincount(y, minlength=2).min())))
+    splits = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(matrix, y))
+    candidates = search_space(y, mode, n_iter, random_state, engine)
+
+    n_train = len(splits[0][0])
+    task_bytes = max(estimate_task_bytes(n_train, matrix.shape[1], params, engine) for params in candidates)
+    workers = plan_workers(n_jobs, memory_limit_mb, task_bytes)
+    print(f"Busca de hiperparâmetros ({engine}): {len(candidates)} combinações x {n_splits} partes, "
+          f"{workers} processo(s), orçamento de {budget:.0f}s")
+
+    # Ordem combinação-major: as primeiras combinações terminam todas as partes antes do prazo
+    tasks = [(i, train_idx, test_idx) for i in range(len(candidates)) for train_idx, test_idx in splits]
+    scores = Parallel(n_jobs=workers, max_nbytes="1M", mmap_mode="r")(
+        delayed(_evaluate)(engine, matrix, y, train_idx, test_idx, candidates[i], deadline, random_state)
+        for i, train_idx, test_idx in tasks
+    )
+
+    by_candidate: Dict[int, List[Optional[float]]] = {}
+    for (i, _, _), score in zip(tasks, scores):
+        by_candidate.setdefault(i, []).append(score)
+
+    results = []
+    for i, params in enumerate(candidates):
+        fold_scores = by_candidate.get(i, [])
+        if len(fold_scores) < n_splits or any(score is None for score in fold_scores):
+            continue
+        results.append({
+            "params": params,
+            "mean_f1": float(np.mean(fold_scores)),
+            "std_f1": float(np.std(fold_scores)),
+        })
+    skipped = sum(score is None for score in scores)
+    if not results:
+        raise RuntimeError("Orçamento de tempo esgotado antes de avaliar uma combinação completa")
+
+    results.sort(key=lambda result: (result["mean_f1"], -result["std_f1"]), reverse=True)
+    best = results[0]
+    return SearchResult(
+        best_params=best["params"],
+        best_score=best["mean_f1"],
+        results=results,
+        n_jobs=workers,
+        skipped_tasks=skipped,
+        elapsed=time.time() - start,
+    )
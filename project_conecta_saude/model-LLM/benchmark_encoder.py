@@ -0,0 +1,116 @@
+"""
+Benchmark da inferência de um paciente: caminho com DataFrame (pandas)
+x codificador compilado (app/encoder.py).
+
+Usa o modelo em models/ (ou --model); sem modelo, treina um pipeline
+sintético equivalente (ColumnTransformer + RandomForest) só para a medição.
+Também confere que os dois caminhos produzem as mesmas probabilidades.
+
+Uso:
+    python benchmark_encoder.py [--model caminho.pkl] [--n 2000]
+"""
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from joblib import load
+
+from app.encoder import FeatureEncoder
+from app.model import MODEL_PATH, _to_record
+from app.pipeline import BOOLEAN_FEATURES, CATEGORY_VOCABULARIES, build_pipeline
+from app.schemas import PatientData
+
+NUMERICOS = {
+    "idade": (18, 90), "consultas_ultimo_ano": (0, 12), "imc": (17.0, 40.0),
+    "pressao_sistolica_mmHg": (90, 190), "pressao_diastolica_mmHg": (55, 120),
+    "glicemia_jejum_mg_dl": (65, 250), "colesterol_total_mg_dl": (120, 320),
+    "hdl_mg_dl": (25, 90), "triglicerides_mg_dl": (50, 450),
+}
+
+
+def paciente_aleatorio(rng: random.Random) -> PatientData:
+    dados = {campo: rng.choice(valores) for campo, valores in CATEGORY_VOCABULARIES.items()}
+    dados.update({campo: rng.random() < 0.3 for campo in BOOLEAN_FEATURES})
+    for campo, (minimo, maximo) in NUMERICOS.items():
+        dados[campo] = rng.uniform(minimo, maximo) if isinstance(minimo, float) else rng.randint(minimo, maximo)
+    return PatientData(**dados)
+
+
+def pipeline_sintetico(rng: random.Random):
+    from sklearn.ensemble import RandomForestClassifier
+
+    df = pd.DataFrame([_to_record(paciente_aleatorio(rng)) for _ in range(2000)])
+    y = ((df["pressao_sistolica_mmHg"] > 160) | (df["glicemia_jejum_mg_dl"] > 200)).astype(int)
+    pipeline = build_pipeline(RandomForestClassifier(n_estimators=50, random_state=42))
+    return pipeline.fit(df, y)
+
+
+def percentis(tempos):
+    tempos_ms = np.array(tempos) * 1000
+    return np.percentile(tempos_ms, 50), np.percentile(tempos_ms, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do codificador de features")
+    parser.add_argument("--model", type=Path, default=MODEL_PATH, help="Pipeline salvo (.pkl)")
+    parser.add_argument("--n", type=int, default=2000, help="Predições por caminho")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    if args.model.exists():
+        print(f"Modelo: {args.model}")
+        artifact = load(args.model)
+        # O retrain_model.py salva um dicionário com o pipeline em 'model'
+        model = artifact["model"] if isinstance(artifact, dict) else artifact
+    else:
+        print(f"Modelo não encontrado em {args.model}; usando pipeline sintético.")
+        model = pipeline_sintetico(rng)
+
+    encoder = FeatureEncoder.from_pipeline(model)
+    if encoder is None:
+        print("O pipeline não é suportado pelo codificador; nada a comparar.")
+        return
+
+    pacientes = [paciente_aleatorio(rng) for _ in range(args.n)]
+
+    # Os dois caminhos devem dar o mesmo resultado
+    esperado = model.predict_proba(pd.DataFrame([_to_record(p) for p in pacientes[:200]]))
+    obtido = encoder.estimator.predict_proba(encoder.encode_batch(pacientes[:200]))
+    print(f"Diferença máxima de probabilidade: {np.abs(esperado - obtido).max():.2e}")
+
+    def caminho_dataframe(paciente):
+        return model.predict_proba(pd.DataFrame([_to_record(paciente)]))
+
+    def caminho_encoder(paciente):
+        return encoder.estimator.predict_proba(encoder.encode(paciente))
+
+    def caminho_somente_codificacao(paciente):
+        return encoder.encode(paciente)
+
+    def caminho_somente_dataframe(paciente):
+        return model.steps[0][1].transform(pd.DataFrame([_to_record(paciente)]))
+
+    print(f"\n{'caminho':<32}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for nome, funcao in [
+        ("DataFrame + pipeline", caminho_dataframe),
+        ("codificador + estimador", caminho_encoder),
+        ("só pré-processamento (pandas)", caminho_somente_dataframe),
+        ("só codificação (NumPy)", caminho_somente_codificacao),
+    ]:
+        for paciente in pacientes[:50]:  # aquecimento
+            funcao(paciente)
+        tempos = []
+        for paciente in pacientes:
+            inicio = time.perf_counter()
+            funcao(paciente)
+            tempos.append(time.perf_counter() - inicio)
+        p50, p99 = percentis(tempos)
+        print(f"{nome:<32}{p50:>10.3f}{p99:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark dos motores de detecção de outliers (app/engines.py).
+
+Para cada motor treina o pipeline completo no mesmo split 80/20 do
+retrain_model.py e mede:
+- tempo de treino;
+- latência por paciente (p50/p99 de predições de uma linha, como no
+  /classify) e por paciente em lote (predição vetorizada, como no
+  /classify/batch);
+- memória: pico alocado durante o treino e tamanho do artefato salvo;
+- qualidade no conjunto de teste: F1 da classe outlier e Brier score
+  (erro quadrático da probabilidade; menor = confiança mais bem calibrada).
+
+Recomenda o motor mais rápido (p50 por paciente) com F1 >= --min-f1.
+
+Os dados vêm das confirmações (--db-url, usando o cache incremental do
+retreinamento, ou --cache com um models/training_cache.npz); sem nenhum
+dos dois, usa dados sintéticos só para a medição.
+
+Uso:
+    python benchmark_engines.py [--db-url URL | --cache caminho.npz] [--engines hbos,lof] [--min-f1 0.5]
+"""
+
+import argparse
+import io
+import random
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from joblib import dump
+from sklearn.metrics import brier_score_loss, f1_score
+from sklearn.model_selection import train_test_split
+
+from app.engines import ENGINES, default_params, make_engine
+from app.model import _to_record
+from app.pipeline import FEATURES, build_pipeline
+from app.training_data import TrainingCache
+
+# Predições de uma linha medidas por motor
+LATENCY_ROWS = 500
+
+
+def dados_sinteticos(n: int, rng: random.Random) -> pd.DataFrame:
+    from benchmark_encoder import paciente_aleatorio
+
+    df = pd.DataFrame([_to_record(paciente_aleatorio(rng)) for _ in range(n)])[FEATURES]
+    # ~10% dos pacientes com uma medição bem acima da faixa usual
+    medicoes = ["pressao_sistolica_mmHg", "glicemia_jejum_mg_dl", "imc"]
+    df[medicoes] = df[medicoes].astype(float)
+    outlier = np.array([rng.random() < 0.10 for _ in range(n)])
+    for i in np.flatnonzero(outlier):
+        coluna = rng.choice(medicoes)
+        df.at[df.index[i], coluna] = df.at[df.index[i], coluna] * rng.uniform(1.5, 2.0)
+    # Confirmações com ruído (profissionais nem sempre concordam)
+    ruido = np.array([rng.random() < 0.03 for _ in range(n)])
+    df["label"] = (outlier ^ ruido).astype(int)
+    return df
+
+
+def carregar_dados(args) -> pd.DataFrame:
+    if args.db_url:
+        from sqlalchemy import create_engine
+        from app.training_data import load_training_data
+
+        df, _, _ = load_training_data(create_engine(args.db_url))
+        if df is None:
+            raise SystemExit("Nenhuma confirmação em retraining_data.")
+        return df
+    if args.cache:
+        cache = TrainingCache.load(Path(args.cache))
+        if not len(cache):
+            raise SystemExit(f"Cache vazio ou incompatível: {args.cache}")
+        return cache.to_frame()
+    print(f"Sem --db-url/--cache: usando {args.n} confirmações sintéticas.")
+    return dados_sinteticos(args.n, random.Random(42))
+
+
+def medir(nome: str, X_train, X_test, y_train, y_test) -> dict:
+    model = build_pipeline(make_engine(nome, **default_params(nome, y_train)))
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    model.fit(X_train, y_train)
+    tempo_treino = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    buffer = io.BytesIO()
+    dump(model, buffer)
+
+    # Mesma entrada do serviço: matriz já codificada + estimador final
+    matriz = model.named_steps["preprocessamento"].transform(X_test)
+    estimador = model.named_steps["classificador"]
+
+    tempos = []
+    for i in range(min(LATENCY_ROWS, len(matriz))):
+        linha = matriz[i:i + 1]
+        inicio = time.perf_counter()
+        estimador.predict_proba(linha)
+        tempos.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    previstos, probabilidades = estimador.predict_with_proba(matriz)
+    tempo_lote = time.perf_counter() - inicio
+    probabilidades = probabilidades[:, 1]
+
+    tempos_ms = np.array(tempos) * 1000
+    return {
+        "motor": nome,
+        "treino_s": tempo_treino,
+        "p50_ms": float(np.percentile(tempos_ms, 50)),
+        "p99_ms": float(np.percentile(tempos_ms, 99)),
+        "lote_us": tempo_lote / len(matriz) * 1e6,
+        "pico_treino_mb": pico / 1024 / 1024,
+        "artefato_kb": len(buffer.getvalue()) / 1024,
+        "f1": f1_score(y_test, previstos, zero_division=0),
+        "brier": brier_score_loss(y_test, probabilidades),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos motores de detecção de outliers")
+    parser.add_argument("--db-url", help="Lê as confirmações do banco (atualiza o cache de treino)")
+    parser.add_argument("--cache", help="Lê as confirmações de um training_cache.npz")
+    parser.add_argument("--n", type=int, default=5000, help="Confirmações sintéticas (sem banco/cache)")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Motores separados por vírgula")
+    parser.add_argument("--min-f1", type=float, default=0.5, help="F1 mínimo para recomendar um motor")
+    args = parser.parse_args()
+
+    df = carregar_dados(args)
+    X, y = df[FEATURES], df["label"]
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    print(f"{len(X_train)} confirmações de treino, {len(X_test)} de teste "
+          f"({y.mean():.1%} outliers)\n")
+
+    resultados = []
+    for nome in [nome.strip() for nome in args.engines.split(",") if nome.strip()]:
+        if nome not in ENGINES:
+            raise SystemExit(f"Motor desconhecido: {nome} (opções: {', '.join(ENGINES)})")
+        print(f"Medindo {nome}...")
+        resultados.append(medir(nome, X_train, X_test, y_train, y_test))
+
+    print(f"\n{'motor':<20}{'treino (s)':>11}{'p50 (ms)':>10}{'p99 (ms)':>10}{'lote (µs)':>11}"
+          f"{'pico (MB)':>11}{'artefato (KB)':>15}{'F1':>8}{'Brier':>8}")
+    for r in resultados:
+        print(f"{r['motor']:<20}{r['treino_s']:>11.2f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+              f"{r['lote_us']:>11.1f}{r['pico_treino_mb']:>11.1f}{r['artefato_kb']:>15.0f}"
+              f"{r['f1']:>8.3f}{r['brier']:>8.3f}")
+
+    aprovados = [r for r in resultados if r["f1"] >= args.min_f1]
+    if aprovados:
+        melhor = min(aprovados, key=lambda r: r["p50_ms"])
+        print(f"\nMais rápido com F1 >= {args.min_f1}: {melhor['motor']} "
+              f"(use: python retrain_model.py ... --engine {melhor['motor']})")
+    else:
+        print(f"\nNenhum motor atingiu F1 >= {args.min_f1}.")
+
+
+if __name__ == "__main__":
+    main()
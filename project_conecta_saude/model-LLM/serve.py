@@ -0,0 +1,220 @@
+"""
+Servidor de produção pre-fork do model-LLM.
+
+O processo mestre importa o app (o modelo é carregado e passa pelo
+autoteste uma única vez), congela os objetos existentes no coletor de lixo
+(gc.freeze) e abre o socket; depois cria os workers com fork. Os workers
+herdam o modelo já carregado e compartilham as mesmas páginas de memória
+(copy-on-write): a memória do modelo não cresce com o número de workers.
+
+Recarga a quente: só o mestre verifica o arquivo do modelo e o manifesto
+do registro (a mesma verificação do ModelManager, a cada
+MODEL_WATCH_INTERVAL segundos). Quando uma versão nova é carregada e
+aprovada no autoteste, os workers são substituídos um a um: o novo worker
+já nasce com a versão nova compartilhada e o antigo termina as requisições
+em andamento antes de sair. POST /admin/reload em qualquer worker, ou
+SIGHUP no mestre, força a recarga. Workers que morrem são recriados.
+
+Uso:
+    python serve.py [--host 0.0.0.0] [--port 8002] [--workers N]
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import time
+import traceback
+from typing import Dict
+
+import uvicorn
+
+# Workers padrão (MODEL_WORKERS)
+WORKERS = int(os.getenv("MODEL_WORKERS", "1"))
+
+# Tempo para um worker terminar as requisições em andamento ao sair (segundos)
+GRACEFUL_TIMEOUT = 30
+
+# Intervalo do laço do mestre (colheita de workers, sinais) em segundos
+MASTER_TICK = 1.0
+
+
+class PreforkServer:
+    def __init__(self, host: str, port: int, workers: int):
+        # Import no mestre: carrega e testa o modelo antes do fork
+        from app.main import app
+        from app.model import model_manager
+
+        self.app = app
+        self.manager = model_manager
+        self.host = host
+        self.port = port
+        self.n_workers = max(1, workers)
+        self.workers: Dict[int, str] = {}  # pid -> versão do modelo
+        self.retiring: Dict[int, float] = {}  # pid -> prazo para sair
+        self.socket = self._bind()
+        self._stopping = False
+        self._reload_requested = False
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    # --- Workers ---
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = self.manager.current.version
+            return
+        code = 0
+        try:
+            self._run_worker()
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _run_worker(self) -> None:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, signal.SIG_DFL)
+        master = os.getppid()
+        # Só o mestre observa o arquivo; o worker pede a recarga a ele
+        self.manager.watch_interval = 0
+        self.manager.reload_delegate = lambda: os.kill(master, signal.SIGHUP)
+        config = uvicorn.Config(self.app, timeout_graceful_shutdown=GRACEFUL_TIMEOUT)
+        uvicorn.Server(config).run(sockets=[self.socket])
+
+    def _retire(self, pid: int) -> None:
+        """Pede a um worker que termine as requisições em andamento e saia."""
+        self.workers.pop(pid, None)
+        self.retiring[pid] = time.monotonic() + GRACEFUL_TIMEOUT
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self) -> None:
+        """Colhe workers que saíram e recria os que morreram sem ser pedido."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                break
+            if self.retiring.pop(pid, None) is not None:
+                continue
+            if self.workers.pop(pid, None) is not None and not self._stopping:
+                print(f"Worker {pid} saiu inesperadamente (status {status}); recriando.")
+                self._spawn()
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                print(f"Worker {pid} não saiu em {GRACEFUL_TIMEOUT}s; encerrando à força.")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.retiring[pid] = float("inf")
+
+    def _freeze(self) -> None:
+        # Objetos congelados não são visitados pelo coletor nos workers, então as
+        # páginas do modelo não são copiadas só por uma coleta de lixo
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+
+    def _roll(self) -> None:
+        """Substitui os workers, um a um, por workers com a versão atual."""
+        self._freeze()
+        version = self.manager.current.version
+        print(f"Substituindo {len(self.workers)} worker(s) pela versão {version}...")
+        for pid in list(self.workers):
+            self._spawn()
+            self._retire(pid)
+
+    # --- Recarga ---
+
+    def _force_reload(self) -> None:
+        try:
+            self.manager.reload()
+            self.manager.reload_candidate()
+        except Exception as e:
+            print(f"ERRO ao recarregar o modelo (versão anterior mantida): {e}")
+            return
+        self._roll()
+
+    # --- Laço principal ---
+
+    def _on_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _on_reload(self, signum, frame) -> None:
+        self._reload_requested = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        self._freeze()
+        for _ in range(self.n_workers):
+            self._spawn()
+        print(f"✓ {self.n_workers} worker(s) em http://{self.host}:{self.port} "
+              f"(modelo {self.manager.current.version}, mestre {os.getpid()})")
+
+        interval = self.manager.watch_interval
+        next_check = time.monotonic() + interval
+        try:
+            while not self._stopping:
+                self._reap()
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self._force_reload()
+                    next_check = time.monotonic() + interval
+                elif interval > 0 and time.monotonic() >= next_check:
+                    next_check = time.monotonic() + interval
+                    if self.manager.check_for_updates():
+                        self._roll()
+                time.sleep(MASTER_TICK)
+        finally:
+            self._shutdown()
+
+    def _shutdown(self) -> None:
+        print("Encerrando os workers...")
+        self._stopping = True
+        for pid in list(self.workers):
+            self._retire(pid)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        while self.retiring and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.retiring):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor pre-fork do model-LLM")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="Quantidade de workers (padrão: MODEL_WORKERS ou 1)")
+    args = parser.parse_args()
+
+    PreforkServer(args.host, args.port, args.workers).run()
+
+
+if __name__ == "__main__":
+    main()